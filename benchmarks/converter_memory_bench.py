@@ -0,0 +1,63 @@
+"""
+Author: James Duvall
+Purpose: Peak python memory of create_configs in the default and --low_memory modes on a synthetic estate
+Run from the repo root - python -m benchmarks.converter_memory_bench
+"""
+import os
+import tempfile
+import tracemalloc
+
+from ci_cli.converter import Converter
+
+DEVICES: int = 20
+INTERFACES_PER_DEVICE: int = 20
+# Filler lines (acls, route maps...) that make a config big without adding interfaces
+FILLER_LINES: int = 1000
+
+
+def build_estate(source_path: str) -> None:
+    """
+    Configs where every interface shares a /30 with the same interface on the next device
+    """
+    for idx in range(DEVICES):
+        lines = [f"hostname r{idx}", "!"]
+        for intf in range(INTERFACES_PER_DEVICE):
+            link = (idx % 2) * 1000 + intf
+            lines += [f"interface GigabitEthernet0/{intf}", f" ip address 10.{link // 256}.{link % 256}.{1 + (idx % 2)} 255.255.255.252", "!"]
+        lines += [f"access-list 100 permit ip host 10.255.{line // 256}.{line % 256} any" for line in range(FILLER_LINES)]
+        with open(os.path.join(source_path, f"r{idx}.txt"), "w", encoding="UTF-8") as config_file:
+            config_file.write("\n".join(lines) + "\n")
+
+
+def convert(source_path: str, low_memory: bool) -> int:
+    """
+    Run the create_configs steps, returns the peak traced memory in bytes
+    """
+    with tempfile.TemporaryDirectory() as output_path:
+        tracemalloc.start()
+        conv = Converter(source_path=source_path, user="1", output_path=output_path, low_memory=low_memory)
+        conv.load_configs()
+        conv.parse_configs()
+        conv.subnet_compare()
+        conv.manipulate_configs()
+        conv.save_interface_mapping()
+        conv.create_lab_vars()
+        conv.flush_output()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak
+
+
+def main() -> None:
+    """
+    Print the peak memory of both modes
+    """
+    with tempfile.TemporaryDirectory() as source_path:
+        build_estate(source_path)
+        for low_memory in (False, True):
+            peak = convert(source_path, low_memory)
+            print(f"{'low_memory' if low_memory else 'default':>10}: peak {peak / 1024 / 1024:.1f} MiB for {DEVICES} configs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Author: James Duvall
+Purpose: Times loading a large synthetic test suite - the old yaml.safe_load walk, a cold load_tests
+(LibYAML, parallel parse, validation) and a warm load_tests served from the hash cache
+Run from the repo root - python -m benchmarks.loader_bench
+"""
+import os
+import tempfile
+import time
+
+import yaml
+
+from ci_cli.test_loader import load_tests
+
+FILES: int = 3000
+
+
+def write_suite(directory: str) -> None:
+    """
+    bgp_route_test files with a handful of routes each, roughly what a large estate's suite looks like
+    """
+    for idx in range(FILES):
+        test = {
+            "type": "bgp_route_test",
+            "test_description": f"routes {idx}",
+            "devices": [f"R{idx % 50}"],
+            "test_params": {"routes": [
+                {"network": f"10.{idx % 250}.{route}.0/24", "next_hop": "10.0.0.1", "metric": 0, "localpref": 100}
+                for route in range(10)
+            ]},
+        }
+        with open(os.path.join(directory, f"test_{idx}.yml"), "w", encoding="UTF-8") as test_file:
+            test_file.write(yaml.safe_dump(test))
+
+
+def safe_load_walk(directory: str) -> int:
+    count = 0
+    for path, _, files in os.walk(directory):
+        for file_ in files:
+            if file_.endswith(".yml"):
+                with open(os.path.join(path, file_), encoding="UTF-8") as test_file:
+                    yaml.safe_load(test_file.read())
+                    count += 1
+    return count
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as suite, tempfile.TemporaryDirectory() as cache_dir:
+        write_suite(suite)
+        cache_path = os.path.join(cache_dir, "cache.json")
+        start = time.perf_counter()
+        safe_load_walk(suite)
+        print(f"yaml.safe_load walk      {time.perf_counter() - start:8.3f}s for {FILES} files")
+        start = time.perf_counter()
+        load_tests(suite, cache_path=cache_path)
+        print(f"load_tests cold          {time.perf_counter() - start:8.3f}s")
+        start = time.perf_counter()
+        load_tests(suite, cache_path=cache_path)
+        print(f"load_tests cached        {time.perf_counter() - start:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Author: James Duvall
+Purpose: Times the python and numpy subnet_compare engines against synthetic estates
+and reports the interface count where numpy starts winning (VECTORIZE_THRESHOLD in converter.py)
+Run from the repo root - python -m benchmarks.subnet_compare_bench
+"""
+import random
+import tempfile
+import time
+from array import array
+from types import SimpleNamespace
+
+from ci_cli.converter import Converter
+from ci_cli.interface_table import InterfaceTable, InterfaceView, ADDR_TYPECODE
+from ci_cli.subnet_grouping import numpy_available
+
+SIZES: list[int] = [25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 100000]
+# The python engine is O(n^2), don't wait on it past this size
+PYTHON_LIMIT: int = 10000
+INTERFACES_PER_DEVICE: int = 20
+
+
+def build_estate(total_interfaces: int) -> list[SimpleNamespace]:
+    """
+    Builds fake configurations where every /30 is shared by two devices, plus some lonely /24s
+    """
+    rng = random.Random(total_interfaces)
+    table = InterfaceTable()
+    configs = [
+        SimpleNamespace(file_path=f"r{idx}.txt", interface_name="GigabitEthernet0/1", l3_rows=array(ADDR_TYPECODE))
+        for idx in range(max(2, total_interfaces // INTERFACES_PER_DEVICE))
+    ]
+    base = 0x0A000000
+    for idx in range(total_interfaces):
+        if idx % 10 == 9:
+            address, prefixlen = base + (idx << 8) + 1, 24
+        else:
+            address, prefixlen = base + ((idx // 2) << 2) + 1 + (idx % 2), 30
+        config = rng.choice(configs)
+        config.l3_rows.append(table.add(config.file_path, f"GigabitEthernet{idx}", address, prefixlen))
+    for config in configs:
+        config.l3_interfaces = InterfaceView(table, config.l3_rows)
+    return configs
+
+
+def time_engine(total_interfaces: int, engine: str) -> float:
+    """
+    Run subnet_compare once with the given engine, returns seconds taken
+    """
+    with tempfile.TemporaryDirectory() as output_path:
+        conv = Converter(source_path="", user="1", output_path=output_path,
+                         configs=build_estate(total_interfaces))
+        start = time.perf_counter()
+        conv.subnet_compare(engine=engine)
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    """
+    Print a timing table and the crossover point
+    """
+    if not numpy_available():
+        print("numpy is not installed, nothing to compare")
+        return
+    # warm up numpy so the first row isn't paying for the import
+    time_engine(10, "numpy")
+    crossover = None
+    print(f"{'interfaces':>10} {'python (s)':>12} {'numpy (s)':>12}")
+    for size in SIZES:
+        numpy_time = time_engine(size, "numpy")
+        python_time = time_engine(size, "python") if size <= PYTHON_LIMIT else float("nan")
+        if crossover is None and numpy_time < python_time:
+            crossover = size
+        print(f"{size:>10} {python_time:>12.4f} {numpy_time:>12.4f}")
+    print(f"numpy faster from ~{crossover} interfaces" if crossover else "numpy never faster in this run")
+
+
+if __name__ == "__main__":
+    main()
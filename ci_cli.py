@@ -10,11 +10,25 @@ import os
 import sys
 import json
 import logging
+from ci_cli.daemon_client import forward_to_daemon, socket_path, send
+
+if __name__ == "__main__":
+    # a running `ci_cli.py daemon` takes the command, skipping the imports below
+    forward_to_daemon(sys.argv[1:])
+
+# pylint: disable=wrong-import-position
 from tqdm import tqdm
-from datetime import datetime
 from ci_cli.converter import Converter
 from ci_cli.ine_config_builder import INEConfigBuilder
 from ci_cli import eve_interface
+from ci_cli.multi_host import MultiHostLab
+from ci_cli.lab_pool import LabPool, topology_key, LEASED, IDLE, FAILED
+from ci_cli.lab_reaper import find_stale_labs, reap_labs
+from ci_cli.log_setup import setup_logging
+from ci_cli.artifact_archive import ArtifactSource
+from ci_cli.sharding import parse_shard
+from ci_cli import daemon
+from config import POOL_SIZE, POOL_DB_PATH, EVE_API_WORKERS, REAP_MAX_AGE_HOURS
 
 
 @click.group(name="main")
@@ -26,31 +40,7 @@ def main(ctx, debug_level):
     Determine the logging level and setup logger for commands
     """
 
-    console = logging.StreamHandler()
-    formatter = logging.Formatter('%(name)-12s: %(levelname)-8s %(message)s')
-    console.setFormatter(formatter)
-
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    log_filename = f"logs/log_{timestamp}.log"
-
-    file_handler = logging.FileHandler(log_filename)
-    file_handler.setFormatter(formatter)
-
-    # Set level for console handler based on debug_level
-    if debug_level == "DEBUG":
-        console.setLevel(logging.DEBUG)
-    elif debug_level == "INFO":
-        console.setLevel(logging.INFO)
-    else:
-        console.setLevel(logging.WARNING)
-    logging.getLogger('').addHandler(console)
-    file_handler.setLevel(logging.DEBUG)
-    logging.getLogger('').addHandler(file_handler)
-    if debug_level in ["DEBUG", "INFO"]:
-        logging.getLogger('').setLevel(
-            logging.DEBUG if debug_level == "DEBUG" else logging.INFO)
-    else:
-        logging.getLogger('').setLevel(logging.WARNING)
+    setup_logging(debug_level)
 
     logger = logging.getLogger(__name__)
     ctx.obj = logger
@@ -59,6 +49,22 @@ def main(ctx, debug_level):
     logging.info("Logging initiated")
 
 
+def get_lab(lab_name: str, eve_url: tuple, source_path: str = None):
+    """
+    One --eve_url (or just the EVE_URL env var) gives a normal EVEInterface,
+    more than one spreads the lab across hosts with MultiHostLab
+    Under the daemon the lab (login, testbed) from an earlier command is reused
+    """
+    if len(eve_url) > 1:
+        def build():
+            return MultiHostLab(lab_name=lab_name, eve_urls=list(eve_url), source_path=source_path)
+    else:
+        def build():
+            return eve_interface.EVEInterface(
+                lab_name=lab_name, source_path=source_path, eve_url=eve_url[0] if eve_url else None)
+    return daemon.warm_lab(daemon.lab_key(lab_name, eve_url), build, source_path=source_path)
+
+
 @main.command(name="create_configs")
 @click.pass_obj
 @click.option(
@@ -84,8 +90,40 @@ def main(ctx, debug_level):
 @click.option(
     "--user", help="maps user to management subnet; for example in a gitlab ci pipeline, can use the GITLAB_USER_ID predefined var", required=True, type=click.STRING
 )
+@click.option(
+    "--subnet_engine",
+    help="OPTIONAL: Engine used to group interfaces by subnet, numpy requires numpy to be installed. auto picks numpy for large estates",
+    default="auto", show_default=True, type=click.Choice(["auto", "python", "numpy"])
+)
+@click.option(
+    "--bridge_mode",
+    help="OPTIONAL: single puts every segment on one lab bridge, sharded splits the segments across multiple bridges and trunk nics",
+    default="single", show_default=True, type=click.Choice(["single", "sharded"])
+)
+@click.option(
+    "--max_nodes_per_bridge",
+    help="OPTIONAL: Only used with --bridge_mode sharded, overrides BRIDGE_MAX_NODES from config.py",
+    type=click.INT
+)
+@click.option(
+    "--low_memory", is_flag=True, default=False,
+    help="OPTIONAL: Two pass conversion, only one config's lines and parse tree are held in memory at a time"
+)
+@click.option(
+    "--archive", is_flag=True, default=False,
+    help="OPTIONAL: Write every output file into one <output_path>.zip instead of the output_path directory"
+)
+@click.option(
+    "--shard",
+    help="OPTIONAL: i/n, only convert shard i (from 0) of n. Writes a summary for merge_shards, or with --apply_plan the shard's configs"
+)
+@click.option(
+    "--apply_plan", is_flag=True, default=False,
+    help="OPTIONAL: Only used with --shard, rewrite the shard's configs from the plan merge_shards saved in output_path"
+)
 def create_configs(
-    logger, source_path: str, output_path: str, vlan_seed: str, config_file_ext: str, user: str
+    logger, source_path: str, output_path: str, vlan_seed: str, config_file_ext: str, user: str, subnet_engine: str,
+    bridge_mode: str, max_nodes_per_bridge: int, low_memory: bool, archive: bool, shard: str, apply_plan: bool
 ) -> None:
     """
     Takes your passed in directory of configurations with various interfaces formats them to work in an EVE lab
@@ -98,37 +136,119 @@ def create_configs(
     if vlan_seed <= 1:
         logging.warning("The vlan seed cannot be less than 2.")
         sys.exit(1)
+    if shard:
+        try:
+            shard = parse_shard(shard)
+        except ValueError as err:
+            logging.warning("%s", err)
+            sys.exit(1)
+        if archive:
+            logging.warning("--archive can't be used with --shard, each shard writes into output_path")
+            sys.exit(1)
+    elif apply_plan:
+        logging.warning("--apply_plan is only used with --shard")
+        sys.exit(1)
     conv = Converter(
         source_path=source_path,
         output_path=output_path,
         vlan_seed=vlan_seed,
         config_file_ext=config_file_ext,
-        user=user
+        user=user,
+        low_memory=low_memory,
+        archive=archive
     )
     
     # load all files with specified extension
-    conv.load_configs()
+    conv.load_configs(shard=shard or None)
     # parse out all l3 interfaces in the config files
     print("Initializing Configurations")
-    for config in tqdm(conv.configs):
-        
-        config.get_current_parsed_config()
-        config.get_hostname()
-        config.get_device_type()
-        config.get_l3_interfaces()
-        
-
-    # Finds common subnets and assigns vlanids
-    conv.subnet_compare()
-    # replaces the old configuration interfaces with new subintf
+    conv.parse_configs(progress=tqdm)
+
+    if shard and not apply_plan:
+        # first pass of a sharded run, merge_shards picks the summary up
+        conv.save_shard_summary(shard)
+        conv.flush_output()
+        print(f"Saved the summary for shard {shard[0]}/{shard[1]}")
+        return
+    if shard:
+        # vlans, bridges and management addresses were decided by merge_shards
+        conv.apply_shard_plan()
+    else:
+        # Finds common subnets and assigns vlanids
+        conv.subnet_compare(engine=subnet_engine)
+        # Splits the segments across multiple lab bridges, has to happen before the interfaces are renamed
+        if bridge_mode == "sharded":
+            if max_nodes_per_bridge:
+                conv.assign_bridges(max_nodes=max_nodes_per_bridge)
+            else:
+                conv.assign_bridges()
+    # replaces the old configuration interfaces with new subintf, also builds each config's interface mapping
     conv.manipulate_configs()
-    for config in tqdm(conv.configs):
-        config.create_interface_mapping()
 
-    # Builds the interface mapping to show old vs new
+    if not shard:
+        # Builds the interface mapping to show old vs new, merge_shards saves these for a sharded run
+        conv.save_interface_mapping()
+        conv.create_lab_vars()
+    conv.save_securecrt_sessions()
+    conv.flush_output()
+    print("Completed")
+
+
+@main.command("merge_shards")
+@click.pass_obj
+@click.option(
+    "--output_path",
+    help="MANDATORY: create_configs --output_path, holding every shard's summary under shards/",
+    required=True,
+)
+@click.option(
+    "--vlan_seed",
+    help="OPTIONAL: Which vlan to start incrementing at, avoid setting too high. Must be greater than 1",
+    default=2, show_default=True
+)
+@click.option(
+    "--user", help="maps user to management subnet; for example in a gitlab ci pipeline, can use the GITLAB_USER_ID predefined var", required=True, type=click.STRING
+)
+@click.option(
+    "--subnet_engine",
+    help="OPTIONAL: Engine used to group interfaces by subnet, numpy requires numpy to be installed. auto picks numpy for large estates",
+    default="auto", show_default=True, type=click.Choice(["auto", "python", "numpy"])
+)
+@click.option(
+    "--bridge_mode",
+    help="OPTIONAL: single puts every segment on one lab bridge, sharded splits the segments across multiple bridges and trunk nics",
+    default="single", show_default=True, type=click.Choice(["single", "sharded"])
+)
+@click.option(
+    "--max_nodes_per_bridge",
+    help="OPTIONAL: Only used with --bridge_mode sharded, overrides BRIDGE_MAX_NODES from config.py",
+    type=click.INT
+)
+def merge_shards(
+    logger, output_path: str, vlan_seed: int, user: str, subnet_engine: str, bridge_mode: str, max_nodes_per_bridge: int
+) -> None:
+    """
+    Between the two create_configs --shard passes, assign vlans, bridges and management addresses across every shard
+    Saves labvars.json, the interface maps and shards/plan.json for create_configs --shard i/n --apply_plan
+    """
+    if vlan_seed <= 1:
+        logging.warning("The vlan seed cannot be less than 2.")
+        sys.exit(1)
+    conv = Converter(source_path="", output_path=output_path, vlan_seed=vlan_seed, user=user)
+    conv.merge_shards()
+    conv.subnet_compare(engine=subnet_engine)
+    if bridge_mode == "sharded":
+        if max_nodes_per_bridge:
+            conv.assign_bridges(max_nodes=max_nodes_per_bridge)
+        else:
+            conv.assign_bridges()
+    conv.assign_management_ips()
+    for config in conv.configs:
+        config.create_interface_mapping()
     conv.save_interface_mapping()
     conv.create_lab_vars()
-    conv.save_securecrt_sessions()
+    conv.save_shard_plan()
+    conv.flush_output()
     print("Completed")
 
 
@@ -160,21 +280,21 @@ def build_ines(logger, source_path):
     type=click.STRING
 )
 @click.option("--lab_name", required=True, type=click.STRING, help="Name of the lab you want to create")
-def create_or_mod_lab(logger, lab_name: str, source_path: str):
+@click.option("--eve_url", multiple=True, type=click.STRING, help="EVE server url, defaults to EVE_URL. Repeat to spread the lab across multiple EVE hosts")
+def create_or_mod_lab(logger, lab_name: str, source_path: str, eve_url: tuple):
     """
     Use the EVEInterface class to create a lab in eve, or modify it and output health_targets.json
-    source path MUST contain all the config files in a flat structure and the labvars.json file
+    source path MUST contain all the config files in a flat structure and the labvars.json file, or be a create_configs --archive zip
     """
     logger.info("Lab creation started")
     try:
-        assert os.path.isfile(f"{source_path}/labvars.json")
+        assert ArtifactSource(source_path).exists("labvars.json")
     except AssertionError:
         logging.error(
-            f"labvars.json not found at path {source_path}/labvars.json")
+            "labvars.json not found at path %s/labvars.json", source_path)
         sys.exit(1)
     
-    lab = eve_interface.EVEInterface(
-        lab_name=lab_name, source_path=source_path)
+    lab = get_lab(lab_name=lab_name, eve_url=eve_url, source_path=source_path)
     if lab.exists():
         print(f"Building lab from scratch with name {lab_name}")
         lab.mod_lab_from_cicd()
@@ -188,14 +308,15 @@ def create_or_mod_lab(logger, lab_name: str, source_path: str):
 @click.option("--health_targets", type=click.STRING, help="Path to health targets, for testing specific nodes")
 @click.option("--lab_name", required=True, type=click.STRING, help="Name of the lab you want to generate testbed and self heal")
 @click.option("--tb_output_path", required=True, default="./testbed.yml", show_default=True, type=click.STRING, help="Path that you want the testbed file saved to")
-def tb_and_health(logger, health_targets: str, lab_name: str, tb_output_path: str):
+@click.option("--eve_url", multiple=True, type=click.STRING, help="EVE server url, defaults to EVE_URL. Repeat for labs spread across multiple EVE hosts")
+def tb_and_health(logger, health_targets: str, lab_name: str, tb_output_path: str, eve_url: tuple):
     """
     Builds a pyATS testbed and does the self healing health check..
     Can either target all nodes in a lab, or a subset by providing a health_targets file created from a previous run.
     This scenario would happen if a small change happened to a lab after intial build, we don't want to recheck every device
     if only one rebooted
     """
-    lab = eve_interface.EVEInterface(lab_name=lab_name)
+    lab = get_lab(lab_name=lab_name, eve_url=eve_url)
     lab.build_testbed(tb_output_path=tb_output_path)
     if health_targets:
         with open(health_targets, 'r') as ht_file:
@@ -209,13 +330,160 @@ def tb_and_health(logger, health_targets: str, lab_name: str, tb_output_path: st
 @main.command("teardown_lab")
 @click.pass_obj
 @click.option("--lab_name", required=True, type=click.STRING, help="Name of the lab you want to delete")
-def teardown_lab(logger, lab_name: str):
+@click.option("--eve_url", multiple=True, type=click.STRING, help="EVE server url, defaults to EVE_URL. Repeat for labs spread across multiple EVE hosts")
+def teardown_lab(logger, lab_name: str, eve_url: tuple):
     """
     Stop all nodes and then delete the lab
     """
-    lab = eve_interface.EVEInterface(lab_name=lab_name)
+    lab = get_lab(lab_name=lab_name, eve_url=eve_url)
     lab.teardown_lab_from_cicd()
 
 
+def read_labvars(source_path: str) -> dict:
+    """
+    Loads labvars.json from the source path, exits if it isn't there
+    """
+    try:
+        assert ArtifactSource(source_path).exists("labvars.json")
+    except AssertionError:
+        logging.error(
+            "labvars.json not found at path %s/labvars.json", source_path)
+        sys.exit(1)
+    return json.loads(ArtifactSource(source_path).read("labvars.json"))
+
+
+@main.command("lease_lab")
+@click.pass_obj
+@click.option(
+    "--source_path",
+    help="MANDATORY: path to your configuration directory you want to convert",
+    required=True,
+    type=click.STRING
+)
+@click.option("--holder", required=True, type=click.STRING, help="Who holds the lease, for example the ${CI_PIPELINE_ID}")
+@click.option("--eve_url", type=click.STRING, help="EVE server url, defaults to EVE_URL")
+@click.option("--lease_file", default="./lab_lease.json", show_default=True, type=click.STRING, help="Path the leased lab name is written to")
+def lease_lab(logger, source_path: str, holder: str, eve_url: str, lease_file: str):
+    """
+    Lease a pre-booted lab with the same topology from the pool and reconcile it to the configs in source_path.
+    Builds a new pool lab if none are idle and the pool isn't full. Use the lab name from the lease file for
+    tb_and_health, and release_lab instead of teardown_lab when done
+    """
+    logger.info("Lab lease started")
+    topology: str = topology_key(read_labvars(source_path))
+    pool = LabPool()
+    lab_name = pool.acquire(topology, holder, eve_url=eve_url)
+    if lab_name is not None:
+        lab = eve_interface.EVEInterface(lab_name=lab_name, source_path=source_path, eve_url=eve_url)
+        if lab.exists():
+            print(f"Reconciling pool lab {lab_name} to the provided configs")
+            lab.mod_lab_from_cicd()
+        else:
+            logging.warning("Pool lab %s no longer exists in EVE, rebuilding it", lab_name)
+            lab.build_lab_from_cicd()
+    else:
+        lab_name = pool.reserve(topology, holder, size=POOL_SIZE, eve_url=eve_url)
+        if lab_name is None:
+            logging.error("Every pool lab for this topology is leased (POOL_SIZE %s), try again later or raise POOL_SIZE", POOL_SIZE)
+            sys.exit(1)
+        print(f"No idle pool lab for this topology, building {lab_name}")
+        lab = eve_interface.EVEInterface(lab_name=lab_name, source_path=source_path, eve_url=eve_url)
+        with pool.building(lab_name, teardown=lab.teardown_and_confirm):
+            lab.build_lab_from_cicd()
+        pool.set_state(lab_name, LEASED, holder=holder)
+    with open(lease_file, "w", encoding="UTF-8") as lease:
+        lease.write(json.dumps({"lab_name": lab_name, "holder": holder, "topology": topology}))
+    print(f"Leased lab {lab_name}")
+
+
+@main.command("release_lab")
+@click.pass_obj
+@click.option("--lab_name", required=True, type=click.STRING, help="Name of the leased pool lab to hand back")
+def release_lab(logger, lab_name: str):
+    """
+    Return a leased lab to the pool, the lab is left running for the next pipeline
+    """
+    logger.info("Lab release started")
+    if not LabPool().release(lab_name):
+        logging.error("%s is not a pool lab, use teardown_lab to delete it", lab_name)
+        sys.exit(1)
+
+
+@main.command("fill_pool")
+@click.pass_obj
+@click.option(
+    "--source_path",
+    help="MANDATORY: path to your configuration directory you want to convert",
+    required=True,
+    type=click.STRING
+)
+@click.option("--size", default=POOL_SIZE, show_default=True, type=click.INT, help="Number of labs to keep for this topology")
+@click.option("--eve_url", type=click.STRING, help="EVE server url, defaults to EVE_URL")
+def fill_pool(logger, source_path: str, size: int, eve_url: str):
+    """
+    Pre-build idle labs for the topology in source_path until the pool holds --size of them, for example from a nightly schedule
+    """
+    logger.info("Pool fill started")
+    topology: str = topology_key(read_labvars(source_path))
+    pool = LabPool()
+    while (lab_name := pool.reserve(topology, "fill_pool", size=size, eve_url=eve_url)) is not None:
+        print(f"Building pool lab {lab_name}")
+        lab = eve_interface.EVEInterface(lab_name=lab_name, source_path=source_path, eve_url=eve_url)
+        with pool.building(lab_name, teardown=lab.teardown_and_confirm):
+            lab.build_lab_from_cicd()
+        pool.set_state(lab_name, IDLE)
+    print(f"Pool holds {len(pool.labs(topology))} labs for this topology")
+
+
+@main.command("reap_labs")
+@click.pass_obj
+@click.option("--max_age_hours", default=REAP_MAX_AGE_HOURS, show_default=True, type=click.FLOAT, help="Tear down labs last modified longer ago than this, 0 ignores age")
+@click.option("--name_pattern", type=click.STRING, help="Regex, only labs with a matching name are torn down")
+@click.option("--eve_url", type=click.STRING, help="EVE server url, defaults to EVE_URL")
+@click.option("--dry_run", is_flag=True, help="Only list the labs that would be torn down")
+def reap_labs_cmd(logger, max_age_hours: float, name_pattern: str, eve_url: str, dry_run: bool):
+    """
+    Finds labs left behind by abandoned pipelines and tears them down in parallel. Warm pool labs are skipped
+    """
+    logger.info("Lab reaper started")
+    if max_age_hours <= 0 and not name_pattern:
+        logging.error("Refusing to reap every lab, provide --name_pattern when --max_age_hours is 0")
+        sys.exit(1)
+    eve = eve_interface.EVEInterface(lab_name=None, eve_url=eve_url)
+    pool_labs: list[dict] = LabPool().labs() if os.path.isfile(POOL_DB_PATH) else []
+    # failed pool builds are reaped like any other stale lab, the rest of the pool is kept
+    pooled: set[str] = {lab["lab_name"] for lab in pool_labs if lab["state"] != FAILED}
+    stale: list[str] = find_stale_labs(eve.list_labs() or [], max_age_hours, name_pattern=name_pattern, keep=pooled)
+    if not stale:
+        print("No stale labs found")
+        return
+    print(f"Stale labs: {', '.join(stale)}")
+    if dry_run:
+        return
+    labs = [eve_interface.EVEInterface(lab_name=lab_name, eve_url=eve_url) for lab_name in stale]
+    freed: dict[str, int] = reap_labs(labs, workers=EVE_API_WORKERS)
+    for lab_name in {lab["lab_name"] for lab in pool_labs if lab["state"] == FAILED} & set(stale):
+        LabPool().forget(lab_name)
+    print(f"Tore down {freed['labs']} labs, freed {freed['nodes']} running nodes, {freed['cpu']} cpu and {freed['ram']}MB ram")
+
+
+@main.command("daemon")
+@click.pass_obj
+@click.option("--socket_path", "socket_file", default=socket_path, show_default="DAEMON_SOCKET", help="Unix socket the daemon listens on, CI_CLI_SOCKET overrides it for the clients too")
+@click.option("--stop", is_flag=True, default=False, help="Stop the daemon listening on --socket_path")
+def run_daemon(logger, socket_file: str, stop: bool):
+    """
+    Keep one warm ci_cli process for the pipeline. While it runs, every other ci_cli.py command is sent to it
+    and shares its EVE sessions, testbeds, console connections and parsed configs. Set CI_CLI_NO_DAEMON to run locally
+    """
+    if stop:
+        if send({"stop": True}, socket_file) is None:
+            logging.warning("No daemon listening on %s", socket_file)
+            sys.exit(1)
+        return
+    logger.info("Starting the ci_cli daemon")
+    daemon.serve(main, socket_file)
+
+
 if __name__ == "__main__":
     main()
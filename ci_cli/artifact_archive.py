@@ -0,0 +1,102 @@
+"""
+Author: James Duvall
+Purpose: create_configs --archive output. Every artifact is streamed into one deflated zip with an index.json
+of names, sizes and sha256s, so CI uploads a single file. ArtifactSource lets create_or_mod_lab and the test
+mapper read a member straight out of the zip (or from a normal output directory) without extracting.
+"""
+
+import os
+import json
+import zipfile
+import hashlib
+
+from .artifact_writer import WRITTEN, UNCHANGED
+
+# Written last, lists every other member
+ARCHIVE_INDEX: str = "index.json"
+
+
+def is_archive(path: str) -> bool:
+    """
+    path is a zip written by create_configs --archive rather than an output directory
+    """
+    return bool(path) and os.path.isfile(path) and zipfile.is_zipfile(path)
+
+
+class ArchiveWriter:
+    """
+    Same interface as ArtifactWriter, members are named by their path relative to root
+    """
+
+    def __init__(self, archive_path: str, root: str) -> None:
+        self.archive_path: str = archive_path
+        self.root: str = root
+        self._zip: zipfile.ZipFile | None = None
+        self._index: dict[str, dict] = {}
+
+    def write(self, path: str, content: str) -> None:
+        """
+        Compress content into the archive now
+        """
+        if self._zip is None:
+            os.makedirs(os.path.dirname(self.archive_path) or ".", exist_ok=True)
+            self._zip = zipfile.ZipFile(self.archive_path, "w", compression=zipfile.ZIP_DEFLATED)
+        name: str = os.path.relpath(path, self.root).replace(os.sep, "/")
+        data: bytes = content.encode("UTF-8")
+        # zip members can't be replaced in place, a repeated name is appended and readers take the last one
+        self._zip.writestr(name, data)
+        self._index[name] = {"size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+
+    def flush(self) -> dict[str, int]:
+        """
+        Write the index and close the archive
+        """
+        if self._zip is None:
+            return {WRITTEN: 0, UNCHANGED: 0}
+        self._zip.writestr(ARCHIVE_INDEX, json.dumps({"files": self._index}, indent=2))
+        self._zip.close()
+        self._zip = None
+        counts: dict[str, int] = {WRITTEN: len(self._index), UNCHANGED: 0}
+        self._index = {}
+        return counts
+
+
+class ArtifactSource:
+    """
+    Read create_configs artifacts by name (labvars.json, LAB-r1.txt, interface_map/r1.json) from an
+    output directory or an --archive zip
+    """
+
+    def __init__(self, source_path: str) -> None:
+        self.source_path: str = source_path
+        self._zip: zipfile.ZipFile | None = zipfile.ZipFile(source_path) if is_archive(source_path) else None
+
+    def exists(self, name: str) -> bool:
+        if self._zip is not None:
+            return name in self._zip.NameToInfo
+        return os.path.isfile(os.path.join(self.source_path, name))
+
+    def read(self, name: str) -> str:
+        """
+        Contents of one artifact, raises FileNotFoundError when it isn't there
+        """
+        if self._zip is not None:
+            try:
+                return self._zip.read(name).decode("UTF-8")
+            except KeyError as err:
+                raise FileNotFoundError(f"{name} not in {self.source_path}") from err
+        with open(os.path.join(self.source_path, name), "r", encoding="UTF-8") as artifact:
+            return artifact.read()
+
+    def names(self, directory: str) -> list[str]:
+        """
+        File names directly inside directory (e.g. interface_map), sorted
+        """
+        if self._zip is not None:
+            prefix: str = f"{directory.rstrip('/')}/"
+            return sorted(
+                name[len(prefix):] for name in self._zip.NameToInfo
+                if name.startswith(prefix) and "/" not in name[len(prefix):]
+            )
+        full_path: str = os.path.join(self.source_path, directory)
+        return sorted(os.listdir(full_path)) if os.path.isdir(full_path) else []
@@ -0,0 +1,106 @@
+"""
+Author: James Duvall
+Purpose: Background writer for converter artifacts (LAB configs, json maps, SecureCRT sessions). Writes are
+queued to a thread pool so formatting the next config doesn't wait on the disk, each file is written to a
+temp file and renamed into place, and a file whose content hasn't changed is left alone.
+"""
+
+import os
+import sys
+import stat
+import logging
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
+
+if 'pytest' in sys.modules:
+    from tests.config import ARTIFACT_WRITERS
+else:
+    from config import ARTIFACT_WRITERS
+
+# Write results
+WRITTEN: str = "written"
+UNCHANGED: str = "unchanged"
+# The umask can only be read by setting it, done once at import before any writer threads exist
+_UMASK: int = os.umask(0)
+os.umask(_UMASK)
+
+
+def _file_mode(path: str) -> int:
+    """
+    Mode of the file being replaced, or 0666 minus the umask for a new file
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def write_atomic(path: str, content: str) -> str:
+    """
+    Write content to path through a temp file in the same directory, skipped when the file already holds content
+    """
+    data: bytes = content.encode("UTF-8")
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, "rb") as existing:
+                if existing.read() == data:
+                    return UNCHANGED
+    except OSError:
+        pass
+    directory: str = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(data)
+        # mkstemp files are 0600, give the artifact the mode a plain open() would have
+        os.chmod(temp_path, _file_mode(path))
+        os.replace(temp_path, path)
+    except OSError:
+        os.remove(temp_path)
+        raise
+    return WRITTEN
+
+
+class ArtifactWriter:
+    """
+    Queue of pending file writes, call flush once everything has been submitted
+    """
+
+    def __init__(self, workers: int = ARTIFACT_WRITERS) -> None:
+        self.workers: int = workers
+        self._pool: ThreadPoolExecutor | None = None
+        self._pending: dict[str, Future] = {}
+
+    def write(self, path: str, content: str) -> None:
+        """
+        Queue content for path, a later write to the same path replaces it once the earlier one is done
+        """
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="artifact-writer")
+        previous = self._pending.get(path)
+        if previous is not None:
+            # keep writes to one path in order
+            previous.result()
+        self._pending[path] = self._pool.submit(write_atomic, path, content)
+
+    def flush(self) -> dict[str, int]:
+        """
+        Wait for every queued write, returns how many files were written and left unchanged
+        Exits when a file couldn't be written
+        """
+        counts: dict[str, int] = {WRITTEN: 0, UNCHANGED: 0}
+        failed: bool = False
+        for path, future in self._pending.items():
+            try:
+                counts[future.result()] += 1
+            except OSError as err:
+                logging.error("Failed to write %s - %s", path, err)
+                failed = True
+        self._pending.clear()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if failed:
+            sys.exit(1)
+        logging.info("Artifacts written: %d, unchanged: %d", counts[WRITTEN], counts[UNCHANGED])
+        return counts
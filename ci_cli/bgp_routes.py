@@ -0,0 +1,123 @@
+"""
+Author: James Duvall
+Purpose: Route lookups and checks for bgp_route_test. Expected routes are grouped by network once, and when
+a test only covers a handful of prefixes each one is queried on its own instead of parsing the whole BGP table.
+"""
+
+from typing import Callable
+
+# Up to this many distinct networks a test queries each prefix, above it the full table is parsed once
+TARGETED_PREFIX_LIMIT: int = 25
+# (status_codes key, code letter in the BGP table, what the route should be)
+STATUS_CODES: tuple[tuple[str, str, str], ...] = (
+    ("best_path", ">", "best path"),
+    ("valid", "*", "valid"),
+    ("learned_via_ibgp", "i", "learned via IBGP"),
+    ("multipath", "m", "multipath"),
+)
+
+
+def group_routes(routes: list[dict]) -> dict[str, list[dict]]:
+    """
+    network -> the expected routes (paths) for it, in test file order
+    """
+    grouped: dict[str, list[dict]] = {}
+    for route in routes:
+        grouped.setdefault(route.get("network"), []).append(route)
+    return grouped
+
+
+def table_command(test_params: dict) -> str:
+    """
+    Command for the full BGP table of the test's vrf, also the parser used for prefix queries
+    """
+    vrf: str = test_params.get("vrf") or "default"
+    return "show ip bgp" if vrf == "default" else f"sho bgp vpnv4 unicast vrf {vrf}"
+
+
+def targeted(test_params: dict) -> bool:
+    """
+    Whether to query each prefix. test_params.lookup forces "prefix" or "table", otherwise it goes by prefix count
+    """
+    lookup = test_params.get("lookup")
+    if lookup in ("prefix", "table"):
+        return lookup == "prefix"
+    return len(group_routes(test_params.get("routes") or [])) <= TARGETED_PREFIX_LIMIT
+
+
+def route_queries(test_params: dict) -> list[tuple[str, str]]:
+    """
+    (command, parser command) pairs to run for a test. Prefix queries use longer-prefixes so the output
+    keeps the table format and goes through the same parser as the full table. IOS only takes longer-prefixes
+    after a length, so a classful network written without one (192.168.1.0) means the full table is parsed
+    """
+    parser: str = table_command(test_params)
+    networks: list[str] = list(group_routes(test_params.get("routes") or []))
+    if not targeted(test_params) or any("/" not in str(network) for network in networks):
+        return [(parser, parser)]
+    return [(f"{parser} {network} longer-prefixes", parser) for network in networks]
+
+
+def table_routes(parsed: dict, test_params: dict) -> dict:
+    """
+    network -> parsed route entry from a parsed BGP table
+    """
+    vrf: str = test_params.get("vrf") or "default"
+    address_family: str = "" if vrf == "default" else f"vpnv4 unicast RD {test_params.get('rd')}"
+    return (parsed or {}).get("vrf", {}).get(vrf, {}).get("address_family", {}).get(address_family, {}).get("routes", {})
+
+
+def collect_routes(parse: Callable[[str, str], dict], test_params: dict, empty_error: type[Exception]) -> dict:
+    """
+    Run every route query with parse(command, parser=parser) and merge the routes into network -> entry
+    A longer-prefixes query for a route that isn't in the table prints nothing and genie raises empty_error
+    (SchemaEmptyParserError), that prefix is left out so network_failures reports it as not found
+    """
+    prefixes: dict = {}
+    for command, parser in route_queries(test_params):
+        try:
+            parsed: dict = parse(command, parser=parser)
+        except empty_error:
+            parsed = {}
+        prefixes.update(table_routes(parsed, test_params))
+    return prefixes
+
+
+def _status_failures(wanted: dict, real_status_code: str) -> list[str]:
+    problems: list[str] = []
+    for key, code, description in STATUS_CODES:
+        if wanted.get(key) is True and code not in real_status_code:
+            problems.append(f"route should be {description}, however it is not")
+        elif wanted.get(key) is False and code in real_status_code:
+            problems.append(f"route should not be {description}, however it is")
+    return problems
+
+
+def network_failures(network: str, expected: list[dict], entry: dict | None) -> list[str]:
+    """
+    Everything wrong with one network: missing, the wrong number of paths, or a path (matched on next_hop)
+    whose metric, localpref, aspath or status codes differ from the expected route
+    """
+    if not entry:
+        return [f"Route {network} not found in BGP table"]
+    paths: dict = entry.get("index") or {}
+    problems: list[str] = []
+    if len(expected) != len(paths):
+        problems.append(f"Mismatch in route count for {network}: expected {len(expected)}, found {len(paths)}")
+    by_next_hop: dict[str, list[dict]] = {}
+    for details in paths.values():
+        by_next_hop.setdefault(details.get("next_hop"), []).append(details)
+    for route in expected:
+        if "next_hop" not in route:
+            continue
+        for details in by_next_hop.get(route.get("next_hop"), []):
+            if route.get("metric") is not None and details.get("metric") and route["metric"] != int(details["metric"]):
+                problems.append(f"Mismatch in metric for route {network} with next hop {route['next_hop']}")
+            if route.get("localpref") is not None and details.get("localpref") and route["localpref"] != int(details["localpref"]):
+                problems.append(f"Mismatch in local preference for route {network} with next hop {route['next_hop']}")
+            #Cisco parser makes aspath == route_info weird name but it works out
+            if route.get("aspath") is not None and details.get("route_info") and str(route["aspath"]) != str(details["route_info"]):
+                problems.append(f"Mismatch in aspath for route {network} with next hop {route['next_hop']}")
+            if route.get("status_codes") and details.get("status_codes"):
+                problems.extend(_status_failures(route["status_codes"], details["status_codes"]))
+    return problems
@@ -0,0 +1,102 @@
+"""
+Author: James Duvall
+Purpose: Works out the configuration commands that take a running IOS node from one config to another,
+so small changes can be pushed over the console instead of wiping and rebooting the node.
+"""
+
+import re
+import sys
+
+if 'pytest' in sys.modules:
+    from tests.config import HOT_APPLY_UNSAFE
+else:
+    from config import HOT_APPLY_UNSAFE
+
+# Lines in a saved config that are not configuration commands
+IGNORED_LINES = re.compile(r"^(!|end$|Building configuration|Current configuration)")
+BANNER = re.compile(r"^banner \S+ (\^C|\S)")
+
+
+def parse_tree(config: str) -> dict[str, dict]:
+    """
+    Nested dict of config lines by indentation, line -> child lines. Banners are kept whole as a single key
+    """
+    root: dict[str, dict] = {}
+    stack: list[tuple[int, dict]] = [(-1, root)]
+    lines = iter(config.splitlines())
+    for raw in lines:
+        line = raw.rstrip()
+        stripped = line.strip()
+        if not stripped or IGNORED_LINES.match(stripped):
+            continue
+        banner = BANNER.match(stripped)
+        if banner:
+            delimiter = banner.group(1)
+            block = [stripped]
+            # the delimiter may close the banner on the same line, otherwise read until it shows up again
+            if stripped[banner.end():].find(delimiter) == -1:
+                for body in lines:
+                    block.append(body.rstrip())
+                    if delimiter in body:
+                        break
+            root["\n".join(block)] = {}
+            stack = [(-1, root)]
+            continue
+        indent = len(line) - len(line.lstrip(" "))
+        while stack[-1][0] >= indent:
+            stack.pop()
+        children = stack[-1][1].setdefault(stripped, {})
+        stack.append((indent, children))
+    return root
+
+
+def negate(line: str) -> str:
+    """
+    IOS command that removes a config line
+    """
+    return line[3:] if line.startswith("no ") else f"no {line}"
+
+
+def _render(tree: dict[str, dict]) -> list[str]:
+    commands: list[str] = []
+    for line, children in tree.items():
+        commands.append(line)
+        if children:
+            commands.extend(_render(children))
+            commands.append("exit")
+    return commands
+
+
+def _delta(running: dict[str, dict], target: dict[str, dict], changed: list[str]) -> list[str]:
+    commands: list[str] = []
+    # removals first, so "ip address A" -> "ip address B" becomes "no ip address A" then "ip address B"
+    for line in running:
+        if line not in target:
+            changed.append(line)
+            commands.append(negate(line))
+    for line, children in target.items():
+        if line not in running:
+            changed.append(line)
+            changed.extend(_render(children))
+            commands.extend(_render({line: children}))
+            continue
+        sub_commands = _delta(running[line], children, changed)
+        if sub_commands:
+            commands.append(line)
+            commands.extend(sub_commands)
+            commands.append("exit")
+    return commands
+
+
+def config_delta(running: str, target: str, unsafe: list[str] = None) -> list[str] | None:
+    """
+    Configuration mode commands that turn the running config into the target config
+    Returns None when a changed line matches an unsafe pattern (HOT_APPLY_UNSAFE), those need a wipe and reboot
+    """
+    unsafe = HOT_APPLY_UNSAFE if unsafe is None else unsafe
+    changed: list[str] = []
+    commands = _delta(parse_tree(running), parse_tree(target), changed)
+    for line in changed:
+        if any(re.search(pattern, line) for pattern in unsafe):
+            return None
+    return commands
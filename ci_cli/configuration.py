@@ -4,21 +4,30 @@ Purpose: Configuration object used in converter, contains the logic to replace,
 modify, or remove lines in a cisco ios config.
 """
 
+import os
 import sys
 import re
 import logging
 import ipaddress
+from array import array
+from collections import OrderedDict
 from jinja2 import Template
 from ciscoconfparse import CiscoConfParse
+from .interface_table import InterfaceTable, InterfaceView, ADDR_TYPECODE
+from .ios_tree import IOSConfigTree
 
 if 'pytest' in sys.modules:
     logging.warning("Running under pytest")
     from tests.config import (
         CSR_NODES,
+        CONFIG_PARSER,
+        PARSED_FILE_CACHE_SIZE,
     )
 else:
     from config import (
         CSR_NODES,
+        CONFIG_PARSER,
+        PARSED_FILE_CACHE_SIZE,
     )
 
 
@@ -31,43 +40,122 @@ ALL_INTERFACE_FLAVORS_REGEX: str = (
 L3_INT_REGEX: str = r"ip address \d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3} \d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$"
 IP_ADDR_REGEX: str = r"\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}"
 
+
+def parse_config(config: str | list[str], factory: bool = False) -> IOSConfigTree | CiscoConfParse:
+    """
+    Parse a config file path or list of lines with the parser picked by CONFIG_PARSER
+    """
+    if CONFIG_PARSER == "ciscoconfparse":
+        return CiscoConfParse(config, factory=factory)
+    return IOSConfigTree(config)
+
+
+# file path -> ((mtime, size), parsed config) in least recently used order, None when caching is off
+# Only the ci_cli daemon turns it on
+_parsed_files: OrderedDict[str, tuple] | None = None
+
+
+def cache_parsed_files(enabled: bool) -> None:
+    """
+    Keep up to PARSED_FILE_CACHE_SIZE parsed config files between conversions, a file is parsed again
+    once its mtime or size changes
+    """
+    global _parsed_files  # pylint: disable=W0603
+    _parsed_files = OrderedDict() if enabled else None
+
+
+def parse_file(file_path: str, cache: bool = True) -> IOSConfigTree | CiscoConfParse:
+    """
+    parse_config for a config file, served from the cache when cache_parsed_files is on
+    cache=False (low memory conversions) neither reads nor fills the cache, so the tree can be freed after use
+    """
+    if _parsed_files is None or not cache:
+        return parse_config(file_path)
+    stat = os.stat(file_path)
+    key: tuple = (stat.st_mtime_ns, stat.st_size)
+    cached = _parsed_files.get(file_path)
+    if cached is not None and cached[0] == key:
+        _parsed_files.move_to_end(file_path)
+        return cached[1]
+    parsed = parse_config(file_path)
+    _parsed_files[file_path] = (key, parsed)
+    _parsed_files.move_to_end(file_path)
+    while len(_parsed_files) > PARSED_FILE_CACHE_SIZE:
+        _parsed_files.popitem(last=False)
+    return parsed
+
+
 class Configuration:
     """
     Responsible for parsing the configuration and creating a new configuration
     """
     # pylint: disable=too-many-instance-attributes
 
-    def __init__(self, file_: str, file_path: str) -> None:
+    def __init__(self, file_: str, file_path: str, interface_table: InterfaceTable = None, lazy: bool = False) -> None:
         self.file_path: str = file_path
         self.file_: str = file_
-        self.l3_interfaces: list[dict] = []
+        # Interfaces are stored in a (usually shared) InterfaceTable, we only keep our row numbers
+        self.interface_table: InterfaceTable = interface_table if interface_table is not None else InterfaceTable()
+        self.l3_rows: array = array(ADDR_TYPECODE)
         self.undesired_interfaces: list[dict] = []
-        try:
-            with open(self.file_path, "r", encoding="UTF-8") as opened_file:
-                self.unparsed_config: str = opened_file.readlines()
-        except (FileNotFoundError, PermissionError) as e:
-            logging.error(f"Error opening file (not found or permissions issue) - {e}")
-            sys.exit(1)
+        # lazy (low memory converter) leaves the raw lines on disk until load_config is called
+        self.unparsed_config: list[str] | None = None
+        self.lazy: bool = lazy
+        if not lazy:
+            self.load_config()
         self.new_configuration = str()
-        self.current_parsed_config: CiscoConfParse = None
+        self.current_parsed_config: IOSConfigTree | CiscoConfParse = None
         self.interface_mapping: dict[str, dict] = {}
         self.hostname = str()
         self.device_type = str()
         self.interface_name = str()
         self.management_interface = str()
         self.management_ip: ipaddress.IPv4Address = None
+        # Only used in sharded bridge mode, vlanid -> trunk interface that carries it
+        # vlans not listed here ride on self.interface_name
+        self.trunk_interfaces: dict[int, str] = {}
+        # bridge name -> nic number attached to it, also sharded bridge mode only
+        self.bridge_nics: dict[str, int] = {}
         try:
             with open("ci_cli/templates/securecrt.j2", "r", encoding="UTF-8") as securecrt_temp:
                 self.securecrt_template = Template(securecrt_temp.read())
         except (FileNotFoundError, PermissionError) as e:
-            logging.error(f"Error opening file (not found or permissions issue) - {e}")
+            logging.error("Error opening file (not found or permissions issue) - %s", e)
             sys.exit(1)
 
+    def load_config(self) -> None:
+        """
+        Read the raw config lines into self.unparsed_config
+        """
+        try:
+            with open(self.file_path, "r", encoding="UTF-8") as opened_file:
+                self.unparsed_config = opened_file.readlines()
+        except (FileNotFoundError, PermissionError) as e:
+            logging.error("Error opening file (not found or permissions issue) - %s", e)
+            sys.exit(1)
+
+    def release(self) -> None:
+        """
+        Drop the raw lines, parse tree and rewritten config, keeping only the summary the converter needs
+        (hostname, device type, interface rows, mapping). load_config brings the raw lines back
+        """
+        self.unparsed_config = None
+        self.current_parsed_config = None
+        self.new_configuration = str()
+
+    @property
+    def l3_interfaces(self) -> InterfaceView:
+        """
+        Dict-like view of this configuration's rows in the interface table
+        """
+        return InterfaceView(self.interface_table, self.l3_rows)
+
     def get_current_parsed_config(self) -> None:
         """
-        Turn the current network configuration into a parsed CiscoConfParse Object
+        Turn the current network configuration into a parsed config object (IOSConfigTree or CiscoConfParse)
         """
-        self.current_parsed_config = CiscoConfParse(self.file_path)
+        # the daemon's parsed file cache would keep every tree alive that release() drops
+        self.current_parsed_config = parse_file(self.file_path, cache=not self.lazy)
 
     def get_hostname(self) -> None:
         """
@@ -93,6 +181,40 @@ class Configuration:
             self.interface_name = "GigabitEthernet0/1"
             self.management_interface = "GigabitEthernet0/2"
 
+    def trunk_for(self, vlanid: int) -> str:
+        """
+        The trunk interface a vlan's subinterface should be built on
+        """
+        return self.trunk_interfaces.get(vlanid, self.interface_name)
+
+    def nic_name(self, nic: int) -> str:
+        """
+        Interface name of the nth lab nic, csrv nic 1 == GigabitEthernet1, iosv nic 1 == GigabitEthernet0/1
+        """
+        if self.device_type == "csrv":
+            return f"GigabitEthernet{nic}"
+        return f"GigabitEthernet0/{nic}"
+
+    def eve_interface_index(self, nic: int) -> int:
+        """
+        EVE counts interfaces from 0, csrv eth0 is GigabitEthernet1, iosv eth0 is GigabitEthernet0/0
+        """
+        if self.device_type == "csrv":
+            return nic - 1
+        return nic
+
+    def add_trunk_intfs(self) -> list[str]:
+        """
+        No shut any extra trunk interfaces added in sharded bridge mode, the on-boot EEM script
+        only covers the primary trunk and management interface
+        """
+        extra_trunks: list[str] = sorted(set(self.trunk_interfaces.values()) - {self.interface_name})
+        trunk_template: list[str] = []
+        for trunk in extra_trunks:
+            trunk_template += [f"interface {trunk}", " no shutdown", "!"]
+        self.new_configuration: list[str] = trunk_template + self.new_configuration
+        return self.new_configuration
+
     def get_l3_interfaces(self) -> None:
         """
         Parses through the config to find existing layer 3 interfaces
@@ -117,15 +239,15 @@ class Configuration:
                 self.undesired_interfaces.append(int_dict)
                 continue
 
-            # Create l3_interfaces dictionary, will be updated with new_vlanid in the 
+            # Create l3_interfaces row, will be updated with new_vlanid in the
             # converter's subnet_compare method
-            int_dict: dict[str, str] = {
-                "config": self.file_path,
-                "if_name": re.search("interface (.*)", interface).group(1),
-                "ip_subnet": self._build_ip_network(ip_addr),
-                "ip_address": self._build_ip_addr(ip_addr),
-            }
-            self.l3_interfaces.append(int_dict)
+            row: int = self.interface_table.add(
+                owner=self.file_path,
+                if_name=re.search("interface (.*)", interface).group(1),
+                address=int(self._build_ip_addr(ip_addr)),
+                prefixlen=self._build_ip_network(ip_addr).prefixlen,
+            )
+            self.l3_rows.append(row)
 
     def create_interface_mapping(self) -> None:
         """
@@ -135,7 +257,7 @@ class Configuration:
         retdict: dict = {}
         for config in self.l3_interfaces:
             retdict[config['if_name']
-                    ] = f"{self.interface_name}.{config['new_vlanid']}"
+                    ] = f"{self.trunk_for(config['new_vlanid'])}.{config['new_vlanid']}"
 
         self.interface_mapping: dict[str, str] = retdict
 
@@ -147,21 +269,21 @@ class Configuration:
         templated_session = self.securecrt_template.render(
             ip_address=self.management_ip)
         logging.debug(
-            f"Creating securecrt session template for - {self.hostname}")
+            "Creating securecrt session template for - %s", self.hostname)
         return templated_session
 
     def remove_sections(self, sections: list) -> list:
         """
-        Use CiscoConfigParse to remove specific BAD_SECTIONS from config.py
+        Use the config parser to remove specific BAD_SECTIONS from config.py
         """
-        logging.debug(f"Removing sections from {self.hostname}")
+        logging.debug("Removing sections from %s", self.hostname)
         fixed_new_config: list[str] = []
         #Use cisco conf parse to get a parsed copy of the passed in config
-        current_config_parsed = CiscoConfParse(self.new_configuration)
+        current_config_parsed = parse_config(self.new_configuration)
         #Also store list equivalent for comparison
         #CiscoConfParse supports delete_lines, but I do not like the implementation
         current_config_raw: list[str] = current_config_parsed.ioscfg
-        bad_lines: list[str] = [line for section in sections for line in current_config_parsed.find_all_children(section)]
+        bad_lines: set[str] = {line for section in sections for line in current_config_parsed.find_all_children(section)}
         for line in current_config_raw:
             if line in bad_lines:
                 #If the line is found in bad_lines goes to the next item
@@ -175,8 +297,7 @@ class Configuration:
         Try to handle the issue with CiscoConfigParse adding additional interfaces in find_all_children
         TODO - fix this... Seems to... kinda work... Some interface are skipped even in interfaces list
         """
-        current_config_parsed = CiscoConfParse(self.new_configuration, factory=True)
-        current_config_raw = current_config_parsed.ioscfg
+        current_config_parsed = parse_config(self.new_configuration, factory=True)
         for interface in interfaces:
             interface_objects = current_config_parsed.find_interface_objects(interface)
             for obj in interface_objects:
@@ -187,7 +308,7 @@ class Configuration:
         """
         With the new configuration, go through and remove all previous instances of "encapsulation" and replace it with the correct vlan encap
         """
-        logging.debug(f"Adding encap to interfaces of {self.hostname}")
+        logging.debug("Adding encap to interfaces of %s", self.hostname)
 
         self.new_configuration = [
             line for line in self.new_configuration if "encapsulation" not in line]
@@ -201,16 +322,16 @@ class Configuration:
                 for interface in self.l3_interfaces:
                     if not interface.get("new_vlanid"):
                         logging.error(
-                            f"Interface {interface} does not have a new_vlanid")
+                            "Interface %s does not have a new_vlanid", interface)
                     try:
                         # Loose check to validate that the vlanid is in the interface name
                         # Without this, we could potentially add the wrong vlanid to the wrong interface
                         if str(interface.get('new_vlanid')) in matched_interface:
                             self.new_configuration[i] += f" encapsulation dot1q {interface['new_vlanid']}\n"
                     except KeyError:
-                        logging.error(f"Issue with {interface}")
+                        logging.error("Issue with %s", interface)
 
-        logging.debug(f"New config: {self.new_configuration}")
+        logging.debug("New config for %s is %s lines", self.hostname, len(self.new_configuration))
         return self.new_configuration
 
     def add_mgmt_intf(
@@ -248,14 +369,14 @@ class Configuration:
         Parse through the device configuration and replace the interface IDs with the subinterface
         """
         logging.debug(
-            f"Replacing all interfaces as needed from {self.hostname}")
+            "Replacing all interfaces as needed from %s", self.hostname)
         new_config = []
         for line in self.unparsed_config:
             config_flag = False
             match = re.search(ALL_INTERFACE_FLAVORS_REGEX, line)
             if match:
                 for interface in self.l3_interfaces:
-                    new_if_name = f"{self.interface_name}.{interface.get('new_vlanid')}"
+                    new_if_name = f"{self.trunk_for(interface.get('new_vlanid'))}.{interface.get('new_vlanid')}"
                     if interface.get("if_name") == match.group():
                         new_config.append(
                             line.replace(match.group(), new_if_name)
@@ -264,7 +385,7 @@ class Configuration:
                         break
             if not config_flag:
                 new_config.append(line)
-        logging.debug(f"New config: {new_config}")
+        logging.debug("New config for %s is %s lines", self.hostname, len(new_config))
         return new_config
 
     @staticmethod
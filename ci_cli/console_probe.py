@@ -0,0 +1,85 @@
+"""
+Author: James Duvall
+Purpose: Quick look at every node's EVE telnet console before the health check. All consoles are opened at
+once, sent a CR, and the reply is classified, so a dead node is sent to recycle in seconds instead of
+waiting out the pyATS connection timeout.
+"""
+
+import re
+import sys
+import asyncio
+
+if 'pytest' in sys.modules:
+    from tests.config import CONSOLE_PROBE_TIMEOUT
+else:
+    from config import CONSOLE_PROBE_TIMEOUT
+
+# Probe results
+NO_LISTENER: str = "no_listener"
+NO_PROMPT: str = "no_prompt"
+ROMMON: str = "rommon"
+READY: str = "ready"
+# Worth a full pyATS connect, a node still printing boot messages has no prompt yet but may come up
+VIABLE: tuple[str, ...] = (READY, NO_PROMPT)
+
+# telnet negotiation (IAC + command + option, or IAC SB ... IAC SE) sent by the console server
+TELNET_IAC = re.compile(rb"\xff\xfa.*?\xff\xf0|\xff[\xfb-\xfe].|\xff[\xf0-\xfa]", re.S)
+ROMMON_PROMPT = re.compile(r"rommon\s*\d*\s*>\s*$", re.I | re.M)
+READY_PROMPT = re.compile(
+    r"([\w.\-]+(\([\w.\-]+\))?[>#]\s*$)|(Username:\s*$)|(Password:\s*$)|(Press RETURN to get started)|(\[yes/no\]:?\s*$)", re.M
+)
+
+
+def classify(reply: bytes) -> str:
+    """
+    Probe result for what came back from the console after a CR
+    """
+    text: str = TELNET_IAC.sub(b"", reply).decode("ascii", errors="ignore")
+    if ROMMON_PROMPT.search(text):
+        return ROMMON
+    if READY_PROMPT.search(text):
+        return READY
+    return NO_PROMPT
+
+
+async def probe_console(ip: str, port: int, timeout: float = CONSOLE_PROBE_TIMEOUT) -> str:
+    """
+    Open one console, send a CR and read until a prompt shows up or timeout seconds have passed
+    """
+    loop = asyncio.get_running_loop()
+    deadline: float = loop.time() + timeout
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return NO_LISTENER
+    reply: bytes = b""
+    try:
+        writer.write(b"\r\n")
+        await writer.drain()
+        while loop.time() < deadline:
+            try:
+                chunk = await asyncio.wait_for(reader.read(1024), deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+            reply += chunk
+            if classify(reply) != NO_PROMPT:
+                break
+    except OSError:
+        pass
+    finally:
+        writer.close()
+    return classify(reply)
+
+
+def probe_consoles(consoles: dict[str, tuple[str, int]], timeout: float = CONSOLE_PROBE_TIMEOUT) -> dict[str, str]:
+    """
+    device name -> probe result for every (ip, port) console, probed concurrently
+    """
+    async def probe_all() -> list[str]:
+        return await asyncio.gather(*(probe_console(ip, port, timeout) for ip, port in consoles.values()))
+
+    if not consoles:
+        return {}
+    return dict(zip(consoles, asyncio.run(probe_all())))
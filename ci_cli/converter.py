@@ -14,6 +14,12 @@ import json
 import ipaddress
 import time
 from .configuration import Configuration
+from .interface_table import InterfaceTable, prefix_to_mask
+from .subnet_grouping import assign_vlans_vectorized, numpy_available
+from .interface_mapper import save_device_maps, DEVICE_MAP_DIR
+from .artifact_writer import ArtifactWriter
+from .artifact_archive import ArchiveWriter
+from .sharding import in_shard, shard_summary, summary_name, load_summaries, shard_plan, apply_plan, SHARD_DIR, PLAN_FILE
 # Importing the config.py file, depending on pytest or not
 # Uses sys.modules to determine how it's being ran
 if 'pytest' in sys.modules:
@@ -22,16 +28,22 @@ if 'pytest' in sys.modules:
         CSRV_CONFIGS,
         IOSV_CONFIGS,
         BAD_SECTIONS,
-        MANAGEMENT_SUBNETS
+        MANAGEMENT_SUBNETS,
+        BRIDGE_MAX_NODES
     )
 else:
     from config import (
         CSRV_CONFIGS,
         IOSV_CONFIGS,
         BAD_SECTIONS,
-        MANAGEMENT_SUBNETS
+        MANAGEMENT_SUBNETS,
+        BRIDGE_MAX_NODES
     )
 
+# Interface count where the numpy subnet compare starts beating the python one
+# see benchmarks/subnet_compare_bench.py to re-measure
+VECTORIZE_THRESHOLD: int = 100
+
 class Converter:
     """
     Responsible for directing the configuration conversion
@@ -47,6 +59,8 @@ class Converter:
         config_file_ext: str = ".txt",
         vlan_seed: int = 2,
         output_path: str = "",
+        low_memory: bool = False,
+        archive: bool = False,
     ) -> None:
         if configs is None:
             self.configs: list[Configuration] = []
@@ -57,6 +71,22 @@ class Converter:
         self.vlan_seed: int = vlan_seed
         self.output_path: str = output_path
         self.user: str = user
+        # Two pass mode, a config's lines and parse tree only live while that config is being worked on
+        self.low_memory: bool = low_memory
+        # Shared by every Configuration loaded through load_configs
+        self.interface_table: InterfaceTable = InterfaceTable()
+        # Position of each loaded config in the sorted list of every config, and how many there are.
+        # Only differs from range(len(self.configs)) when a shard of the configs is loaded
+        self.config_indexes: list[int] = []
+        self.total_configs: int = 0
+        # Filled by assign_bridges in sharded bridge mode, empty means one "Local Bridge" for everything
+        self.bridges: list[dict] = []
+        # Output files are queued here and written in the background, see flush_output
+        # archive mode streams them into one output_path.zip instead
+        self.archive: bool = archive
+        self.writer: ArtifactWriter | ArchiveWriter = (
+            ArchiveWriter(f"{output_path.rstrip('/')}.zip", root=output_path) if archive else ArtifactWriter()
+        )
         try:
             self.management_subnet = ipaddress.IPv4Network(
                 MANAGEMENT_SUBNETS[self.user]["management_network"])
@@ -70,8 +100,10 @@ class Converter:
     def create_output_directories(self) -> None:
         """
         Create directories for output
-        provided output path and securecrt_sessions
+        provided output path, securecrt_sessions and interface_map. Nothing to create in archive mode
         """
+        if self.archive:
+            return
         try:
             os.mkdir(self.output_path)
         except FileExistsError:
@@ -80,21 +112,44 @@ class Converter:
             os.mkdir(f"{self.output_path}/securecrt_sessions")
         except FileExistsError:
             logging.debug("securecrt_sessions folder already exists")
+        os.makedirs(f"{self.output_path}/{DEVICE_MAP_DIR}", exist_ok=True)
 
-    def load_configs(self) -> None:
+    def load_configs(self, shard: tuple[int, int] = None) -> None:
         """
         With self.source_path, open all configurations and build the config classes associated with each.
+        Files are taken in sorted path order, so every run (and every shard) numbers the configs the same way
+        shard (index, count) only loads that shard's configs, see sharding.py
         """
-        for dirpath, _, filenames in os.walk(self.source_path):
-            for file_ in filenames:
+        index: int = 0
+        for dirpath, dirnames, filenames in os.walk(self.source_path):
+            dirnames.sort()
+            for file_ in sorted(filenames):
                 if file_.endswith(self.config_file_ext) and "LAB" not in file_:
-                    # Combine dirpath and file to get full path
-                    full_path: str = os.path.join(dirpath, file_)
-                    self.configs.append(
-                        Configuration(
-                            file_=file_, file_path=full_path
+                    if shard is None or in_shard(index, shard):
+                        # Combine dirpath and file to get full path
+                        full_path: str = os.path.join(dirpath, file_)
+                        self.configs.append(
+                            Configuration(
+                                file_=file_, file_path=full_path, interface_table=self.interface_table, lazy=self.low_memory
+                            )
                         )
-                    )
+                        self.config_indexes.append(index)
+                    index += 1
+        self.total_configs = index
+
+    def parse_configs(self, progress=iter) -> None:
+        """
+        First pass over every config, hostname, device type and l3 interfaces
+        In low memory mode the parse tree is dropped as soon as a config is summarized
+        progress wraps the config list, e.g. tqdm
+        """
+        for config in progress(self.configs):
+            config.get_current_parsed_config()
+            config.get_hostname()
+            config.get_device_type()
+            config.get_l3_interfaces()
+            if self.low_memory:
+                config.release()
 
     def save_securecrt_sessions(self) -> None:
         """
@@ -106,13 +161,13 @@ class Converter:
             if not securecrt_session:
                 logging.error("Failed to create securecrt session template")
             logging.debug(
-                f"Saving securecrt session for host {configuration.hostname}")
+                "Saving securecrt session for host %s", configuration.hostname)
             self.save_output(file_=f"{configuration.hostname}.ini",
                              save_me=securecrt_session, type_="securecrt")
 
     def save_interface_mapping(self) -> None:
         """
-        Saves the interface mapping to an output file
+        Saves the interface mapping to an output file, and one compact file per device in interface_map/
         """
         overall_mapping: dict[str, dict] = {"devices": {}}
         for config in self.configs:
@@ -120,6 +175,8 @@ class Converter:
 
         self.save_output(file_="overall_interface_map.json",
                          save_me=overall_mapping, type_="json")
+        # per device copies so the test mapper only loads the devices a test touches
+        save_device_maps(self.output_path, overall_mapping["devices"], writer=self.writer)
 
     def create_lab_vars(self) -> None:
         """
@@ -140,107 +197,183 @@ class Converter:
             working_dict['left'], working_dict['top'] = self._calculate_coords(
                 idx=idx + 1, total=len(self.configs))
             logging.debug(
-                f"Coords = {working_dict['left']}, {working_dict['top']}")
+                "Coords = %s, %s", working_dict['left'], working_dict['top'])
             working_dict['hostname'] = f"{config.hostname}"
             working_dict['config_file'] = f"LAB-{config.file_}"
             working_dict['label'] = config.file_
+            # Sharded bridge mode only - which eve interface attaches to which bridge network
+            # and how many ethernets the node needs for those extra trunks. Nodes without l3
+            # interfaces get an empty list, there is no "Local Bridge" for them to fall back to
+            if self.bridges:
+                working_dict['trunks'] = [
+                    {"bridge": bridge_name, "interface": config.eve_interface_index(nic)}
+                    for bridge_name, nic in config.bridge_nics.items()
+                ]
+                working_dict['ethernet'] = self._ethernet_count(config)
 
             lab_var_template['nodes'].append(working_dict)
 
+        if self.bridges:
+            lab_var_template['bridges'] = [
+                {"name": bridge["name"], "vlans": bridge["vlans"]} for bridge in self.bridges
+            ]
+
         self.save_output(file_="labvars.json",
                          save_me=lab_var_template, type_="json")
 
     def save_output(self, file_: str, save_me: str|list, type_: str="config", config: Configuration=None) -> None:
         """
-        Save the configuration to the provided destination path
+        Queue the configuration to be saved to the provided destination path, written by flush_output
         """
         if type_ == "config":
-            with open(f"{self.output_path}/{file_}", "w", encoding="UTF-8") as opened_file:
-                logging.debug(f"Saving config {self.output_path}/{file_}")
-                if config.device_type == "csrv":
-                    # Uses CSRV_CONFIGS from config.py file
-                    final_config: str = CSRV_CONFIGS + '\n'.join(save_me)
-                else:
-                    # Uses IOSV_CONFIGS from config.py file
-                    final_config: str = IOSV_CONFIGS + '\n'.join(save_me)
-
-                opened_file.write(final_config)
+            logging.debug("Saving config %s/%s", self.output_path, file_)
+            if config.device_type == "csrv":
+                # Uses CSRV_CONFIGS from config.py file
+                final_config: str = CSRV_CONFIGS + '\n'.join(save_me)
+            else:
+                # Uses IOSV_CONFIGS from config.py file
+                final_config: str = IOSV_CONFIGS + '\n'.join(save_me)
+            self.writer.write(f"{self.output_path}/{file_}", final_config)
 
         elif type_ == "json":
-            with open(f"{self.output_path}/{file_}", "w", encoding="UTF-8") as opened_file:
-                logging.debug(f"Saving json {self.output_path}/{file_}")
-                final_map: dict = json.dumps(save_me, indent=2)
-                opened_file.write(final_map)
+            logging.debug("Saving json %s/%s", self.output_path, file_)
+            final_map: str = json.dumps(save_me, indent=2)
+            self.writer.write(f"{self.output_path}/{file_}", final_map)
 
         elif type_ == "securecrt":
-            with open(f"{self.output_path}/securecrt_sessions/{file_}", "w", encoding="UTF-8") as opened_file:
-                logging.debug(f"Saving securecrt {self.output_path}/{file_}")
-                opened_file.write(save_me)
+            logging.debug("Saving securecrt %s/%s", self.output_path, file_)
+            self.writer.write(f"{self.output_path}/securecrt_sessions/{file_}", save_me)
+
+    def save_shard_summary(self, shard: tuple[int, int]) -> None:
+        """
+        Sharded first pass, save this shard's parsed configs to output_path/shards for merge_shards
+        """
+        os.makedirs(f"{self.output_path}/{SHARD_DIR}", exist_ok=True)
+        self.save_output(file_=f"{SHARD_DIR}/{summary_name(shard)}",
+                         save_me=shard_summary(self, shard), type_="json")
+
+    def merge_shards(self) -> None:
+        """
+        Load every shard summary from output_path/shards in place of load_configs and parse_configs
+        """
+        load_summaries(self, f"{self.output_path}/{SHARD_DIR}")
+
+    def save_shard_plan(self) -> None:
+        """
+        After subnet_compare, assign_bridges and assign_management_ips on the merged configs, save what they decided
+        """
+        self.save_output(file_=f"{SHARD_DIR}/{PLAN_FILE}", save_me=shard_plan(self), type_="json")
 
-    def subnet_compare(self) -> None:
+    def apply_shard_plan(self) -> None:
+        """
+        Sharded last pass, takes the place of subnet_compare for this shard's parsed configs
+        """
+        plan_path: str = f"{self.output_path}/{SHARD_DIR}/{PLAN_FILE}"
+        try:
+            with open(plan_path, "r", encoding="UTF-8") as plan_file:
+                plan: dict = json.loads(plan_file.read())
+        except FileNotFoundError:
+            logging.error("No shard plan at %s, run merge_shards first", plan_path)
+            sys.exit(1)
+        apply_plan(self, plan)
+
+    def flush_output(self) -> dict[str, int]:
+        """
+        Wait for every queued output file to be written, call once at the end of a conversion
+        """
+        return self.writer.flush()
+
+    def subnet_compare(self, engine: str = "auto") -> None:
         """
         Group interfaces by their subnets across all configurations and assigns vlanids
         Modifies each configuration's l3_interfaces properties to add key new_vlanid
+        engine can be python, numpy, or auto (numpy when installed and there are enough interfaces to be worth it)
         """
 
-        all_interfaces: list[dict] = [
+        all_interfaces: list = [
             intf for config in self.configs for intf in config.l3_interfaces]
 
+        if engine == "auto":
+            engine = "numpy" if numpy_available() and len(all_interfaces) >= VECTORIZE_THRESHOLD else "python"
+        logging.info("Comparing %s interfaces with the %s subnet compare", len(all_interfaces), engine)
+        if engine == "numpy":
+            self._subnet_compare_numpy(all_interfaces)
+        else:
+            self._subnet_compare_python(all_interfaces)
+
+    def _subnet_compare_numpy(self, all_interfaces: list) -> None:
+        """
+        Vectorized subnet compare, see subnet_grouping.assign_vlans_vectorized
+        """
+        vlanids, self.vlan_seed = assign_vlans_vectorized(
+            addresses=[intf.address for intf in all_interfaces],
+            prefixlens=[intf.prefixlen for intf in all_interfaces],
+            vlan_seed=self.vlan_seed,
+        )
+        for interface, vlanid in zip(all_interfaces, vlanids):
+            interface["new_vlanid"] = vlanid
+
+    def _subnet_compare_python(self, all_interfaces: list) -> None:
+        """
+        Pure python subnet compare, compares every interface against every other interface
+        """
+        # file path -> Configuration, avoids rescanning self.configs for every interface
+        configs_by_path: dict[str, Configuration] = {config.file_path: config for config in self.configs}
+
         processed_ip_addresses = set()
         for interface in all_interfaces:
             # If we've already seen this ip, skip it
-            if interface["ip_address"] in processed_ip_addresses:
+            if interface.address in processed_ip_addresses:
                 continue
 
             # Get all interfaces within the current interface's lan segment
-            # intf["ip_address"] is an IPv4Address object, and interface["ip_subnet"] is an IPv4 Network Object
-            matched_interfaces: list[dict] = [intf for intf in all_interfaces if intf["ip_address"]
-                                              in interface["ip_subnet"] and intf != interface]
+            # Compared as integers, (address & mask) == network, no ipaddress objects are built here
+            network: int = interface.network
+            mask: int = prefix_to_mask(interface.prefixlen)
+            matched_interfaces: list = [intf for intf in all_interfaces if intf.address & mask == network
+                                        and intf is not interface]
 
             # Find the corresponding Configuration object for the interface
             # This is needed for interface assignment
-            config_obj = next(
-                config for config in self.configs if config.file_path == interface["config"])
+            config_obj = configs_by_path[interface["config"]]
 
             # If there are any interfaces in the same lan segment
             # Choose a unique vlan ID
             if matched_interfaces:
                 interface["new_vlanid"] = self.vlan_seed
                 logging.debug(
-                    f"Interface {interface['if_name']} is being assigned to new interface {config_obj.interface_name}.{self.vlan_seed}")
+                    "Interface %s is being assigned to new interface %s.%s", interface['if_name'], config_obj.interface_name, self.vlan_seed)
                 # Update the Configuration's l3_interfaces property matching each matched_interface
                 # Give them a dedicated vlan
                 for matched_intf in matched_interfaces:
                     matched_intf["new_vlanid"] = self.vlan_seed
                     # Since we've seen this intf's ip, add it to the processed_ip_addresses set
-                    processed_ip_addresses.add(matched_intf["ip_address"])
+                    processed_ip_addresses.add(matched_intf.address)
 
                 # Increment vlan seed so the next interface group is different
                 self.vlan_seed += 1
-                processed_ip_addresses.add(interface["ip_address"])
+                processed_ip_addresses.add(interface.address)
 
             # If the interface is lonely in its own lan segment, still give it a unique vlanid (simulates interface up/up)
             else:
                 interface["new_vlanid"] = self.vlan_seed
                 logging.debug(
-                    f"Interface {interface['if_name']} is being assigned to new interface {config_obj.interface_name}.{self.vlan_seed}")
+                    "Interface %s is being assigned to new interface %s.%s", interface['if_name'], config_obj.interface_name, self.vlan_seed)
                 self.vlan_seed += 1
-                processed_ip_addresses.add(interface["ip_address"])
+                processed_ip_addresses.add(interface.address)
 
     def manipulate_configs(self) -> None:
         """
         Make new configurations from the old and place them in an output directory
+        Management addresses are allocated first, unless they came from a shard plan
         """
-        # Create a list of management addresses to allocate
-        mgmt_ips: list[ipaddress.IPv4Address] = list(self.management_subnet)
-        # Reverse so that we allocate addresses in sequence 1,2,3,4...etc
-        mgmt_ips.reverse()
-        # Remove .0, assuming it's a network address
-        mgmt_ips.pop()
+        if any(configuration.management_ip is None for configuration in self.configs):
+            self.assign_management_ips()
         for configuration in self.configs:
-            logging.debug(f"Manipulate config for {configuration.hostname}")
-            # Assign the configuration object a management_ip that is popped from the mgmt_ips list
-            configuration.management_ip = mgmt_ips.pop()
+            logging.debug("Manipulate config for %s", configuration.hostname)
+            if configuration.unparsed_config is None:
+                # low memory mode, second pass re-reads the file now that the vlans are assigned
+                configuration.load_config()
             configuration.new_configuration= configuration.replace_interfaces()
             configuration.new_configuration = configuration.add_encap()
             configuration.new_configuration = configuration.add_mgmt_intf(self.management_subnet.netmask, self.management_gateway)
@@ -253,10 +386,82 @@ class Converter:
             configuration.new_configuration = configuration.remove_undesired_interfaces(
                 [interface.get("if_name") for interface in configuration.undesired_interfaces]
             )
-            logging.debug(f"{configuration.hostname} took {time.perf_counter() - start_time:.2f} to convert")
+            # Added after the undesired interfaces are removed, a production Gi0/3 without an ip would take our trunk with it
+            configuration.new_configuration = configuration.add_trunk_intfs()
+            logging.debug("%s took %.2f to convert", configuration.hostname, time.perf_counter() - start_time)
             # Save the new configuration to the output directory
             self.save_output(file_=f"LAB-{configuration.file_}",
                              save_me=configuration.new_configuration, type_="config", config=configuration)
+            configuration.create_interface_mapping()
+            if self.low_memory:
+                configuration.release()
+
+    def assign_management_ips(self) -> None:
+        """
+        Give every configuration a management_ip from the user's management subnet, in config order
+        """
+        # Create a list of management addresses to allocate
+        mgmt_ips: list[ipaddress.IPv4Address] = list(self.management_subnet)
+        # Reverse so that we allocate addresses in sequence 1,2,3,4...etc
+        mgmt_ips.reverse()
+        # Remove .0, assuming it's a network address
+        mgmt_ips.pop()
+        for configuration in self.configs:
+            # Assign the configuration object a management_ip that is popped from the mgmt_ips list
+            configuration.management_ip = mgmt_ips.pop()
+
+    def assign_bridges(self, max_nodes: int = BRIDGE_MAX_NODES) -> None:
+        """
+        Sharded bridge mode, run after subnet_compare and before manipulate_configs
+        Packs the vlan segments found by subnet_compare into multiple bridge networks so each
+        linux bridge only floods the segments of the nodes attached to it.
+        Each segment lives on exactly one bridge, nodes get one trunk nic per bridge they touch
+        """
+        # vlanid -> indexes of the configs that have an interface in that segment
+        segments: dict[int, set[int]] = {}
+        for idx, config in enumerate(self.configs):
+            for interface in config.l3_interfaces:
+                segments.setdefault(interface["new_vlanid"], set()).add(idx)
+
+        self.bridges = []
+        for vlanid in sorted(segments):
+            members: set[int] = segments[vlanid]
+            if len(members) > max_nodes:
+                logging.warning(
+                    "Vlan %s has %s nodes, more than the %s node bridge limit. Giving it a dedicated bridge", vlanid, len(members), max_nodes)
+            fits: list[dict] = [bridge for bridge in self.bridges if len(bridge["nodes"] | members) <= max_nodes]
+            if fits:
+                # Prefer the bridge that already has the most of these nodes (fewest new nics),
+                # then the fullest one so we don't open a bridge per segment
+                bridge = max(fits, key=lambda bridge: (len(bridge["nodes"] & members), len(bridge["nodes"])))
+            else:
+                bridge = {"name": f"Bridge {len(self.bridges) + 1}", "nodes": set(), "vlans": []}
+                self.bridges.append(bridge)
+            bridge["nodes"] |= members
+            bridge["vlans"].append(vlanid)
+
+        for idx, config in enumerate(self.configs):
+            config.bridge_nics = {}
+            config.trunk_interfaces = {}
+            # nic 1 is the primary trunk, nic 2 is management, extra trunks start at 3
+            nics = iter([1] + list(range(3, 3 + len(self.bridges))))
+            for bridge in self.bridges:
+                if idx not in bridge["nodes"]:
+                    continue
+                nic: int = next(nics)
+                config.bridge_nics[bridge["name"]] = nic
+                for vlanid in bridge["vlans"]:
+                    config.trunk_interfaces[vlanid] = config.nic_name(nic)
+            logging.debug("%s attached to bridges %s", config.hostname, config.bridge_nics)
+        logging.info("Split %s segments across %s bridges", len(segments), len(self.bridges))
+
+    @staticmethod
+    def _ethernet_count(config: Configuration) -> int:
+        """
+        Number of ethernets to give a node so every trunk nic and the management nic exist in EVE
+        """
+        highest_nic: int = max([2] + list(config.bridge_nics.values()))
+        return config.eve_interface_index(highest_nic) + 1
 
     @staticmethod
     def _calculate_coords(idx: int, total: int) -> tuple:
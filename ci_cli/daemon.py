@@ -0,0 +1,191 @@
+"""
+Author: James Duvall
+Purpose: Long running ci_cli process for a pipeline. It listens on a local unix socket and runs the normal
+click commands in process, one at a time, streaming their output back to the client. pyATS and the rest are
+imported once, EVE labs (login session, testbed and open console connections) are reused between commands,
+and parsed configs are kept for files that haven't changed. Lab topology is fetched fresh by every command,
+other runners and the EVE UI change labs behind the daemon's back.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import socketserver
+from contextlib import redirect_stdout, redirect_stderr
+from typing import Callable
+
+import click
+
+from .log_setup import LOG_FORMAT
+from .configuration import cache_parsed_files
+
+if 'pytest' in sys.modules:
+    from tests.config import DAEMON_SESSION_MAX_AGE
+else:
+    from config import DAEMON_SESSION_MAX_AGE
+
+# lab_key -> (lab object, monotonic time it logged in), only filled while serving
+WARM_LABS: dict[tuple, tuple[object, float]] = {}
+_serving: bool = False
+
+
+def lab_key(lab_name: str, eve_urls: tuple[str, ...]) -> tuple:
+    """
+    What a warm lab is bound to, the EVE host(s) and user as this command resolves them
+    Commands that rely on EVE_URL / EVE_USERNAME from their environment get a lab for those values
+    """
+    return (lab_name, tuple(eve_urls) or (os.getenv("EVE_URL"),), os.getenv("EVE_USERNAME"))
+
+
+def warm_lab(key: tuple, build: Callable[[], object], source_path: str = None) -> object:
+    """
+    Outside the daemon this just builds the lab. In the daemon the lab built by an earlier command is reused
+    (pointed at this command's source_path), unless its session is older than DAEMON_SESSION_MAX_AGE
+    """
+    if not _serving:
+        return build()
+    warm = WARM_LABS.get(key)
+    if warm is not None and time.monotonic() - warm[1] < DAEMON_SESSION_MAX_AGE:
+        lab = warm[0]
+        lab.use_source(source_path)
+        logging.debug("Reusing the warm lab for %s", key)
+        return lab
+    if warm is not None:
+        drop_lab(warm[0])
+    lab = build()
+    WARM_LABS[key] = (lab, time.monotonic())
+    return lab
+
+
+def drop_lab(lab) -> None:
+    """
+    Close a warm lab's console connections before it is thrown away
+    """
+    for eve_lab in getattr(lab, "labs", {None: lab}).values():
+        if getattr(eve_lab, "live_testbed", None) is None:
+            continue
+        for device in eve_lab.live_testbed.devices.values():
+            if device.is_connected():
+                device.disconnect()
+
+
+class _ClientStream:
+    """
+    File-like object that sends everything written to it to the client as {"out": text} lines
+    """
+
+    def __init__(self, wfile) -> None:
+        self.wfile = wfile
+        self.lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        if text:
+            with self.lock:
+                try:
+                    self.wfile.write(json.dumps({"out": text}).encode("UTF-8") + b"\n")
+                    self.wfile.flush()
+                except OSError:
+                    # client hung up, the command still runs to the end
+                    pass
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+    def isatty(self) -> bool:
+        return False
+
+
+def run_command(cli: click.Group, argv: list[str], out: _ClientStream) -> int:
+    """
+    Run one command line through the click group with its output sent to out, returns the exit code
+    """
+    handler = logging.StreamHandler(out)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger('')
+    root.addHandler(handler)
+    try:
+        with redirect_stdout(out), redirect_stderr(out):
+            cli.main(args=argv, prog_name="ci_cli.py", standalone_mode=False)
+        return 0
+    except click.exceptions.Exit as err:
+        return err.exit_code
+    except click.ClickException as err:
+        err.show(file=out)
+        return err.exit_code
+    except click.Abort:
+        return 1
+    except SystemExit as err:
+        return err.code if isinstance(err.code, int) else (0 if err.code is None else 1)
+    # pylint: disable=W0718
+    except Exception:
+        logging.exception("Command %s failed in the daemon", argv)
+        return 1
+    finally:
+        root.removeHandler(handler)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    One client connection, one {"argv", "cwd", "env"} or {"stop": true} request
+    """
+
+    def handle(self) -> None:
+        request: dict = json.loads(self.rfile.readline() or b"{}")
+        out = _ClientStream(self.wfile)
+        if request.get("stop"):
+            out.write("ci_cli daemon stopping\n")
+            self._reply(0)
+            threading.Thread(target=self.server.shutdown).start()
+            return
+        logging.info("Daemon running %s", request.get("argv"))
+        # commands read EVE credentials from the environment and write files relative to the cwd. The client's
+        # environment replaces the daemon's, a variable the client didn't set must not leak in from the daemon
+        saved_cwd, saved_env = os.getcwd(), dict(os.environ)
+        try:
+            os.environ.clear()
+            os.environ.update(request.get("env", {}))
+            os.chdir(request.get("cwd", saved_cwd))
+            code: int = run_command(self.server.cli, request.get("argv", []), out)
+        finally:
+            os.chdir(saved_cwd)
+            os.environ.clear()
+            os.environ.update(saved_env)
+        self._reply(code)
+
+    def _reply(self, code: int) -> None:
+        try:
+            self.wfile.write(json.dumps({"exit": code}).encode("UTF-8") + b"\n")
+        except OSError:
+            pass
+
+
+def serve(cli: click.Group, socket_path: str) -> None:
+    """
+    Listen on socket_path until a stop request, commands run one at a time
+    """
+    global _serving  # pylint: disable=W0603
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socketserver.UnixStreamServer(socket_path, _RequestHandler)
+    server.cli = cli
+    # only our user may drive the daemon, it runs with our EVE credentials
+    os.chmod(socket_path, 0o600)
+    _serving = True
+    cache_parsed_files(True)
+    logging.info("ci_cli daemon listening on %s", socket_path)
+    try:
+        server.serve_forever()
+    finally:
+        _serving = False
+        cache_parsed_files(False)
+        for lab, _ in WARM_LABS.values():
+            drop_lab(lab)
+        WARM_LABS.clear()
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        logging.info("ci_cli daemon stopped")
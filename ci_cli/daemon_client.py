@@ -0,0 +1,73 @@
+"""
+Author: James Duvall
+Purpose: Thin client side of the ci_cli daemon. ci_cli.py calls forward_to_daemon before its heavy imports,
+when a daemon is listening the command line is sent to it and its output is printed here, otherwise the
+command runs locally as before. Only the standard library is imported so forwarding stays fast.
+"""
+
+import os
+import sys
+import json
+import socket
+
+if 'pytest' in sys.modules:
+    from tests.config import DAEMON_SOCKET
+else:
+    from config import DAEMON_SOCKET
+
+# Set to run a command locally even when a daemon is listening
+NO_DAEMON_ENV: str = "CI_CLI_NO_DAEMON"
+# Overrides DAEMON_SOCKET
+SOCKET_ENV: str = "CI_CLI_SOCKET"
+
+
+def socket_path() -> str:
+    return os.getenv(SOCKET_ENV) or DAEMON_SOCKET
+
+
+def send(request: dict, path: str, out=None) -> int | None:
+    """
+    Send one request to the daemon and copy its output to out as it arrives
+    Returns the command's exit code, None when no daemon is listening on path
+    """
+    out = out if out is not None else sys.stdout
+    if not os.path.exists(path):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError:
+        # stale socket file from a daemon that died
+        client.close()
+        return None
+    with client, client.makefile("rwb") as stream:
+        stream.write(json.dumps(request).encode("UTF-8") + b"\n")
+        stream.flush()
+        for line in stream:
+            message: dict = json.loads(line)
+            if "exit" in message:
+                return message["exit"]
+            out.write(message.get("out", ""))
+            out.flush()
+    # daemon went away mid command
+    return 1
+
+
+def forward(argv: list[str], path: str = None, out=None) -> int | None:
+    """
+    Run a ci_cli command line in the daemon, see send
+    """
+    request: dict = {"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}
+    return send(request, path or socket_path(), out)
+
+
+def forward_to_daemon(argv: list[str]) -> None:
+    """
+    Exit with the daemon's exit code once it has run the command, return to run it locally when there is no daemon
+    The daemon command itself always runs locally
+    """
+    if os.getenv(NO_DAEMON_ENV) or "daemon" in argv:
+        return
+    code = forward(argv)
+    if code is not None:
+        sys.exit(code)
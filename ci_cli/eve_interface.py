@@ -19,10 +19,22 @@ import requests
 import yaml
 from pyats.topology import loader
 from unicon.core.errors import ConnectionError as CE
-from config import CSRV_IMAGE, IOSV_IMAGE, CSRV_IMAGE_TYPE
+from config import (
+    CSRV_IMAGE, IOSV_IMAGE, CSRV_IMAGE_TYPE, EVE_HOST_CAPACITY, EVE_HOST_OVERRIDES, EVE_API_WORKERS, HOT_APPLY_ENABLED
+)
+from .resource_planner import ResourcePlanner, node_resources, host_free_capacity
+from .config_delta import config_delta
+from .topology_cache import TopologyCache
+from .console_probe import probe_consoles, VIABLE
+from .artifact_archive import ArtifactSource
 requests.packages.urllib3.disable_warnings()
 yaml.Dumper.ignore_aliases = lambda *args: True
 
+# EVE node status for a running node (0 is stopped)
+EVE_NODE_RUNNING: int = 2
+# Written by mod_lab_from_cicd, read by test_handler --changed_nodes
+CHANGED_NODES_FILE: str = "changed_nodes.json"
+
 def handle_http_errors(func):
     """
     A decorator that wraps the passed-in function, allowing it to execute and handle
@@ -38,27 +50,27 @@ def handle_http_errors(func):
             status_code = e.response.status_code
             if status_code == 400:
                 logging.error(
-                    f"400 Conflict (likely already exists): {e.request.url} - {e}")
+                    "400 Conflict (likely already exists): %s - %s", e.request.url, e)
             elif status_code == 401:
-                logging.error(f"No longer authenticated - {e}")
+                logging.error("No longer authenticated - %s", e)
                 raise
             elif status_code == 404:
-                logging.error(f"404 Not Found: {e.request.url} - {e}")
+                logging.error("404 Not Found: %s - %s", e.request.url, e)
             elif status_code == 412:
                 logging.error(
-                    f"I believe EVE throws 412 for unauth; relogin and attempt again - {e}")
+                    "I believe EVE throws 412 for unauth; relogin and attempt again - %s", e)
             elif status_code == 429:
-                logging.error(f"429 Too many requests: {e.request.url} - {e}")
+                logging.error("429 Too many requests: %s - %s", e.request.url, e)
             elif str(status_code)[0] == "5":
-                logging.error(f"5XX Server Error at: {e.request.url} - {e}")
+                logging.error("5XX Server Error at: %s - %s", e.request.url, e)
             else:
-                logging.error(f"HTTP Error {status_code}: {e.request.url} - {e}")
+                logging.error("HTTP Error %s: %s - %s", status_code, e.request.url, e)
         except requests.exceptions.RequestException as e:
-            logging.error(f"Request Error: {str(e)}")
+            logging.error("Request Error: %s", str(e))
         # pylint: disable=W0718
         except Exception as e:
             # Handle any other exceptions
-            logging.error(f"Unexpected error: {str(e)}")
+            logging.error("Unexpected error: %s", str(e))
     return wrapper
 
 #pylint: disable=R0904
@@ -67,50 +79,122 @@ class EVEInterface:
     Interface for interacting with labs we create from the pipeline
     """
 
-    def __init__(self, lab_name: str, source_path: str = None):
+    def __init__(self, lab_name: str, source_path: str = None, eve_url: str = None, labvars: dict = None):
         self.lab_name: str = lab_name
         self.source_path: str = source_path
+        # labvars can be handed in directly (multi host partitions), otherwise read from source_path
+        self.labvars: dict = labvars
+        # create_configs output, a directory or an --archive zip
+        self.artifacts: ArtifactSource | None = ArtifactSource(source_path) if source_path else None
         self.lab_r_session = requests.Session()
         self.headers: dict[str, str] = {"accept": "application/json"}
-        # ENV vars provided on the gitlab runner
-        self.eve_url: str = os.getenv("EVE_URL")
+        # ENV vars provided on the gitlab runner, eve_url overrides EVE_URL for multi host labs
+        self.eve_url: str = eve_url or os.getenv("EVE_URL")
         self.eve_username: str = os.getenv("EVE_USERNAME")
         self.eve_password: str = os.getenv("EVE_PASSWORD")
+        # pyATS testbed loaded on first hot apply or health check, connections are reused across nodes
+        self.live_testbed = None
+        # where build_testbed saved the testbed, refresh_testbed patches it in place
+        self.tb_output_path: str | None = None
+        self.changed_nodes: list[str] = []
+        # nodes and configs as EVE reported them this session, see TopologyCache
+        self.topology = TopologyCache()
         self.login()
 
-    @handle_http_errors
+    def use_source(self, source_path: str = None) -> None:
+        """
+        Point a lab kept by the daemon at the next command's create_configs output, labvars are read again
+        The topology cache is dropped, the lab may have changed since the last command
+        """
+        self.source_path = source_path
+        self.labvars = None
+        self.topology.clear()
+        self.artifacts = ArtifactSource(source_path) if source_path else None
+
     def start_all_nodes(self) -> None:
         """
         Starts all nodes in the eve topology
         """
         logging.info(
             "Grabbing all nodes, then iterating over all to start them")
+        for node_id in self.get_nodes() or {}:
+            logging.info("Starting Node %s", node_id)
+            self.start_node(node_id)
+
+    def get_nodes(self) -> dict[str, dict]:
+        """
+        node id -> node details (name, status, cpu, ram, console url...) for every node in the lab
+        Served from the topology cache, only nodes started/stopped/wiped since the last call are fetched again
+        """
+        return self.topology.node_map(self._fetch_nodes, self._fetch_node)
+
+    @handle_http_errors
+    def _fetch_nodes(self) -> dict[str, dict]:
         url: str = f"{self.eve_url}/api/labs/{self.lab_name}.unl/nodes?_={self.get_current_epoch_time_ms()}"
-        response: dict[str, dict] = self.lab_r_session.get(url, verify=False).json()
-        for node_id in response["data"]:
-            logging.info(f"Starting Node {node_id}")
-            url: str = f"{self.eve_url}/api/labs/{self.lab_name}.unl/nodes/{node_id}/start?_={self.get_current_epoch_time_ms()}"
-            response: str = self.lab_r_session.get(url, verify=False)
-            logging.debug(response.json())
-            response.raise_for_status()
+        #Required cookies to get telnet console urls from eve
+        response = self.lab_r_session.get(url, headers=self.headers, verify=False, cookies={'html5': '-1'})
+        response.raise_for_status()
+        logging.debug("%s", response.text)
+        return response.json().get("data") or {}
 
     @handle_http_errors
+    def _fetch_node(self, node_id: str) -> dict:
+        url: str = f"{self.eve_url}/api/labs/{self.lab_name}.unl/nodes/{node_id}?_={self.get_current_epoch_time_ms()}"
+        response = self.lab_r_session.get(url, headers=self.headers, verify=False, cookies={'html5': '-1'})
+        response.raise_for_status()
+        logging.debug("%s", response.text)
+        return response.json().get("data")
+
+    def get_configs(self) -> dict[str, dict]:
+        """
+        node id -> {"name", "configdata"} startup configs, fetched once per session and updated by deploy_config
+        """
+        if self.topology.configs is None:
+            configs = self._fetch_configs()
+            if configs is not None:
+                self.topology.configs = {str(node_id): config for node_id, config in configs.items()}
+            return configs
+        return self.topology.configs
+
+    @handle_http_errors
+    def _fetch_configs(self) -> dict[str, dict]:
+        url = f"{self.eve_url}/api/labs/{self.lab_name}.unl/configs"
+        payload = '{"cfsid": "default"}'
+        logging.info("Getting all configs")
+        response = self.lab_r_session.post(
+            url=url, data=payload, headers=self.headers, verify=False)
+        response.raise_for_status()
+        return response.json().get("data") or {}
+
     def stop_all_nodes(self) -> None:
         """
-        Iterate through all nodes in a lab, stops them one by one.
-        Should result in knowing when all nodes are stopped
+        Stops every node in the lab, EVE_API_WORKERS stop calls at a time
         """
-        url: str = f"{self.eve_url}/api/labs/{self.lab_name}.unl/nodes?_={self.get_current_epoch_time_ms()}"
-        logging.info("Grabbing all nodes and iterating over them to stop them")
-        response: dict[str, dict] = self.lab_r_session.get(url, verify=False).json()
-        logging.debug(response)
+        nodes: dict[str, dict] = self.get_nodes() or {}
+        logging.info("Stopping %s nodes", len(nodes))
+        with futures.ThreadPoolExecutor(max_workers=EVE_API_WORKERS) as pool:
+            list(pool.map(lambda node_id: self.stop_node(node_id, settle=False), nodes))
+
+    def lab_resources(self) -> dict[str, int]:
+        """
+        cpu and ram (MB) held by the running nodes in the lab, what a teardown gives back to the EVE host
+        """
+        running = [node for node in (self.get_nodes() or {}).values() if node.get("status") == EVE_NODE_RUNNING]
+        return {
+            "nodes": len(running),
+            "cpu": sum(int(node.get("cpu", 0)) for node in running),
+            "ram": sum(int(node.get("ram", 0)) for node in running),
+        }
 
-        for node_id, _ in response["data"].items():
-            logging.info(f"Stopping Node {node_id}")
-            url: str = f"{self.eve_url}/api/labs/{self.lab_name}.unl/nodes/{node_id}/stop/stopmode=3?_={self.get_current_epoch_time_ms()}"
-            response: str = self.lab_r_session.get(url, verify=False)
-            logging.debug(response.json())
-            response.raise_for_status()
+    @handle_http_errors
+    def list_labs(self) -> list[dict]:
+        """
+        Every lab in the EVE root folder (file, path and modification time)
+        """
+        response = self.lab_r_session.get(f"{self.eve_url}/api/folders/", headers=self.headers, verify=False)
+        response.raise_for_status()
+        logging.debug("%s", response.text)
+        return response.json().get("data", {}).get("labs") or []
 
     @handle_http_errors
     def delete_lab(self):
@@ -118,17 +202,23 @@ class EVEInterface:
         Deletes the lab from EVE
         """
         url = f"{self.eve_url}/api/labs/{self.lab_name}.unl"
-        logging.info(f"Deleting lab at url - {url}")
+        logging.info("Deleting lab at url - %s", url)
         response = self.lab_r_session.delete(
             url, headers=self.headers, verify=False)
         response.raise_for_status()
+        self.topology.clear(lab_exists=False)
 
     @handle_http_errors
-    def add_router_to_lab(self, device_name: str, left: int, top: int, device_type: str) -> str:
+    def add_router_to_lab(self, device_name: str, left: int, top: int, device_type: str, ethernet: int = None) -> str:
         """
         Create csrv or iosv nodes in the eve-ng lab
         uses config.py values to determine API post payload
+        ethernet overrides the default interface count, needed for extra trunks in sharded bridge mode
         """
+        if ethernet is None:
+            ethernet = 2 if device_type == "csrv" else 3
+        # cpu/ram come from NODE_RESOURCE_DEFAULTS/NODE_RESOURCE_PROFILES in config.py
+        resources: dict[str, int] = node_resources(device_name, device_type)
         data: dict[str, str] = {
             "template": CSRV_IMAGE_TYPE if device_type == "csrv" else "vios",
             "type": "qemu",
@@ -136,9 +226,9 @@ class EVEInterface:
             "image": CSRV_IMAGE if device_type == "csrv" else IOSV_IMAGE,
             "name": device_name,
             "icon": "CSRv1000.png" if device_type == "csrv" else "Router.png",
-            "cpu": "1",
-            "ram": "4096" if device_type == "csrv" else "2048",
-            "ethernet": "2" if device_type == "csrv" else "3",
+            "cpu": str(resources["cpu"]),
+            "ram": str(resources["ram"]),
+            "ethernet": str(ethernet),
             # Non default setting - 1 enforces the startup config to read from text that we send later
             "config": "1",
             "sat": "-1",
@@ -153,8 +243,9 @@ class EVEInterface:
             verify=False,
         )
         response.raise_for_status()
-        logging.debug(response.json())
+        logging.debug("%s", response.text)
         node_id = response.json().get("data", {}).get("id")
+        self.topology.add_node(node_id)
         return node_id
 
     @handle_http_errors
@@ -167,28 +258,29 @@ class EVEInterface:
             "name": self.lab_name,
             "version": "1",
         }
-        logging.info(f"payload : {data}")
+        logging.info("payload : %s", data)
         response = self.lab_r_session.post(
             f"{self.eve_url}/api/labs",
             data=json.dumps(data),
             headers=self.headers,
             verify=False,
         )
-        logging.debug(response.json())
+        logging.debug("%s", response.text)
         response.raise_for_status()
+        self.topology.clear(lab_exists=True)
 
     @handle_http_errors
     def exists(self) -> bool:
         """
         Simple check to see if the lab already exists or not
         """
+        if self.topology.lab_exists is not None:
+            return self.topology.lab_exists
         url = f"{self.eve_url}/api/labs/{self.lab_name}.unl"
         response = self.lab_r_session.get(
             url, headers=self.headers, verify=False)
-        if response.status_code == 200:
-            return True
-        
-        return False
+        self.topology.lab_exists = response.status_code == 200
+        return self.topology.lab_exists
 
     @handle_http_errors
     def delete_lab(self) -> None:
@@ -197,8 +289,9 @@ class EVEInterface:
         """
         url = f"{self.eve_url}/api/labs/{self.lab_name}.unl"
         response = self.lab_r_session.delete(url, verify=False)
-        logging.debug(response.json())
+        logging.debug("%s", response.text)
         response.raise_for_status()
+        self.topology.clear(lab_exists=False)
 
     @handle_http_errors
     def login(self) -> None:
@@ -216,7 +309,7 @@ class EVEInterface:
             headers=self.headers,
             verify=False
         )
-        logging.debug(response.json())
+        logging.debug("%s", response.text)
         response.raise_for_status()
 
     @handle_http_errors
@@ -225,24 +318,28 @@ class EVEInterface:
         Fires up an individual node
         """
         url = f"{self.eve_url}/api/labs/{self.lab_name}.unl/nodes/{node_id}/start?_={self.get_current_epoch_time_ms()}"
-        logging.info(f"start url - {url}")
+        logging.info("start url - %s", url)
         response = self.lab_r_session.get(url, verify=False)
-        logging.debug(response.json())
+        logging.debug("%s", response.text)
         response.raise_for_status()
+        self.topology.invalidate_node(node_id)
 
     @handle_http_errors
-    def stop_node(self, node_id: str) -> None:
+    def stop_node(self, node_id: str, settle: bool = True) -> None:
         """
         shuts down an individual node
+        settle=False skips the power down wait, for teardowns where the node is deleted right after
         """
         url = f"{self.eve_url}/api/labs/{self.lab_name}.unl/nodes/{node_id}/stop/stopmode=3?_={self.get_current_epoch_time_ms()}"
         #Sleeping here for 5 seconds to allow eve to really power the node down
-        time.sleep(5)
-        logging.info(f"stop url - {url}")
+        if settle:
+            time.sleep(5)
+        logging.info("stop url - %s", url)
         response = self.lab_r_session.get(url, verify=False)
 
         response.raise_for_status()
-        logging.debug(response.json())
+        logging.debug("%s", response.text)
+        self.topology.invalidate_node(node_id)
 
     @handle_http_errors
     def wipe_node(self, node_id: str) -> None:
@@ -250,10 +347,11 @@ class EVEInterface:
         wipe an individual node
         """
         url = f"{self.eve_url}/api/labs/{self.lab_name}.unl/nodes/{node_id}/wipe?_={self.get_current_epoch_time_ms()}"
-        logging.info(f"wipe url - {url}")
+        logging.info("wipe url - %s", url)
         response = self.lab_r_session.get(url, verify=False)
-        logging.debug(response.json())
+        logging.debug("%s", response.text)
         response.raise_for_status()
+        self.topology.invalidate_node(node_id)
 
     @handle_http_errors
     def create_network(self, left: int, top: int, network_type: str, name: str, icon: str) -> str:
@@ -275,7 +373,7 @@ class EVEInterface:
         data = json.dumps(data_dict)
         response = self.lab_r_session.post(url, data=data, verify=False)
         response.raise_for_status()
-        logging.debug(response.json())
+        logging.debug("%s", response.text)
         network_id = response.json().get("data", {}).get("id")
         return network_id
 
@@ -288,17 +386,16 @@ class EVEInterface:
         data_dict = {f"{interface}": f"{network_id}"}
         data = json.dumps(data_dict)
         response = self.lab_r_session.put(url, data=data, verify=False)
-        logging.debug(response.json())
+        logging.debug("%s", response.text)
         response.raise_for_status()
 
     @handle_http_errors
     def deploy_config(self, node_id: int, config_file: str) -> None:
         """
-        Reads a config file, deploys the config to specified device
+        Reads a config file (labvars config_file name, read from source_path), deploys the config to specified device
         This only works in conjunction with node being set with param config: 1
         """
-        with open(config_file, "r", encoding="UTF-8") as file:
-            config = file.read()
+        config = self.artifacts.read(config_file)
         data_dict = {
             "id": f"{node_id}",
             "data": f"{config}",
@@ -309,8 +406,9 @@ class EVEInterface:
         url = f"{self.eve_url}/api/labs/{self.lab_name}.unl/configs/{node_id}"
 
         response = self.lab_r_session.put(url, data=data, verify=False)
-        logging.debug(response.json())
+        logging.debug("%s", response.text)
         response.raise_for_status()
+        self.topology.set_config(node_id, config)
 
     @handle_http_errors
     def wait_for_boot(self) -> None:
@@ -322,60 +420,118 @@ class EVEInterface:
             time.sleep(10)
             sleeptime += 10
             logging.info(
-                f"Waiting for devices to boot.. - {sleeptime}/600 seconds waited")
+                "Waiting for devices to boot.. - %s/600 seconds waited", sleeptime)
+
+    @handle_http_errors
+    def get_host_status(self) -> dict:
+        """
+        EVE's system status, cpu and mem are reported as percent used
+        """
+        url = f"{self.eve_url}/api/status"
+        response = self.lab_r_session.get(url, headers=self.headers, verify=False)
+        response.raise_for_status()
+        logging.debug("%s", response.text)
+        return response.json().get("data", {})
+
+    def free_capacity(self) -> dict[str, int]:
+        """
+        cpu/ram this EVE host can still give to a lab, EVE_HOST_OVERRIDES[eve_url] wins over EVE_HOST_CAPACITY
+        """
+        capacity: dict[str, int] = dict(EVE_HOST_CAPACITY)
+        capacity.update({key: value for key, value in EVE_HOST_OVERRIDES.get(self.eve_url, {}).items() if key in ("cpu", "ram")})
+        status: dict = self.get_host_status() or {}
+        return host_free_capacity(capacity, status, self.allocated_cpu())
+
+    def allocated_cpu(self) -> int:
+        """
+        vCPUs held by running nodes in every lab in the EVE root folder, where ci_cli creates its labs
+        """
+        allocated: int = 0
+        for lab in self.list_labs() or []:
+            nodes: dict[str, dict] = self._fetch_lab_nodes(lab.get("file")) or {}
+            allocated += sum(int(node.get("cpu", 0)) for node in nodes.values() if node.get("status") == EVE_NODE_RUNNING)
+        return allocated
+
+    @handle_http_errors
+    def _fetch_lab_nodes(self, lab_file: str) -> dict[str, dict]:
+        response = self.lab_r_session.get(f"{self.eve_url}/api/labs/{lab_file}/nodes", headers=self.headers, verify=False)
+        response.raise_for_status()
+        logging.debug("%s", response.text)
+        return response.json().get("data") or {}
+
+    def check_capacity(self) -> None:
+        """
+        Refuse to build the lab if the nodes in labvars need more cpu/ram than the EVE host has free
+        Better to fail here than run out of memory 150 nodes into a build
+        """
+        planner = ResourcePlanner(self.labvars.get("nodes"))
+        free: dict[str, int] = self.free_capacity()
+        total: dict[str, int] = planner.total()
+        logging.info("Lab needs %s cpu / %sMB ram, EVE host has %s cpu / %sMB ram free", total['cpu'], total['ram'], free['cpu'], free['ram'])
+        if not planner.fits(free):
+            logging.error(
+                "Lab does not fit on the EVE host, reduce NODE_RESOURCE_PROFILES/NODE_RESOURCE_DEFAULTS or raise EVE_HOST_CAPACITY in config.py")
+            sys.exit(1)
 
     def open_and_validate_labvars(self) -> None:
         """
         Grabs the labvars from file, saves them as a LabInterface property (self.labvars)
         Does some basic validation that required information exists. Didn't feel like adding pydantic would be worth for small usecase
         """
-        with open(f"{self.source_path}/labvars.json", encoding="UTF-8") as labvars:
-            self.labvars = json.loads(labvars.read())
+        if self.labvars is None:
+            self.labvars = json.loads(self.artifacts.read("labvars.json"))
+        try:
+            assert self.labvars.get("nodes")
+            assert len(self.labvars.get("nodes")) >= 1
+        except AssertionError:
+            logging.error(
+                "labvars did not contain the nodes key, or the key held no values")
+            sys.exit(1)
+        for node in self.labvars.get("nodes"):
             try:
-                assert self.labvars.get("nodes")
-                assert len(self.labvars.get("nodes")) >= 1
+                assert node.get("nodedefinition")
+                assert node.get("left") or node.get("left") == 0
+                assert node.get("top") or node.get("top") == 0
+                assert node.get("hostname")
+                assert node.get("config_file")
+                assert node.get("label")
             except AssertionError:
                 logging.error(
-                    "labvars did not contain the nodes key, or the key held no values")
+                    "node within labvars did not contain required values. must contain ['nodedefinition', 'left', 'top', 'hostname', 'config_file', 'label'], found %s", node)
                 sys.exit(1)
-            for node in self.labvars.get("nodes"):
-                try:
-                    assert node.get("nodedefinition")
-                    assert node.get("left") or node.get("left") == 0
-                    assert node.get("top") or node.get("top") == 0
-                    assert node.get("hostname")
-                    assert node.get("config_file")
-                    assert node.get("label")
-                except AssertionError:
-                    logging.error(
-                        f"node within labvars did not contain required values. must contain ['nodedefinition', 'left', 'top', 'hostname', 'config_file', 'label'], found {node}")
-                    sys.exit(1)
 
     def health_check(self, target_devices=None):
         """
         Use pyats to connect to each device. If a device is not stable... shutdown/wipe/restart
-        """
-        loaded_testbed = loader.load(self.yaml_testbed)
-        bad_devices = []
+        The testbed is loaded once, devices that already connected are left alone on the rerun after a recycle
+        """
+        if self.live_testbed is None:
+            self.live_testbed = loader.load(self.yaml_testbed)
+        loaded_testbed = self.live_testbed
+        # dead or ROMMON consoles go straight to recycle, no point waiting out the connection timeout
+        bad_devices = self.probe_devices(target_devices)
+        hopeless = [bad_device.get("device_name") for bad_device in bad_devices]
         with futures.ThreadPoolExecutor() as pp:
             for device in loaded_testbed.devices.values():
+                if device.is_connected() or device.name in hopeless:
+                    continue
                 # Temp set the 'mit' value to True in memory, speeds up connections
                 device.connections.cli.arguments['mit'] = True
                 try:
                     if target_devices is not None:
                         if device.name in [dev.get("device_name") for dev in target_devices]:
                             logging.info(
-                                f"Targetted run - Connecting to device - {device.name}")
+                                "Targetted run - Connecting to device - %s", device.name)
                             pp.submit(device.connect(log_stdout=True))
                         else:
                             logging.info(
-                                f"Skipping device {device.name} as this is a targetted run, this node already healthy")
+                                "Skipping device %s as this is a targetted run, this node already healthy", device.name)
                     else:
-                        logging.info(f"Connecting to device - {device.name}")
+                        logging.info("Connecting to device - %s", device.name)
                         pp.submit(device.connect(log_stdout=False))
                 except CE as e:
                     logging.debug(e)
-                    logging.error(f"Device {device.name} failed to connect")
+                    logging.error("Device %s failed to connect", device.name)
                     bad_devices.append(
                         {"device_name": device.name, "node_id": int(device.custom.node_id)})
 
@@ -383,7 +539,7 @@ class EVEInterface:
             logging.info("All look healthy and ready to go")
             return
         logging.warning(
-            f"These devices seem to be misbehaving.. rebooting {bad_devices}")
+            "These devices seem to be misbehaving.. rebooting %s", bad_devices)
         # Relogin, seems like eve times out randomly?...
         self.login()
         time.sleep(5)
@@ -395,8 +551,8 @@ class EVEInterface:
             self.start_node(bad_device.get("node_id"))
             time.sleep(1)
 
-        # rebuild testbed, port numbers change on reboot
-        self.build_testbed()
+        # port numbers change on reboot, re-read only the recycled nodes
+        self.refresh_testbed([bad_device.get("node_id") for bad_device in bad_devices])
 
         # Now wait 5 minutes and try again... this might be a bad idea
         logging.warning(
@@ -404,18 +560,34 @@ class EVEInterface:
         time.sleep(300)
         self.health_check(target_devices=bad_devices)
 
-    @handle_http_errors
-    def build_testbed(self, tb_output_path: str):
+    def probe_devices(self, target_devices: list[dict] = None) -> list[dict]:
+        """
+        Probe the console of every device (or just the targets) at once
+        Returns the devices whose console is dead or sitting in ROMMON, in health target form, ready to recycle
+        """
+        targets = None if target_devices is None else {target.get("device_name") for target in target_devices}
+        consoles: dict[str, tuple[str, int]] = {}
+        for name, device_config in self.testbed_dict.get("devices", {}).items():
+            if targets is None or name in targets:
+                cli: dict = device_config["connections"]["cli"]
+                consoles[name] = (cli["ip"], int(cli["port"]))
+        hopeless: list[dict] = []
+        for name, state in probe_consoles(consoles).items():
+            logging.info("Console probe of %s - %s", name, state)
+            if state not in VIABLE:
+                hopeless.append({"device_name": name, "node_id": int(self.testbed_dict["devices"][name]["custom"]["node_id"])})
+        return hopeless
+
+    def build_testbed(self, tb_output_path: str = None):
         """
         create a pyATS testbed from a lab
+        The testbed is kept on self.testbed_dict/self.yaml_testbed, and written to tb_output_path if provided
         """
-        logging.info(f"Creating testbed for lab {self.lab_name}")
-        url = f"{self.eve_url}/api/labs/{self.lab_name}.unl/nodes?={self.get_current_epoch_time_ms()}"
-        #Required cookies to get the correct output from eve
-        cookies = {'html5': '-1'}
-        response = self.lab_r_session.get(url, headers=self.headers, verify=False, cookies=cookies)
-        response.raise_for_status()
-        logging.debug(response.json())
+        logging.info("Creating testbed for lab %s", self.lab_name)
+        nodes: dict[str, dict] = self.get_nodes()
+        if nodes is None:
+            logging.error("Unable to get the node list for lab %s from EVE", self.lab_name)
+            sys.exit(1)
 
         testbed_template = {"devices": {}}
         device_template = {
@@ -433,13 +605,15 @@ class EVEInterface:
             "type": "router"
         }
 
-        for device_id, device_values in response.json().get("data").items():
-            logging.info(f"Adding device {device_values.get('name')}")
-            ip, port = device_values.get("url").split("telnet://")[1].split(":")
+        for device_id, device_values in nodes.items():
+            logging.info("Adding device %s", device_values.get('name'))
+            ip, port = self.console_address(device_values)
             device_config = copy.deepcopy(device_template)
             device_config["custom"]["node_id"] = device_id
+            # Which EVE host the node lives on, needed once testbeds from several hosts are merged
+            device_config["custom"]["eve_url"] = self.eve_url
             device_config["connections"]["cli"]["ip"] = ip
-            device_config["connections"]["cli"]["port"] = int(port)
+            device_config["connections"]["cli"]["port"] = port
 
             if device_values.get("template") == "c8000v":
                 device_config["os"] = "iosxe"
@@ -448,52 +622,122 @@ class EVEInterface:
             testbed_template['devices'][device_values.get("name")] = device_config
 
         logging.debug(testbed_template)
+        self.testbed_dict: dict = testbed_template
         yaml_testbed = yaml.dump(testbed_template, default_flow_style=False)
+        if self.live_testbed is not None and yaml_testbed != self.yaml_testbed:
+            # the lab changed under a testbed kept from an earlier command (daemon), its consoles may have moved
+            for device in self.live_testbed.devices.values():
+                if device.is_connected():
+                    device.disconnect()
+            self.live_testbed = None
         self.yaml_testbed = yaml_testbed
 
+        if tb_output_path is None:
+            return
+        self.tb_output_path = tb_output_path
         with open(tb_output_path, 'w', encoding="UTF-8") as testbed_file:
             testbed_file.write(yaml_testbed)
-            logging.info(f"Testbed created for lab {self.lab_name}, file saved as testbed.yml")
+            logging.info("Testbed created for lab %s, file saved as testbed.yml", self.lab_name)
+
+    def refresh_testbed(self, node_ids: list) -> list[str]:
+        """
+        Re-read the console ip/port of recycled nodes and patch them into the testbed dict, the live pyATS
+        testbed and the saved testbed file. Other devices and their open connections are not touched
+        Returns the names of the devices that were patched
+        """
+        for node_id in node_ids:
+            self.topology.invalidate_node(node_id)
+        nodes: dict[str, dict] = self.get_nodes() or {}
+        refreshed: list[str] = []
+        for node_id in node_ids:
+            node: dict = nodes.get(str(node_id))
+            if not node or node.get("name") not in self.testbed_dict.get("devices", {}):
+                logging.warning("Node %s is not in the testbed for lab %s, can't refresh it", node_id, self.lab_name)
+                continue
+            name: str = node.get("name")
+            ip, port = self.console_address(node)
+            self.testbed_dict["devices"][name]["connections"]["cli"].update({"ip": ip, "port": port})
+            if self.live_testbed is not None and name in self.live_testbed.devices:
+                device = self.live_testbed.devices[name]
+                # drop the failed connection object so the next connect uses the new port
+                device.destroy_all()
+                device.connections.cli.ip = ip
+                device.connections.cli.port = port
+            logging.info("Refreshed console of %s to %s:%s", name, ip, port)
+            refreshed.append(name)
+        self.yaml_testbed = yaml.dump(self.testbed_dict, default_flow_style=False)
+        if self.tb_output_path is not None:
+            with open(self.tb_output_path, 'w', encoding="UTF-8") as testbed_file:
+                testbed_file.write(self.yaml_testbed)
+        return refreshed
 
     def build_lab_from_cicd(self):
         """
         The main function that will be called from the cicd_tool that acts as a lab builder.
         """
         self.open_and_validate_labvars()
+        self.check_capacity()
         self.create_lab()
-        logging.info("Creating bridge network")
-        bridge_network_id: str = self.create_network(
-            top=400, left=800, network_type="bridge", name="Local Bridge", icon="Dot_black.png")
+        bridge_network_ids: dict[str, str] = self.create_bridge_networks()
         logging.info("Creating management network")
         cloud_network_id: str = self.create_network(
             top=400, left=1600, network_type="pnet0", name="Management", icon="Dot_blue.png")
 
         for node in self.labvars.get("nodes"):
             logging.info(
-                f"Creating and connecting node {node.get('hostname')}")
+                "Creating and connecting node %s", node.get('hostname'))
             # Start node based on type
             # iosv uses interface 1 for GigabitEthernet0/1
             if node.get("nodedefinition") == "iosv":
                 node_id = self.add_router_to_lab(device_name=node.get(
-                    "hostname"), left=node.get("left"), top=node.get("top"), device_type=node.get("nodedefinition"))
-                self.connect_network_to_interface(
-                    node_id=node_id, network_id=bridge_network_id, interface=1)
+                    "hostname"), left=node.get("left"), top=node.get("top"), device_type=node.get("nodedefinition"),
+                    ethernet=node.get("ethernet"))
+                self.connect_trunks(
+                    node_id=node_id, node=node, bridge_network_ids=bridge_network_ids, default_interface=1)
                 self.connect_network_to_interface(
                     node_id=node_id, network_id=cloud_network_id, interface=2)
             # csrv uses interface 0 for GigabitEthernet1
             elif node.get("nodedefinition") == "csrv":
                 node_id = self.add_router_to_lab(device_name=node.get(
-                    "hostname"), left=node.get("left"), top=node.get("top"), device_type=node.get("nodedefinition"))
-                self.connect_network_to_interface(
-                    node_id=node_id, network_id=bridge_network_id, interface=0)
+                    "hostname"), left=node.get("left"), top=node.get("top"), device_type=node.get("nodedefinition"),
+                    ethernet=node.get("ethernet"))
+                self.connect_trunks(
+                    node_id=node_id, node=node, bridge_network_ids=bridge_network_ids, default_interface=0)
                 self.connect_network_to_interface(
                     node_id=node_id, network_id=cloud_network_id, interface=1)
             self.deploy_config(
-                node_id=node_id, config_file=f"{self.source_path}/{node.get('config_file')}")
+                node_id=node_id, config_file=node.get('config_file'))
         self.start_all_nodes()
         self.wait_for_boot()
         self.wait_for_noshut()
 
+    def create_bridge_networks(self) -> dict[str, str]:
+        """
+        Creates the bridge network(s) the node trunks attach to, returns bridge name -> network id
+        labvars from create_configs --bridge_mode sharded list multiple bridges, otherwise one "Local Bridge" carries every vlan
+        Multi host partitions also add a pnet network (network_type) for the segments that span hosts
+        """
+        bridges: list[dict] = self.labvars.get("bridges") or [{"name": "Local Bridge"}]
+        bridge_network_ids: dict[str, str] = {}
+        for idx, bridge in enumerate(bridges):
+            logging.info("Creating bridge network %s", bridge.get('name'))
+            network_type: str = bridge.get("network_type", "bridge")
+            bridge_network_ids[bridge.get("name")] = self.create_network(
+                top=400, left=800 + (idx * 100), network_type=network_type, name=bridge.get("name"),
+                icon="Dot_black.png" if network_type == "bridge" else "Dot_blue.png")
+        return bridge_network_ids
+
+    def connect_trunks(self, node_id: str, node: dict, bridge_network_ids: dict[str, str], default_interface: int) -> None:
+        """
+        Connects a node's trunk interface(s) to their bridge networks
+        Nodes without a trunks list in labvars get a single trunk on default_interface to the Local Bridge,
+        an empty list (sharded node with no l3 interfaces) connects nothing
+        """
+        trunks: list[dict] = node.get("trunks", [{"bridge": "Local Bridge", "interface": default_interface}])
+        for trunk in trunks:
+            self.connect_network_to_interface(
+                node_id=node_id, network_id=bridge_network_ids[trunk.get("bridge")], interface=trunk.get("interface"))
+
     def teardown_lab_from_cicd(self):
         """
         Stops nodes, and deletes lab
@@ -502,53 +746,99 @@ class EVEInterface:
         self.delete_lab()
         logging.info("Successfully stopped and deleted lab")
 
+    def teardown_and_confirm(self) -> bool:
+        """
+        Teardown, then ask EVE again whether the lab is gone. HTTP errors are only logged by the teardown
+        """
+        self.teardown_lab_from_cicd()
+        self.topology.clear()
+        return not self.exists()
+
+    def hot_apply(self, device_name: str, commands: list[str]) -> bool:
+        """
+        Push configuration commands to a running node over its console and save them
+        Returns False if the node couldn't be reached or rejected a command, the caller falls back to a wipe and reboot
+        """
+        if self.live_testbed is None:
+            self.build_testbed()
+            self.live_testbed = loader.load(self.yaml_testbed)
+        device = self.live_testbed.devices.get(device_name)
+        if device is None:
+            logging.warning("%s is not in the lab testbed, can't hot apply", device_name)
+            return False
+        logging.info("Hot applying %s config lines to %s", len(commands), device_name)
+        logging.debug(commands)
+        try:
+            if not device.is_connected():
+                device.connect(log_stdout=False)
+            device.configure(commands)
+            device.execute("write memory")
+        # pylint: disable=W0718
+        except Exception as e:
+            logging.warning("Hot apply failed on %s, falling back to a reboot - %s", device_name, e)
+            return False
+        return True
+
     @handle_http_errors
-    def mod_lab_from_cicd(self):
+    def mod_lab_from_cicd(self) -> list[dict]:
         """
         If the lab exists, cicd_tool will run this instead
         Determines diffs between lab configs and target configs
-        redeploys the nodes with differences into the lab
+        pushes the differences to the running node where possible (hot_apply), otherwise redeploys the node
+        Returns the health targets that were also written to health_targets.json
+        Every node whose config changed (hot applied or rebooted) is written to changed_nodes.json for test impact selection
         """
         logging.info("Getting values from labvars")
         self.open_and_validate_labvars()
-        url = f"{self.eve_url}/api/labs/{self.lab_name}.unl/configs"
-        payload = '{"cfsid": "default"}'
-        logging.info("Getting all configs")
-        response = self.lab_r_session.post(
-            url=url, data=payload, headers=self.headers, verify=False)
-        response.raise_for_status()
-        all_configs = response.json()
+        all_configs: dict[str, dict] = self.get_configs()
+        if all_configs is None:
+            logging.error("Unable to get the node configs for lab %s from EVE", self.lab_name)
+            sys.exit(1)
         health_targets = []
-        for node_id, config_values in all_configs.get("data").items():
+        self.changed_nodes: list[str] = []
+        for node_id, config_values in all_configs.items():
             target_node = [node for node in self.labvars.get(
                 "nodes") if node.get("hostname") == config_values.get("name")][0]
-            logging.info(f"target node == {target_node}")
-            config_file_path = f"{self.source_path}/{target_node.get('config_file')}"
-            with open(config_file_path, 'r', encoding="UTF-8") as config:
-                local_config = config.read().strip()
-                api_config = config_values.get("configdata", "").strip()
-                # Check if the configurations are different
-                if local_config != api_config:
-                    # Use difflib to find differences
-                    diff = difflib.unified_diff(
-                        local_config.splitlines(keepends=True),
-                        api_config.splitlines(keepends=True),
-                        fromfile="local_config",
-                        tofile="api_config",
-                    )
-                    diff_text = ''.join(diff)
-                    logging.info(
-                        f"Differences found for node {target_node.get('hostname')}:\n{diff_text}")
-                    logging.info(
-                        "Stopping, deploying new config, wiping config, and starting back the node")
-                    self.stop_node(node_id)
-                    self.deploy_config(node_id, config_file_path)
-                    self.wipe_node(node_id)
-                    self.start_node(node_id)
-                    health_targets.append(
-                        {"device_name": target_node.get('hostname'), "node_id": node_id})
-                else:
-                    logging.info("Configurations are identical.")
+            logging.info("target node == %s", target_node)
+            config_file: str = target_node.get('config_file')
+            local_config = self.artifacts.read(config_file).strip()
+            api_config = config_values.get("configdata", "").strip()
+            # Check if the configurations are different
+            if local_config != api_config:
+                # Use difflib to find differences
+                diff = difflib.unified_diff(
+                    local_config.splitlines(keepends=True),
+                    api_config.splitlines(keepends=True),
+                    fromfile="local_config",
+                    tofile="api_config",
+                )
+                diff_text = ''.join(diff)
+                logging.info(
+                    "Differences found for node %s:\n%s", target_node.get('hostname'), diff_text)
+                self.changed_nodes.append(target_node.get('hostname'))
+                commands = config_delta(api_config, local_config) if HOT_APPLY_ENABLED else None
+                if commands is not None and self.hot_apply(target_node.get('hostname'), commands):
+                    # keep EVE's startup config in step with what is now running
+                    self.deploy_config(node_id, config_file)
+                    continue
+                logging.info(
+                    "Stopping, deploying new config, wiping config, and starting back the node")
+                self.stop_node(node_id)
+                self.deploy_config(node_id, config_file)
+                self.wipe_node(node_id)
+                self.start_node(node_id)
+                health_targets.append(
+                    {"device_name": target_node.get('hostname'), "node_id": node_id})
+            else:
+                logging.info("Configurations are identical.")
+
+        if self.live_testbed is not None:
+            for device in self.live_testbed.devices.values():
+                if device.is_connected():
+                    device.disconnect()
+
+        with open(CHANGED_NODES_FILE, "w", encoding="UTF-8") as changed_file:
+            changed_file.write(json.dumps(self.changed_nodes))
 
         if health_targets:
             logging.info(
@@ -561,6 +851,7 @@ class EVEInterface:
                 "Nothing seemed to change, ensuring health_targets.json still exists to prevent tb_and_health from executing")
             with open("health_targets.json", "w", encoding="UTF-8") as ht_file:
                 ht_file.write(json.dumps(health_targets))
+        return health_targets
 
     @staticmethod
     def wait_for_noshut() -> None:
@@ -572,6 +863,14 @@ class EVEInterface:
             "Waiting 60 seconds to hopefully let the router EEM script kick off")
         time.sleep(60)
 
+    @staticmethod
+    def console_address(node: dict) -> tuple[str, int]:
+        """
+        (ip, port) from a node's telnet console url, telnet://10.0.0.1:32769
+        """
+        ip, port = node.get("url").split("telnet://")[1].split(":")
+        return ip, int(port)
+
     @staticmethod
     def get_current_epoch_time_ms() -> int:
         """
@@ -25,7 +25,7 @@ class INEConfigBuilder:
             with open("ci_cli/templates/ine.j2", "r", encoding="UTF-8") as kg_template_file:
                 self.template = Template(kg_template_file.read())
         except (FileNotFoundError, PermissionError) as e:
-            logging.error(f"Error opening file (not found or permissions issue) - {e}")
+            logging.error("Error opening file (not found or permissions issue) - %s", e)
             sys.exit(1)
         self.y_config: dict[str, str] = self.get_yaml_config()
         self.ios_config: str = self.template_config()
@@ -36,7 +36,7 @@ class INEConfigBuilder:
         Open the config file, parse to work with as python dictionary
         """
         logging.info(
-            f"Opening the provided ine yml file - {self.combined_path}")
+            "Opening the provided ine yml file - %s", self.combined_path)
         with open(self.combined_path, 'r', encoding="UTF-8") as y_file:
             return yaml.safe_load(y_file.read())
 
@@ -44,7 +44,7 @@ class INEConfigBuilder:
         """
         Render the ine config template
         """
-        logging.info(f"Rendering j2 template for {self.combined_path}")
+        logging.info("Rendering j2 template for %s", self.combined_path)
         return self.template.render(config=self.y_config, convert_ip_format=self.convert_ip_format)
 
     def save_config(self):
@@ -54,7 +54,7 @@ class INEConfigBuilder:
         config: list[str] = self.file_.split(".yml")[0]
         config_txt: str = f"{config}.txt"
         save_path: str = f"{self.file_path}/{config_txt}"
-        logging.info(f"Saving file as {save_path}")
+        logging.info("Saving file as %s", save_path)
         with open(save_path, 'w', encoding="UTF-8") as file_:
             file_.write(self.ios_config)
         return save_path, config_txt
@@ -64,7 +64,7 @@ class INEConfigBuilder:
         """
         Helper for the jinja template, converts CIDR input to ios format
         """
-        logging.info(f"Coverting subnet {ip_with_prefix}")
+        logging.info("Coverting subnet %s", ip_with_prefix)
         ip = ipaddress.IPv4Network(ip_with_prefix, strict=False)
         if net:
             logging.info("--Returing the network address")
@@ -0,0 +1,141 @@
+"""
+Author: James Duvall
+Purpose: Production <-> lab interface lookups for the testscripts. Interface names are normalized so
+shorthand (Gi0/1, te1/0/1, Po10) finds the same entry as the full name, and every device has a forward
+and a reverse index. Device maps are read lazily, from the per-device files create_configs writes to
+interface_map/ when they exist, so a test task only loads the devices it touches.
+"""
+
+import os
+import re
+import json
+
+from .artifact_archive import ArtifactSource, is_archive
+
+# Directory of per-device maps written next to overall_interface_map.json
+DEVICE_MAP_DIR: str = "interface_map"
+# Full IOS interface type names, when a shorthand prefix matches more than one the first listed wins
+# (IOS shortens TwoGigabitEthernet to Tw and TwentyFiveGigE to Twe)
+INTERFACE_TYPES: tuple[str, ...] = (
+    "GigabitEthernet", "TenGigabitEthernet", "TwoGigabitEthernet", "TwentyFiveGigE", "FortyGigabitEthernet",
+    "HundredGigE", "FastEthernet", "Ethernet", "Loopback", "Tunnel", "Port-channel", "Vlan", "Serial",
+    "BDI", "Dialer", "Virtual-Template", "Multilink", "Null",
+)
+INTERFACE_NAME = re.compile(r"^\s*([A-Za-z-]+)\s*(\d.*?)\s*$")
+
+
+def normalize_interface(name: str) -> str:
+    """
+    Full IOS interface name for shorthand or oddly cased names, anything unrecognised comes back stripped
+    """
+    match = INTERFACE_NAME.match(name)
+    if not match:
+        return name.strip()
+    # hyphens are optional, PortChannel1 and Port-channel1 are the same interface
+    prefix, number = match.group(1).lower().replace("-", ""), match.group(2)
+    for full_name in INTERFACE_TYPES:
+        if full_name.lower().replace("-", "").startswith(prefix):
+            return f"{full_name}{number}"
+    return name.strip()
+
+
+def save_device_maps(output_path: str, devices: dict[str, dict[str, str]], writer=None) -> None:
+    """
+    Write one compact json file per device (production name -> lab name) into output_path/interface_map
+    writer is the converter's ArtifactWriter (or ArchiveWriter), the files are queued on it instead of written here
+    Maps of devices that are no longer in devices (removed or renamed) are deleted, the mapper trusts the directory
+    """
+    map_dir = os.path.join(output_path, DEVICE_MAP_DIR)
+    if writer is None:
+        os.makedirs(map_dir, exist_ok=True)
+    if os.path.isdir(map_dir):
+        for file_ in os.listdir(map_dir):
+            if file_.endswith(".json") and file_[:-len(".json")] not in devices:
+                os.remove(os.path.join(map_dir, file_))
+    for hostname, mapping in devices.items():
+        device_path: str = os.path.join(map_dir, f"{hostname}.json")
+        if writer is not None:
+            writer.write(device_path, json.dumps(mapping, separators=(",", ":")))
+            continue
+        with open(device_path, "w", encoding="UTF-8") as device_file:
+            device_file.write(json.dumps(mapping, separators=(",", ":")))
+
+
+class InterfaceMapper:
+    """
+    Forward (production -> lab) and reverse (lab -> production) interface lookups, loaded a device at a time
+    map_path is overall_interface_map.json, an interface_map directory or a create_configs --archive zip.
+    A file with an interface_map directory beside it reads the per-device files instead of the whole json
+    """
+
+    def __init__(self, map_path: str) -> None:
+        self.map_path: str = map_path
+        # --archive zip, the per-device files are read out of it
+        self.archive: ArtifactSource | None = ArtifactSource(map_path) if is_archive(map_path) else None
+        sibling_dir = os.path.join(os.path.dirname(map_path), DEVICE_MAP_DIR)
+        if self.archive is not None:
+            self.device_dir: str | None = DEVICE_MAP_DIR if self.archive.names(DEVICE_MAP_DIR) else None
+        elif os.path.isdir(map_path):
+            self.device_dir: str | None = map_path
+        elif os.path.isdir(sibling_dir):
+            self.device_dir = sibling_dir
+        else:
+            self.device_dir = None
+        self._overall: dict | None = None
+        self._forward: dict[str, dict[str, str]] = {}
+        self._reverse: dict[str, dict[str, str]] = {}
+
+    def _device_map(self, device_name: str) -> dict[str, str]:
+        if self.archive is not None:
+            return self._archive_device_map(device_name)
+        if self.device_dir is not None:
+            device_path = os.path.join(self.device_dir, f"{device_name}.json")
+            if not os.path.isfile(device_path):
+                return {}
+            with open(device_path, "r", encoding="UTF-8") as device_file:
+                return json.loads(device_file.read())
+        if self._overall is None:
+            with open(self.map_path, "r", encoding="UTF-8") as map_file:
+                self._overall = json.loads(map_file.read())
+        return self._overall.get("devices", {}).get(device_name, {})
+
+    def _archive_device_map(self, device_name: str) -> dict[str, str]:
+        if self.device_dir is not None:
+            device_file: str = f"{DEVICE_MAP_DIR}/{device_name}.json"
+            return json.loads(self.archive.read(device_file)) if self.archive.exists(device_file) else {}
+        if self._overall is None:
+            self._overall = json.loads(self.archive.read("overall_interface_map.json"))
+        return self._overall.get("devices", {}).get(device_name, {})
+
+    def _index(self, device_name: str) -> None:
+        if device_name in self._forward:
+            return
+        mapping = self._device_map(device_name)
+        self._forward[device_name] = {normalize_interface(prod): lab for prod, lab in mapping.items()}
+        self._reverse[device_name] = {normalize_interface(lab): prod for prod, lab in mapping.items()}
+
+    def lab_interface(self, device_name: str, interface_name: str) -> str | None:
+        """
+        Lab interface for a production interface name (any shorthand), None when it isn't mapped
+        """
+        self._index(device_name)
+        return self._forward[device_name].get(normalize_interface(interface_name))
+
+    def production_interface(self, device_name: str, interface_name: str) -> str | None:
+        """
+        Production interface behind a lab interface (e.g. Gi0/1.12), None when it isn't mapped
+        """
+        self._index(device_name)
+        return self._reverse[device_name].get(normalize_interface(interface_name))
+
+    def devices(self) -> dict[str, dict[str, str]]:
+        """
+        Every device map, in the overall_interface_map.json "devices" shape. Loads everything
+        """
+        if self.device_dir is None:
+            self._device_map("")
+            return self._overall.get("devices", {})
+        listing = self.archive.names(self.device_dir) if self.archive is not None else sorted(os.listdir(self.device_dir))
+        names = [file_[:-len(".json")] for file_ in listing if file_.endswith(".json")]
+        return {name: self._device_map(name) for name in names}
+
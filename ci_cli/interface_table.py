@@ -0,0 +1,204 @@
+"""
+Author: James Duvall
+Purpose: Compact storage for the l3 interfaces found across every configuration.
+Addresses, prefix lengths, owning config and vlanid are held as integers in flat arrays,
+dict-like views are handed out so existing code can keep using interface["ip_address"] etc.
+"""
+
+import ipaddress
+from array import array
+from collections.abc import MutableMapping, Sequence
+
+# Need at least 32 bits to hold an IPv4 address, "I" is 4 bytes on every platform we care about
+ADDR_TYPECODE: str = "I" if array("I").itemsize >= 4 else "L"
+# Used in the vlanid array to represent "not assigned yet"
+NO_VLAN: int = 0
+INTERFACE_KEYS: tuple = ("config", "if_name", "ip_subnet", "ip_address", "new_vlanid")
+
+
+def prefix_to_mask(prefixlen: int) -> int:
+    """
+    Convert a prefix length into an integer netmask, 24 -> 0xFFFFFF00
+    """
+    return (0xFFFFFFFF << (32 - prefixlen)) & 0xFFFFFFFF
+
+
+class InterfaceTable:
+    """
+    Column oriented table of l3 interfaces, one row per interface
+    Shared between Configuration objects, each row points back at its owner by index
+    """
+    __slots__ = ("owners", "_owner_index", "if_names", "addresses", "prefixlens", "owner_idx", "vlanids")
+
+    def __init__(self) -> None:
+        self.owners: list[str] = []
+        self._owner_index: dict[str, int] = {}
+        self.if_names: list[str] = []
+        self.addresses: array = array(ADDR_TYPECODE)
+        self.prefixlens: array = array("B")
+        self.owner_idx: array = array(ADDR_TYPECODE)
+        self.vlanids: array = array("H")
+
+    def __len__(self) -> int:
+        return len(self.if_names)
+
+    def owner_id(self, owner: str) -> int:
+        """
+        Find (or allocate) the integer index used for the owning config file path
+        """
+        idx = self._owner_index.get(owner)
+        if idx is None:
+            idx = len(self.owners)
+            self.owners.append(owner)
+            self._owner_index[owner] = idx
+        return idx
+
+    def add(self, owner: str, if_name: str, address: int, prefixlen: int, vlanid: int = NO_VLAN) -> int:
+        """
+        Append a new interface row, returns the row number
+        """
+        self.if_names.append(if_name)
+        self.addresses.append(address)
+        self.prefixlens.append(prefixlen)
+        self.owner_idx.append(self.owner_id(owner))
+        self.vlanids.append(vlanid)
+        return len(self.if_names) - 1
+
+    def network(self, row: int) -> int:
+        """
+        Integer network address of the row, address & netmask
+        """
+        return self.addresses[row] & prefix_to_mask(self.prefixlens[row])
+
+    def contains(self, row: int, address: int) -> bool:
+        """
+        Integer equivalent of IPv4Address in IPv4Network for the subnet of row
+        """
+        mask = prefix_to_mask(self.prefixlens[row])
+        return (address & mask) == (self.addresses[row] & mask)
+
+    def record(self, row: int) -> "InterfaceRecord":
+        """
+        Build a dict-like view of a single row
+        """
+        return InterfaceRecord(self, row)
+
+    def to_dict(self) -> dict:
+        """
+        Plain json serializable version of the table
+        """
+        return {
+            "owners": list(self.owners),
+            "if_names": list(self.if_names),
+            "addresses": list(self.addresses),
+            "prefixlens": list(self.prefixlens),
+            "owner_idx": list(self.owner_idx),
+            "vlanids": list(self.vlanids),
+        }
+
+    @classmethod
+    def from_dict(cls, table_dict: dict) -> "InterfaceTable":
+        """
+        Rebuild a table from the output of to_dict
+        """
+        table = cls()
+        for owner in table_dict["owners"]:
+            table.owner_id(owner)
+        table.if_names = list(table_dict["if_names"])
+        table.addresses = array(ADDR_TYPECODE, table_dict["addresses"])
+        table.prefixlens = array("B", table_dict["prefixlens"])
+        table.owner_idx = array(ADDR_TYPECODE, table_dict["owner_idx"])
+        table.vlanids = array("H", table_dict["vlanids"])
+        return table
+
+
+class InterfaceRecord(MutableMapping):
+    """
+    Dict-like view of one InterfaceTable row
+    Keeps the same keys as the old l3_interfaces dictionaries, objects are only built on access
+    Only new_vlanid can be written back to the table
+    """
+    __slots__ = ("table", "row")
+
+    def __init__(self, table: InterfaceTable, row: int) -> None:
+        self.table: InterfaceTable = table
+        self.row: int = row
+
+    @property
+    def address(self) -> int:
+        """
+        Integer ip address of the interface
+        """
+        return self.table.addresses[self.row]
+
+    @property
+    def prefixlen(self) -> int:
+        """
+        Prefix length of the interface subnet
+        """
+        return self.table.prefixlens[self.row]
+
+    @property
+    def network(self) -> int:
+        """
+        Integer network address of the interface subnet
+        """
+        return self.table.network(self.row)
+
+    def __getitem__(self, key: str):
+        table, row = self.table, self.row
+        if key == "config":
+            return table.owners[table.owner_idx[row]]
+        if key == "if_name":
+            return table.if_names[row]
+        if key == "ip_address":
+            return ipaddress.IPv4Address(table.addresses[row])
+        if key == "ip_subnet":
+            return ipaddress.IPv4Network((table.network(row), table.prefixlens[row]))
+        if key == "new_vlanid" and table.vlanids[row] != NO_VLAN:
+            return table.vlanids[row]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value) -> None:
+        if key != "new_vlanid":
+            raise KeyError(f"Only new_vlanid can be modified on an interface record, not {key}")
+        self.table.vlanids[self.row] = int(value)
+
+    def __delitem__(self, key: str) -> None:
+        if key != "new_vlanid":
+            raise KeyError(f"Only new_vlanid can be removed from an interface record, not {key}")
+        self.table.vlanids[self.row] = NO_VLAN
+
+    def __iter__(self):
+        for key in INTERFACE_KEYS:
+            if key != "new_vlanid" or self.table.vlanids[self.row] != NO_VLAN:
+                yield key
+
+    def __len__(self) -> int:
+        return len(INTERFACE_KEYS) - (self.table.vlanids[self.row] == NO_VLAN)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class InterfaceView(Sequence):
+    """
+    Sequence of InterfaceRecords belonging to a single configuration
+    This is what Configuration.l3_interfaces hands out
+    """
+    __slots__ = ("table", "rows")
+
+    def __init__(self, table: InterfaceTable, rows: array) -> None:
+        self.table: InterfaceTable = table
+        self.rows: array = rows
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [InterfaceRecord(self.table, row) for row in self.rows[idx]]
+        return InterfaceRecord(self.table, self.rows[idx])
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
@@ -0,0 +1,154 @@
+"""
+Author: James Duvall
+Purpose: Small IOS config parser covering the CiscoConfParse queries the converter uses (find_lines,
+find_children_w_parents, find_all_children, find_interface_objects + delete). The config is read into an
+indentation tree once, with a children list per line and indexes by line text and interface name, so
+repeated lookups don't rescan the config. Configuration picks it or CiscoConfParse with CONFIG_PARSER.
+"""
+
+import re
+
+from .interface_mapper import normalize_interface
+
+BANNER = re.compile(r"^banner\s+\S+\s+(\^C|\S)")
+# Parent specs made only of these characters are looked up in the text index instead of scanning
+LITERAL_SPEC = re.compile(r"^\^([\w\s/:.\-]+)\$$")
+
+
+class IOSLine:
+    """
+    One config line, its parent and children in the indentation tree
+    """
+    __slots__ = ("text", "linenum", "indent", "parent", "children", "deleted")
+
+    def __init__(self, text: str, linenum: int, parent: "IOSLine" = None) -> None:
+        self.text: str = text
+        self.linenum: int = linenum
+        self.indent: int = len(text) - len(text.lstrip(" "))
+        self.parent: IOSLine | None = parent
+        self.children: list[IOSLine] = []
+        self.deleted: bool = False
+
+    @property
+    def is_comment(self) -> bool:
+        return self.text.lstrip().startswith("!")
+
+    @property
+    def all_children(self) -> list["IOSLine"]:
+        """
+        Every descendant, in config order
+        """
+        descendants: list[IOSLine] = []
+        for child in self.children:
+            descendants.append(child)
+            descendants.extend(child.all_children)
+        return descendants
+
+    def delete(self) -> None:
+        """
+        Remove the line and everything below it from the config
+        """
+        self.deleted = True
+        for child in self.all_children:
+            child.deleted = True
+
+
+class IOSConfigTree:
+    """
+    Parsed IOS config. config is a file path or a list of lines, like CiscoConfParse
+    Lines are right stripped and blank lines dropped, as CiscoConfParse does
+    """
+
+    def __init__(self, config: str | list[str]) -> None:
+        if isinstance(config, str):
+            with open(config, "r", encoding="UTF-8") as config_file:
+                config = config_file.readlines()
+        self.objs: list[IOSLine] = []
+        self._by_text: dict[str, list[IOSLine]] = {}
+        self._interfaces: dict[str, list[IOSLine]] = {}
+        self._build([line.rstrip() for line in config if line.strip()])
+
+    def _build(self, lines: list[str]) -> None:
+        # non comment lines that can still take children, comments never become parents or close a block
+        stack: list[IOSLine] = []
+        banner_end: str | None = None
+        banner: IOSLine | None = None
+        for linenum, text in enumerate(lines):
+            if banner_end is not None:
+                line = IOSLine(text, linenum, banner)
+                banner.children.append(line)
+                if banner_end in text:
+                    banner_end, banner = None, None
+                self._add(line)
+                continue
+            line = IOSLine(text, linenum)
+            if line.is_comment:
+                parents = [parent for parent in stack if parent.indent < line.indent]
+                line.parent = parents[-1] if parents else None
+            else:
+                while stack and stack[-1].indent >= line.indent:
+                    stack.pop()
+                line.parent = stack[-1] if stack else None
+                stack.append(line)
+            if line.parent is not None:
+                line.parent.children.append(line)
+            self._add(line)
+            match = BANNER.match(text)
+            if match and text[match.end():].find(match.group(1)) == -1:
+                # multi line banner, every line up to the closing delimiter belongs to it
+                banner_end, banner = match.group(1), line
+                stack = []
+
+    def _add(self, line: IOSLine) -> None:
+        self.objs.append(line)
+        self._by_text.setdefault(line.text, []).append(line)
+        if line.indent == 0 and line.text.startswith("interface "):
+            name: str = " ".join(line.text.split()[1:])
+            self._interfaces.setdefault(normalize_interface(name), []).append(line)
+
+    @property
+    def ioscfg(self) -> list[str]:
+        """
+        The config lines, without deleted lines
+        """
+        return [line.text for line in self.objs if not line.deleted]
+
+    def _matching(self, linespec: str) -> list[IOSLine]:
+        literal = LITERAL_SPEC.match(linespec)
+        if literal:
+            return [line for line in self._by_text.get(literal.group(1), []) if not line.deleted]
+        pattern = re.compile(linespec)
+        return [line for line in self.objs if not line.deleted and pattern.search(line.text)]
+
+    def find_lines(self, linespec: str) -> list[str]:
+        """
+        Every line matching linespec
+        """
+        return [line.text for line in self._matching(linespec)]
+
+    def find_children_w_parents(self, parentspec: str, childspec: str) -> list[str]:
+        """
+        Lines matching childspec anywhere below the lines matching parentspec
+        """
+        pattern = re.compile(childspec)
+        return [
+            child.text for parent in self._matching(parentspec) for child in parent.all_children
+            if not child.deleted and pattern.search(child.text)
+        ]
+
+    def find_all_children(self, linespec: str) -> list[str]:
+        """
+        Lines matching linespec and everything below them, in config order
+        """
+        found: dict[int, IOSLine] = {}
+        for line in self._matching(linespec):
+            found[line.linenum] = line
+            for child in line.all_children:
+                found[child.linenum] = child
+        return [found[linenum].text for linenum in sorted(found) if not found[linenum].deleted]
+
+    def find_interface_objects(self, intfspec: str) -> list[IOSLine]:
+        """
+        interface lines for an interface name, shorthand works (Gi0/1, Lo0)
+        """
+        return [line for line in self._interfaces.get(normalize_interface(intfspec), []) if not line.deleted]
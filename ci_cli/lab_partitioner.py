@@ -0,0 +1,188 @@
+"""
+Author: James Duvall
+Purpose: Splits a lab across multiple EVE hosts. Uses the vlan segments from the converter's
+overall_interface_map.json as a graph, keeps nodes that share segments on the same host where
+capacity allows, and rewrites each host's labvars so segments that still span hosts ride the
+designated pnet interface instead of the host-local bridge.
+"""
+
+import copy
+import logging
+from collections import Counter
+
+from .resource_planner import ResourcePlanner
+
+# Name of the network created on each host for segments that span hosts
+CROSS_HOST_NETWORK: str = "Cross Host"
+# Moving nodes between hosts to shrink the cut stops after this many passes
+REFINE_PASSES: int = 4
+
+
+def segments_from_interface_map(interface_map: dict) -> dict[int, set[str]]:
+    """
+    vlanid -> hostnames in that segment, read back out of the lab subinterface names (GigabitEthernet0/1.[vlanid])
+    """
+    segments: dict[int, set[str]] = {}
+    for hostname, mapping in interface_map.get("devices", {}).items():
+        for lab_interface in mapping.values():
+            vlanid = int(lab_interface.rsplit(".", 1)[1])
+            segments.setdefault(vlanid, set()).add(hostname)
+    return segments
+
+
+def node_adjacency(segments: dict[int, set[str]]) -> dict[str, Counter]:
+    """
+    hostname -> Counter of neighbor hostnames, weighted by how many segments they share
+    """
+    adjacency: dict[str, Counter] = {}
+    for members in segments.values():
+        for hostname in members:
+            adjacency.setdefault(hostname, Counter()).update(member for member in members if member != hostname)
+    return adjacency
+
+
+def cut_size(placement: dict[str, list[dict]], segments: dict[int, set[str]]) -> int:
+    """
+    Number of segments with members on more than one host
+    """
+    host_of = {node.get("hostname"): host for host, nodes in placement.items() for node in nodes}
+    return sum(1 for members in segments.values() if len({host_of.get(member) for member in members}) > 1)
+
+
+def partition_nodes(
+    nodes: list[dict], segments: dict[int, set[str]], hosts: dict[str, dict[str, int]]
+) -> dict[str, list[dict]] | None:
+    """
+    Assign labvars nodes to hosts (host -> free capacity, in order of preference)
+    Each host is grown greedily through the segment graph so neighbors land on the same host,
+    then single node moves that reduce the number of cross host segments are applied.
+    Returns host -> nodes, or None when the nodes do not fit on the hosts at all
+    """
+    planner = ResourcePlanner(nodes)
+    first_host = next(iter(hosts))
+    if planner.fits(hosts[first_host]):
+        return {host: (list(nodes) if host == first_host else []) for host in hosts}
+
+    adjacency = node_adjacency(segments)
+    remaining: dict[str, dict[str, int]] = {host: dict(free) for host, free in hosts.items()}
+    host_of: dict[str, str] = {}
+    unplaced: list[str] = [node.get("hostname") for node in nodes]
+    # Grow each host from a seed, always taking the unplaced node with the most links into the host
+    # (ties go to the node with the fewest links left outside, so whole clusters get pulled in)
+    for host, free in remaining.items():
+        members: set[str] = set()
+
+        def gain(name: str) -> tuple[int, int]:
+            links = adjacency.get(name, Counter())
+            inside = sum(weight for neighbor, weight in links.items() if neighbor in members)
+            outside = sum(weight for neighbor, weight in links.items() if neighbor not in host_of)
+            return inside, -outside
+
+        while unplaced:
+            fitting = [name for name in unplaced if free["cpu"] >= planner.requirements[name]["cpu"]
+                       and free["ram"] >= planner.requirements[name]["ram"]]
+            if not fitting:
+                break
+            name = max(fitting, key=gain)
+            req = planner.requirements[name]
+            host_of[name] = host
+            members.add(name)
+            unplaced.remove(name)
+            free["cpu"] -= req["cpu"]
+            free["ram"] -= req["ram"]
+    if unplaced:
+        logging.error("No EVE host has room left for %s", ', '.join(unplaced))
+        return None
+    order: list[str] = [node.get("hostname") for node in nodes]
+
+    for _ in range(REFINE_PASSES):
+        moved = False
+        for name in order:
+            req = planner.requirements[name]
+            current = host_of[name]
+            links = Counter()
+            for neighbor, weight in adjacency.get(name, Counter()).items():
+                if neighbor in host_of:
+                    links[host_of[neighbor]] += weight
+            for host, weight in links.most_common():
+                if host == current or weight <= links[current]:
+                    continue
+                if remaining[host]["cpu"] < req["cpu"] or remaining[host]["ram"] < req["ram"]:
+                    continue
+                remaining[current]["cpu"] += req["cpu"]
+                remaining[current]["ram"] += req["ram"]
+                remaining[host]["cpu"] -= req["cpu"]
+                remaining[host]["ram"] -= req["ram"]
+                host_of[name] = host
+                moved = True
+                break
+        if not moved:
+            break
+
+    placement: dict[str, list[dict]] = {host: [] for host in hosts}
+    for node in nodes:
+        placement[host_of[node.get("hostname")]].append(node)
+    logging.info("Partitioned %s nodes across %s hosts, %s segments span hosts", len(nodes), len(hosts), cut_size(placement, segments))
+    return placement
+
+
+def partition_labvars(
+    labvars: dict, placement: dict[str, list[dict]], segments: dict[int, set[str]], pnets: dict[str, str]
+) -> dict[str, dict]:
+    """
+    Build a labvars dict per host from the placement
+    A node trunk that carries a segment spanning hosts - or shares a host-local segment with a trunk that does -
+    is moved from its bridge onto the host's cross host pnet network (pnets is host -> pnet type, e.g. pnet1)
+    """
+    host_of = {node.get("hostname"): host for host, nodes in placement.items() for node in nodes}
+    crossing: set[int] = {vlanid for vlanid, members in segments.items()
+                          if len({host_of.get(member) for member in members}) > 1}
+    bridge_vlans: dict[str, set[int]] = {bridge.get("name"): set(bridge.get("vlans", [])) for bridge in labvars.get("bridges", [])}
+    node_vlans: dict[str, set[int]] = {}
+    for vlanid, members in segments.items():
+        for member in members:
+            node_vlans.setdefault(member, set()).add(vlanid)
+
+    host_labvars: dict[str, dict] = {}
+    for host, nodes in placement.items():
+        # Each (node, bridge) attachment carries some vlans, attachments sharing a vlan on this host are one L2 domain
+        attachments: dict[tuple[str, str], set[int]] = {}
+        for node in nodes:
+            hostname = node.get("hostname")
+            for trunk in node.get("trunks", [{"bridge": "Local Bridge"}]):
+                bridge = trunk.get("bridge")
+                vlans = node_vlans.get(hostname, set())
+                attachments[(hostname, bridge)] = vlans & bridge_vlans[bridge] if bridge in bridge_vlans else vlans
+        # Flood "needs the pnet" through vlans shared on this host
+        cross_vlans: set[int] = set(crossing)
+        cross_attachments: set[tuple[str, str]] = set()
+        changed = True
+        while changed:
+            changed = False
+            for attachment, vlans in attachments.items():
+                if attachment not in cross_attachments and vlans & cross_vlans:
+                    cross_attachments.add(attachment)
+                    cross_vlans |= vlans
+                    changed = True
+
+        host_vars: dict = {key: value for key, value in labvars.items() if key not in ("nodes", "bridges")}
+        host_vars["nodes"] = []
+        used_bridges: set[str] = set()
+        for node in nodes:
+            host_node = copy.deepcopy(node)
+            if cross_attachments & {(node.get("hostname"), trunk.get("bridge")) for trunk in node.get("trunks", [{"bridge": "Local Bridge"}])}:
+                default_interface = 0 if node.get("nodedefinition") == "csrv" else 1
+                trunks = node.get("trunks", [{"bridge": "Local Bridge", "interface": default_interface}])
+                host_node["trunks"] = [
+                    dict(trunk, bridge=CROSS_HOST_NETWORK) if (node.get("hostname"), trunk.get("bridge")) in cross_attachments else trunk
+                    for trunk in trunks
+                ]
+            used_bridges |= {trunk.get("bridge") for trunk in host_node.get("trunks", [{"bridge": "Local Bridge"}])}
+            host_vars["nodes"].append(host_node)
+
+        bridges: list[dict] = [bridge for bridge in labvars.get("bridges") or [{"name": "Local Bridge"}] if bridge.get("name") in used_bridges]
+        if CROSS_HOST_NETWORK in used_bridges:
+            bridges.append({"name": CROSS_HOST_NETWORK, "network_type": pnets[host]})
+        host_vars["bridges"] = bridges
+        host_labvars[host] = host_vars
+    return host_labvars
@@ -0,0 +1,185 @@
+"""
+Author: James Duvall
+Purpose: Keeps a pool of pre-booted EVE labs per topology so pipelines don't pay the full build and
+boot time on every run. A pipeline leases an idle lab with the same topology, reconciles it to its
+configs with mod_lab_from_cicd and hands it back to the pool when done instead of deleting it.
+Lease state is kept in a local SQLite database so concurrent pipelines on the runner don't collide.
+"""
+
+import sys
+import json
+import time
+import itertools
+import sqlite3
+import hashlib
+import logging
+from typing import Callable
+from contextlib import contextmanager
+
+if 'pytest' in sys.modules:
+    from tests.config import POOL_DB_PATH, POOL_LEASE_TIMEOUT
+else:
+    from config import POOL_DB_PATH, POOL_LEASE_TIMEOUT
+
+IDLE: str = "idle"
+LEASED: str = "leased"
+BUILDING: str = "building"
+# Build failed and the lab may still be in EVE, the name is held back until reap_labs tears it down
+FAILED: str = "failed"
+
+# Node keys that only change what goes into the lab, not the shape of the lab
+NON_TOPOLOGY_KEYS: tuple[str, ...] = ("config_file", "label", "left", "top")
+
+
+def topology_key(labvars: dict) -> str:
+    """
+    Hash of everything in labvars that needs a rebuild to change (nodes, node types, trunks, bridges)
+    Two labvars with the same key can be reconciled into each other by only redeploying configs
+    """
+    shape: dict = {key: value for key, value in labvars.items() if key != "nodes"}
+    shape["nodes"] = sorted(
+        ({key: value for key, value in node.items() if key not in NON_TOPOLOGY_KEYS} for node in labvars.get("nodes", [])),
+        key=lambda node: node.get("hostname"),
+    )
+    return hashlib.sha256(json.dumps(shape, sort_keys=True).encode()).hexdigest()
+
+
+class LabPool:
+    """
+    Lease bookkeeping for pooled labs, one row per lab: topology, EVE url, state (idle/leased/building), holder
+    """
+
+    def __init__(self, db_path: str = POOL_DB_PATH, lease_timeout: int = POOL_LEASE_TIMEOUT) -> None:
+        self.lease_timeout: int = lease_timeout
+        # autocommit mode, transactions are opened explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pool_labs ("
+            "lab_name TEXT PRIMARY KEY, topology TEXT NOT NULL, eve_url TEXT, "
+            "state TEXT NOT NULL, holder TEXT, updated REAL NOT NULL)"
+        )
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Takes the database write lock up front so two pipelines can't lease the same lab
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def _expire(self, conn: sqlite3.Connection) -> None:
+        """
+        Leases older than lease_timeout belong to pipelines that never released them.
+        Leased labs go back to idle (the next lease reconciles them anyway), half built labs are marked failed
+        """
+        cutoff: float = time.time() - self.lease_timeout
+        for row in conn.execute("SELECT lab_name, state FROM pool_labs WHERE state NOT IN (?, ?) AND updated < ?",
+                                (IDLE, FAILED, cutoff)).fetchall():
+            if row["state"] == BUILDING:
+                logging.warning("Pool lab %s never finished building, leaving it for reap_labs", row['lab_name'])
+                conn.execute("UPDATE pool_labs SET state = ?, holder = NULL, updated = ? WHERE lab_name = ?",
+                             (FAILED, time.time(), row["lab_name"]))
+            else:
+                logging.warning("Lease on pool lab %s expired, returning it to the pool", row['lab_name'])
+                conn.execute("UPDATE pool_labs SET state = ?, holder = NULL, updated = ? WHERE lab_name = ?",
+                             (IDLE, time.time(), row["lab_name"]))
+
+    def acquire(self, topology: str, holder: str, eve_url: str = None) -> str | None:
+        """
+        Lease an idle lab with this topology, returns the lab name or None if none are idle
+        """
+        with self._transaction() as conn:
+            self._expire(conn)
+            row = conn.execute(
+                "SELECT lab_name FROM pool_labs WHERE topology = ? AND eve_url IS ? AND state = ? ORDER BY updated LIMIT 1",
+                (topology, eve_url, IDLE)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE pool_labs SET state = ?, holder = ?, updated = ? WHERE lab_name = ?",
+                         (LEASED, holder, time.time(), row["lab_name"]))
+        logging.info("Leased pool lab %s to %s", row['lab_name'], holder)
+        return row["lab_name"]
+
+    def reserve(self, topology: str, holder: str, size: int, eve_url: str = None) -> str | None:
+        """
+        Claim a name for a new pool lab that is about to be built, None if the topology already has size labs
+        Failed labs don't count towards size, but their names aren't handed out again until they are reaped
+        """
+        with self._transaction() as conn:
+            self._expire(conn)
+            rows = conn.execute("SELECT lab_name, eve_url, state FROM pool_labs WHERE topology = ?", (topology,)).fetchall()
+            if sum(1 for row in rows if row["eve_url"] == eve_url and row["state"] != FAILED) >= size:
+                return None
+            # lab_name is unique across EVE hosts, so the free index is picked from every host's labs
+            names: set[str] = {row["lab_name"] for row in rows}
+            index: int = next(idx for idx in itertools.count() if f"pool-{topology[:10]}-{idx}" not in names)
+            lab_name: str = f"pool-{topology[:10]}-{index}"
+            conn.execute("INSERT INTO pool_labs VALUES (?, ?, ?, ?, ?, ?)",
+                         (lab_name, topology, eve_url, BUILDING, holder, time.time()))
+        logging.info("Reserved pool lab %s for %s", lab_name, holder)
+        return lab_name
+
+    def set_state(self, lab_name: str, state: str, holder: str = None) -> bool:
+        """
+        Moves a pool lab to a new state, returns False if the lab isn't in the pool
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE pool_labs SET state = ?, holder = ?, updated = ? WHERE lab_name = ?",
+                                  (state, holder, time.time(), lab_name))
+        return cursor.rowcount == 1
+
+    def release(self, lab_name: str) -> bool:
+        """
+        Hand a leased lab back to the pool, it stays booted for the next pipeline
+        """
+        released: bool = self.set_state(lab_name, IDLE)
+        if released:
+            logging.info("Returned pool lab %s to the pool", lab_name)
+        return released
+
+    def forget(self, lab_name: str) -> None:
+        """
+        Remove a lab from the pool, used when the lab is gone from EVE or is being torn down
+        """
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM pool_labs WHERE lab_name = ?", (lab_name,))
+
+    @contextmanager
+    def building(self, lab_name: str, teardown: Callable[[], bool]):
+        """
+        Wrap the build of a reserved lab. When the build fails teardown removes whatever was created in EVE
+        and returns whether the lab is gone, then the name is free again. If it isn't gone the lab is marked
+        failed so the name isn't reused on top of it
+        """
+        try:
+            yield
+        except BaseException:
+            try:
+                gone: bool = teardown()
+            # pylint: disable=W0718
+            except Exception as e:
+                logging.error("Teardown of pool lab %s failed - %s", lab_name, e)
+                gone = False
+            if gone:
+                logging.warning("Build of pool lab %s failed, tore it down and removed it from the pool", lab_name)
+                self.forget(lab_name)
+            else:
+                logging.warning("Build of pool lab %s failed and it is still in EVE, leaving it for reap_labs", lab_name)
+                self.set_state(lab_name, FAILED)
+            raise
+
+    def labs(self, topology: str = None) -> list[dict]:
+        """
+        Every lab in the pool, optionally only for one topology
+        """
+        if topology is None:
+            rows = self.conn.execute("SELECT * FROM pool_labs ORDER BY lab_name").fetchall()
+        else:
+            rows = self.conn.execute("SELECT * FROM pool_labs WHERE topology = ? ORDER BY lab_name", (topology,)).fetchall()
+        return [dict(row) for row in rows]
@@ -0,0 +1,72 @@
+"""
+Author: James Duvall
+Purpose: Finds labs left behind by abandoned pipelines (by age and/or name pattern) and tears them
+down in parallel, reporting how much cpu/ram went back to the EVE host.
+"""
+
+import re
+import time
+import logging
+from datetime import datetime
+from concurrent import futures
+
+# Formats EVE has been seen to use for a lab's mtime in the folder listing
+MTIME_FORMATS: tuple[str, ...] = ("%Y-%m-%d %H:%M:%S", "%d %b %Y %H:%M", "%Y-%m-%dT%H:%M:%S")
+
+
+def lab_modified(lab: dict) -> float | None:
+    """
+    Epoch seconds the lab was last modified, from an EVE folder listing entry. None if EVE didn't say
+    """
+    if lab.get("umtime"):
+        return float(lab["umtime"])
+    for fmt in MTIME_FORMATS:
+        try:
+            return datetime.strptime(str(lab.get("mtime")), fmt).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def find_stale_labs(
+    labs: list[dict], max_age_hours: float, name_pattern: str = None, keep: set[str] = frozenset(), now: float = None
+) -> list[str]:
+    """
+    Names of the labs older than max_age_hours, limited to names matching name_pattern when given
+    Labs in keep (pooled labs) are never stale, labs with no modification time only go with max_age_hours 0
+    """
+    now = time.time() if now is None else now
+    stale: list[str] = []
+    for lab in labs:
+        lab_name: str = lab.get("file", "").removesuffix(".unl")
+        if not lab_name or lab_name in keep:
+            continue
+        if name_pattern and not re.search(name_pattern, lab_name):
+            continue
+        if max_age_hours > 0:
+            modified = lab_modified(lab)
+            if modified is None or now - modified < max_age_hours * 3600:
+                continue
+        stale.append(lab_name)
+    return stale
+
+
+def reap_labs(labs: list, workers: int) -> dict[str, int]:
+    """
+    Tears down the given lab interfaces (EVEInterface or anything with lab_resources/teardown_lab_from_cicd)
+    in parallel, returns the totals of nodes, cpu and ram freed
+    """
+
+    def reap(lab) -> dict[str, int]:
+        resources: dict[str, int] = lab.lab_resources()
+        lab.teardown_lab_from_cicd()
+        logging.info("Reaped lab %s, freed %s", lab.lab_name, resources)
+        return resources
+
+    freed: dict[str, int] = {"labs": 0, "nodes": 0, "cpu": 0, "ram": 0}
+    with futures.ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for resources in pool.map(reap, labs):
+            freed["labs"] += 1
+            for key in ("nodes", "cpu", "ram"):
+                freed[key] += resources.get(key, 0)
+    return freed
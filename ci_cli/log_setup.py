@@ -0,0 +1,81 @@
+"""
+Author: James Duvall
+Purpose: Logging setup for the CLI. Records go onto a queue and a background listener does the console
+and file writes, so log I/O stays off the conversion and EVE API paths. The log file rotates at a size
+cap and rotated files are gzipped.
+"""
+
+import os
+import sys
+import gzip
+import queue
+import shutil
+import atexit
+import logging
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+if 'pytest' in sys.modules:
+    from tests.config import LOG_DIR, LOG_MAX_BYTES, LOG_BACKUP_COUNT
+else:
+    from config import LOG_DIR, LOG_MAX_BYTES, LOG_BACKUP_COUNT
+
+LOG_FORMAT: str = '%(name)-12s: %(levelname)-8s %(message)s'
+# Handler and listener from the last setup_logging, the daemon runs many commands in one process
+_active: tuple[QueueHandler, QueueListener] | None = None
+
+
+def _gzip_namer(name: str) -> str:
+    return f"{name}.gz"
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, "rb") as log_file, gzip.open(dest, "wb") as compressed:
+        shutil.copyfileobj(log_file, compressed)
+    os.remove(source)
+
+
+def rotating_file_handler(log_filename: str, max_bytes: int = LOG_MAX_BYTES, backup_count: int = LOG_BACKUP_COUNT) -> RotatingFileHandler:
+    """
+    File handler that rolls over at max_bytes, keeping backup_count gzipped files (log.1.gz, log.2.gz...)
+    """
+    file_handler = RotatingFileHandler(log_filename, maxBytes=max_bytes, backupCount=backup_count, encoding="UTF-8")
+    file_handler.namer = _gzip_namer
+    file_handler.rotator = _gzip_rotator
+    return file_handler
+
+
+def setup_logging(debug_level: str = "INFO", log_dir: str = LOG_DIR) -> QueueListener:
+    """
+    Attach a QueueHandler to the root logger and start the listener writing to the console and
+    log_dir/log_<timestamp>.log. The root level follows debug_level, so records below it are never formatted
+    The listener is stopped (and the queue flushed) at exit
+    Called again while that handler is still attached, only the level changes
+    """
+    global _active  # pylint: disable=W0603
+    level: int = getattr(logging, debug_level, logging.INFO)
+    root = logging.getLogger('')
+    if _active is not None and _active[0] in root.handlers:
+        root.setLevel(level)
+        return _active[1]
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    console = logging.StreamHandler()
+    console.setFormatter(formatter)
+    console.setLevel(level)
+
+    os.makedirs(log_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    file_handler = rotating_file_handler(os.path.join(log_dir, f"log_{timestamp}.log"))
+    file_handler.setFormatter(formatter)
+    file_handler.setLevel(logging.DEBUG)
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, console, file_handler, respect_handler_level=True)
+    queue_handler = QueueHandler(log_queue)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    listener.start()
+    _active = (queue_handler, listener)
+    atexit.register(listener.stop)
+    return listener
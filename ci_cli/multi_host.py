@@ -0,0 +1,160 @@
+"""
+Author: James Duvall
+Purpose: Runs one lab across several EVE hosts. Each host gets an EVEInterface holding its share of
+the labvars nodes (see lab_partitioner), and the per host results (health targets, testbeds) are merged
+back together so the rest of the pipeline doesn't know the lab is split.
+"""
+
+import sys
+import json
+import logging
+from concurrent import futures
+
+import yaml
+
+from .eve_interface import EVEInterface, CHANGED_NODES_FILE
+from .lab_partitioner import segments_from_interface_map, partition_nodes, partition_labvars
+from config import EVE_CROSS_HOST_PNET, EVE_HOST_OVERRIDES
+
+# Written alongside health_targets.json so you can see which host got which nodes
+PARTITIONS_FILE: str = "lab_partitions.json"
+
+
+class MultiHostLab:
+    """
+    Same interface as EVEInterface for the cicd commands, fanned out over multiple EVE hosts
+    """
+
+    def __init__(self, lab_name: str, eve_urls: list[str], source_path: str = None):
+        self.lab_name: str = lab_name
+        self.source_path: str = source_path
+        self.labs: dict[str, EVEInterface] = {
+            eve_url: EVEInterface(lab_name=lab_name, source_path=source_path, eve_url=eve_url)
+            for eve_url in eve_urls
+        }
+        self.yaml_testbed: str = str()
+        self.tb_output_path: str | None = None
+
+    def use_source(self, source_path: str = None) -> None:
+        """
+        Point a lab kept by the daemon at the next command's create_configs output
+        """
+        self.source_path = source_path
+        for lab in self.labs.values():
+            lab.use_source(source_path)
+
+    def _run_all(self, method: str, labs: dict[str, EVEInterface] = None, **kwargs) -> dict:
+        """
+        Call the same EVEInterface method on every host at the same time, returns eve url -> result
+        """
+        labs = self.labs if labs is None else labs
+        with futures.ThreadPoolExecutor(max_workers=max(1, len(labs))) as pool:
+            jobs = {eve_url: pool.submit(getattr(lab, method), **kwargs) for eve_url, lab in labs.items()}
+        return {eve_url: job.result() for eve_url, job in jobs.items()}
+
+    def exists(self) -> bool:
+        """
+        The lab exists if any host already has it
+        """
+        return any(self._run_all("exists").values())
+
+    def build_lab_from_cicd(self) -> None:
+        """
+        Partition the labvars nodes across hosts and build each host's share of the lab in parallel
+        """
+        first_lab = next(iter(self.labs.values()))
+        first_lab.open_and_validate_labvars()
+        labvars: dict = first_lab.labvars
+
+        if first_lab.artifacts.exists("overall_interface_map.json"):
+            segments = segments_from_interface_map(json.loads(first_lab.artifacts.read("overall_interface_map.json")))
+        else:
+            logging.warning("%s/overall_interface_map.json not found, partitioning on capacity only", self.source_path)
+            segments = {}
+
+        free = self._run_all("free_capacity")
+        placement = partition_nodes(labvars.get("nodes"), segments, free)
+        if placement is None:
+            logging.error("Lab does not fit across the provided EVE hosts, add hosts or shrink the node resource profiles")
+            sys.exit(1)
+        pnets: dict[str, str] = {
+            eve_url: EVE_HOST_OVERRIDES.get(eve_url, {}).get("pnet", EVE_CROSS_HOST_PNET) for eve_url in self.labs
+        }
+        host_labvars = partition_labvars(labvars, placement, segments, pnets)
+        with open(PARTITIONS_FILE, "w", encoding="UTF-8") as partitions_file:
+            partitions_file.write(json.dumps(
+                {eve_url: [node.get("hostname") for node in nodes] for eve_url, nodes in placement.items()}, indent=2))
+
+        building: dict[str, EVEInterface] = {}
+        for eve_url, lab in self.labs.items():
+            if not host_labvars[eve_url]["nodes"]:
+                logging.info("No nodes placed on %s, skipping", eve_url)
+                continue
+            lab.labvars = host_labvars[eve_url]
+            building[eve_url] = lab
+        self._run_all("build_lab_from_cicd", labs=building)
+
+    def mod_lab_from_cicd(self) -> list[dict]:
+        """
+        Each host diffs and redeploys its own nodes, the health targets and changed nodes are merged into one file each
+        """
+        existing = {eve_url: lab for eve_url, lab in self.labs.items() if lab.exists()}
+        results = self._run_all("mod_lab_from_cicd", labs=existing)
+        health_targets: list[dict] = [target for targets in results.values() if targets for target in targets]
+        with open("health_targets.json", "w", encoding="UTF-8") as ht_file:
+            ht_file.write(json.dumps(health_targets))
+        with open(CHANGED_NODES_FILE, "w", encoding="UTF-8") as changed_file:
+            changed_file.write(json.dumps([hostname for lab in existing.values() for hostname in lab.changed_nodes]))
+        return health_targets
+
+    def build_testbed(self, tb_output_path: str = None) -> None:
+        """
+        Builds a testbed on every host and merges them into a single pyATS testbed
+        custom.eve_url on each device records where it lives
+        """
+        existing = {eve_url: lab for eve_url, lab in self.labs.items() if lab.exists()}
+        self._run_all("build_testbed", labs=existing)
+        self.tb_output_path = tb_output_path
+        self.merge_testbeds(existing)
+
+    def merge_testbeds(self, labs: dict[str, EVEInterface]) -> None:
+        """
+        Merge the per host testbeds into self.yaml_testbed, and the testbed file when one was asked for
+        """
+        testbed: dict = {"devices": {}}
+        for lab in labs.values():
+            testbed["devices"].update(getattr(lab, "testbed_dict", {}).get("devices", {}))
+        self.yaml_testbed = yaml.dump(testbed, default_flow_style=False)
+        if self.tb_output_path is None:
+            return
+        with open(self.tb_output_path, "w", encoding="UTF-8") as testbed_file:
+            testbed_file.write(self.yaml_testbed)
+            logging.info("Merged testbed for lab %s across %s hosts saved as %s", self.lab_name, len(labs), self.tb_output_path)
+
+    def health_check(self, target_devices: list[dict] = None) -> None:
+        """
+        Each host health checks (and recycles) its own devices
+        """
+        checks: dict[str, EVEInterface] = {}
+        targets: dict[str, list[dict] | None] = {}
+        for eve_url, lab in self.labs.items():
+            devices = getattr(lab, "testbed_dict", {}).get("devices", {})
+            if not devices:
+                continue
+            checks[eve_url] = lab
+            targets[eve_url] = None if target_devices is None else [
+                target for target in target_devices if target.get("device_name") in devices]
+        with futures.ThreadPoolExecutor(max_workers=max(1, len(checks))) as pool:
+            jobs = [pool.submit(lab.health_check, target_devices=targets[eve_url]) for eve_url, lab in checks.items()]
+        for job in jobs:
+            job.result()
+        # recycled nodes were patched in their host's testbed, bring the merged file up to date
+        if checks:
+            self.merge_testbeds(checks)
+
+    def teardown_lab_from_cicd(self) -> None:
+        """
+        Tear the lab down on every host that has it
+        """
+        existing = {eve_url: lab for eve_url, lab in self.labs.items() if lab.exists()}
+        self._run_all("teardown_lab_from_cicd", labs=existing)
@@ -0,0 +1,113 @@
+"""
+Author: James Duvall
+Purpose: Runs the ping_test pings from every source device at once and parses the IOS ping output into
+loss and round-trip statistics, so the testscript asserts on numbers instead of a SubCommandFailure.
+"""
+
+import re
+import logging
+from concurrent import futures
+
+# "Success rate is 80 percent (4/5), round-trip min/avg/max = 1/2/4 ms"
+PING_SUCCESS = re.compile(r"Success rate is (?P<rate>\d+) percent \((?P<received>\d+)/(?P<sent>\d+)\)")
+PING_RTT = re.compile(r"round-trip min/avg/max = (?P<min>\d+)/(?P<avg>\d+)/(?P<max>\d+) ms")
+# IOS defaults, used to bound how long a single ping command may take
+DEFAULT_REPEAT: int = 5
+DEFAULT_TIMEOUT: int = 2
+
+
+def ping_command(p_test: dict) -> str:
+    """
+    IOS ping command for one entry of test_params.pings (addr, vrf, source, repeat, size, timeout, df_bit)
+    """
+    command: list[str] = ["ping"]
+    if p_test.get("vrf") and p_test.get("vrf") != "default":
+        command.append(f"vrf {p_test['vrf']}")
+    command.append(str(p_test.get("addr")))
+    for key in ("source", "repeat", "size", "timeout"):
+        if p_test.get(key) not in (None, ""):
+            command.append(f"{key} {p_test[key]}")
+    if p_test.get("df_bit"):
+        command.append("df-bit")
+    return " ".join(command)
+
+
+def parse_ping(output: str) -> dict:
+    """
+    sent, received, loss_percent and rtt_min/avg/max (ms, None when nothing came back) from IOS ping output
+    """
+    success = PING_SUCCESS.search(output)
+    if not success:
+        return {"sent": 0, "received": 0, "loss_percent": 100, "rtt_min": None, "rtt_avg": None, "rtt_max": None,
+                "error": output.strip().splitlines()[-1] if output.strip() else "no output"}
+    rtt = PING_RTT.search(output)
+    return {
+        "sent": int(success.group("sent")),
+        "received": int(success.group("received")),
+        "loss_percent": 100 - int(success.group("rate")),
+        "rtt_min": int(rtt.group("min")) if rtt else None,
+        "rtt_avg": int(rtt.group("avg")) if rtt else None,
+        "rtt_max": int(rtt.group("max")) if rtt else None,
+        "error": None,
+    }
+
+
+def _ping_device(device, pings: list[dict]) -> list[dict]:
+    # a device has one console session, its pings run one after another
+    if not device.is_connected():
+        device.connect(log_stdout=False)
+    results: list[dict] = []
+    for p_test in pings:
+        command = ping_command(p_test)
+        repeat = int(p_test.get("repeat") or DEFAULT_REPEAT)
+        timeout = int(p_test.get("timeout") or DEFAULT_TIMEOUT)
+        try:
+            output = device.execute(command, timeout=repeat * timeout + 30)
+            result = parse_ping(output)
+        # pylint: disable=W0718
+        except Exception as e:
+            result = parse_ping("")
+            result["error"] = str(e)
+        results.append({"device": device.name, "addr": p_test.get("addr"), "command": command, **result})
+    return results
+
+
+def run_pings(jobs: dict, workers: int = 16) -> dict[str, list[dict]]:
+    """
+    jobs is pyATS device -> list of ping params, every device pings concurrently
+    Returns device name -> one result per ping, in the order given
+    """
+    if not jobs:
+        return {}
+    results: dict[str, list[dict]] = {}
+    with futures.ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+        running = {device.name: (pings, pool.submit(_ping_device, device, pings)) for device, pings in jobs.items()}
+    for name, (pings, job) in running.items():
+        try:
+            results[name] = job.result()
+        # pylint: disable=W0718
+        except Exception as e:
+            logging.error("Pings from %s could not run - %s", name, e)
+            results[name] = [
+                {"device": name, "addr": p_test.get("addr"), "command": ping_command(p_test), **parse_ping(""), "error": str(e)}
+                for p_test in pings
+            ]
+    return results
+
+
+def ping_failures(result: dict, max_loss: int = None, max_rtt: int = None) -> list[str]:
+    """
+    Why a ping result fails, empty when it passes
+    With no max_loss a ping passes when any reply came back, like the unicon ping api
+    """
+    problems: list[str] = []
+    if result.get("error"):
+        problems.append(f"ping failed - {result['error']}")
+    if max_loss is None:
+        if not result.get("received"):
+            problems.append(f"no replies from {result.get('addr')}")
+    elif result.get("loss_percent", 100) > max_loss:
+        problems.append(f"{result.get('loss_percent')}% loss to {result.get('addr')}, allowed {max_loss}%")
+    if max_rtt is not None and result.get("rtt_avg") is not None and result.get("rtt_avg") > max_rtt:
+        problems.append(f"average rtt {result.get('rtt_avg')} ms to {result.get('addr')}, allowed {max_rtt} ms")
+    return problems
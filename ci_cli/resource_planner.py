@@ -0,0 +1,101 @@
+"""
+Author: James Duvall
+Purpose: Works out the cpu/ram each lab node needs from the profiles in config.py and checks
+that the lab fits on the EVE host(s) before anything is built. Can also spread nodes across
+multiple hosts when one host is not enough.
+"""
+
+import re
+import sys
+import logging
+
+if 'pytest' in sys.modules:
+    from tests.config import (
+        NODE_RESOURCE_DEFAULTS,
+        NODE_RESOURCE_PROFILES,
+    )
+else:
+    from config import (
+        NODE_RESOURCE_DEFAULTS,
+        NODE_RESOURCE_PROFILES,
+    )
+
+
+def node_resources(hostname: str, device_type: str) -> dict[str, int]:
+    """
+    cpu and ram (MB) for a node, first NODE_RESOURCE_PROFILES pattern matching the hostname wins
+    """
+    resources: dict[str, int] = dict(NODE_RESOURCE_DEFAULTS[device_type])
+    for pattern, profile in NODE_RESOURCE_PROFILES.items():
+        if re.search(pattern, hostname):
+            logging.debug("%s matched resource profile %s", hostname, pattern)
+            resources.update(profile)
+            break
+    return resources
+
+
+def host_free_capacity(capacity: dict[str, int], status: dict, allocated_cpu: int) -> dict[str, int]:
+    """
+    Takes the configured host capacity, the EVE /api/status data (mem is percent used) and the vCPUs
+    allocated to running nodes, returns what is left for new nodes. The status cpu is utilisation, an idle
+    host with every vCPU handed out would look free, so cpu is counted from the nodes instead
+    """
+    mem_used: float = float(status.get("mem", 0)) / 100
+    return {
+        "cpu": max(0, capacity["cpu"] - allocated_cpu),
+        "ram": int(capacity["ram"] * (1 - mem_used)),
+    }
+
+
+class ResourcePlanner:
+    """
+    Given labvars nodes and the free capacity of one or more EVE hosts,
+    check the totals and decide which host each node goes on
+    """
+
+    def __init__(self, nodes: list[dict]) -> None:
+        self.nodes: list[dict] = nodes
+        self.requirements: dict[str, dict[str, int]] = {
+            node.get("hostname"): node_resources(node.get("hostname"), node.get("nodedefinition"))
+            for node in nodes
+        }
+
+    def total(self) -> dict[str, int]:
+        """
+        Sum of cpu and ram across every node in the lab
+        """
+        return {
+            "cpu": sum(req["cpu"] for req in self.requirements.values()),
+            "ram": sum(req["ram"] for req in self.requirements.values()),
+        }
+
+    def fits(self, free: dict[str, int]) -> bool:
+        """
+        Does the whole lab fit into a single host's free capacity
+        """
+        total = self.total()
+        return total["cpu"] <= free["cpu"] and total["ram"] <= free["ram"]
+
+    def place(self, hosts: dict[str, dict[str, int]]) -> dict[str, list[dict]] | None:
+        """
+        Spread the nodes across hosts (host name -> free capacity), biggest nodes first onto the host with the most ram left
+        Returns host name -> nodes, or None if the nodes can't all be placed
+        """
+        remaining: dict[str, dict[str, int]] = {name: dict(free) for name, free in hosts.items()}
+        placement: dict[str, list[dict]] = {name: [] for name in hosts}
+        ordered = sorted(self.nodes, key=lambda node: self.requirements[node.get("hostname")]["ram"], reverse=True)
+        for node in ordered:
+            req = self.requirements[node.get("hostname")]
+            candidates = [name for name, free in remaining.items() if free["cpu"] >= req["cpu"] and free["ram"] >= req["ram"]]
+            if not candidates:
+                logging.error("No EVE host has room for %s which needs %s", node.get('hostname'), req)
+                return None
+            host = max(candidates, key=lambda name: remaining[name]["ram"])
+            remaining[host]["cpu"] -= req["cpu"]
+            remaining[host]["ram"] -= req["ram"]
+            placement[host].append(node)
+        # Keep labvars order within each host, makes the lab layout predictable
+        order = {node.get("hostname"): idx for idx, node in enumerate(self.nodes)}
+        for nodes in placement.values():
+            nodes.sort(key=lambda node: order[node.get("hostname")])
+        return placement
@@ -0,0 +1,140 @@
+"""
+Author: James Duvall
+Purpose: Split create_configs across CI jobs. Each shard parses its share of the configs and writes a summary
+(hostname and l3 interface rows), merge_shards rebuilds the whole estate from the summaries to run the subnet
+compare, bridge and management address allocation and writes a plan, then each shard rewrites its own configs
+from the plan. Configs are numbered in sorted path order, so the result is the same as a single run.
+"""
+
+import os
+import sys
+import json
+import logging
+import ipaddress
+
+from .configuration import Configuration
+
+# Under output_path, summaries and the plan are written here
+SHARD_DIR: str = "shards"
+PLAN_FILE: str = "plan.json"
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """
+    "i/n" -> (i, n), shards are numbered from 0. Raises ValueError for anything else
+    """
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError as err:
+        raise ValueError(f"shard must look like i/n, got {spec}") from err
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"shard index must be between 0 and {count - 1}, got {spec}")
+    return index, count
+
+
+def in_shard(config_index: int, shard: tuple[int, int]) -> bool:
+    """
+    Configs are dealt out round robin, config i belongs to shard i % n
+    """
+    return config_index % shard[1] == shard[0]
+
+
+def summary_name(shard: tuple[int, int]) -> str:
+    return f"summary_{shard[0]}_of_{shard[1]}.json"
+
+
+def shard_summary(conv, shard: tuple[int, int]) -> dict:
+    """
+    What merge_shards needs from one shard, the parsed configs without their text
+    """
+    table = conv.interface_table
+    return {
+        "shard": list(shard),
+        "total": conv.total_configs,
+        "configs": [
+            {
+                "index": index,
+                "file_": config.file_,
+                "file_path": config.file_path,
+                "hostname": config.hostname,
+                "interfaces": [[table.if_names[row], table.addresses[row], table.prefixlens[row]] for row in config.l3_rows],
+            }
+            for index, config in zip(conv.config_indexes, conv.configs)
+        ],
+    }
+
+
+def load_summaries(conv, shard_dir: str) -> None:
+    """
+    Fill conv.configs with every shard's configs in global order, exits when a shard is missing or doubled
+    """
+    summaries: list[dict] = []
+    for file_ in sorted(os.listdir(shard_dir)):
+        if file_.startswith("summary_") and file_.endswith(".json"):
+            with open(os.path.join(shard_dir, file_), "r", encoding="UTF-8") as summary_file:
+                summaries.append(json.loads(summary_file.read()))
+    if not summaries:
+        logging.error("No shard summaries found in %s", shard_dir)
+        sys.exit(1)
+    count: int = summaries[0]["shard"][1]
+    found: list[int] = sorted(summary["shard"][0] for summary in summaries)
+    if found != list(range(count)) or any(summary["shard"][1] != count for summary in summaries):
+        logging.error("Expected one summary for each of %s shards, found shards %s", count, found)
+        sys.exit(1)
+
+    by_index: dict[int, dict] = {config["index"]: config for summary in summaries for config in summary["configs"]}
+    total: int = summaries[0]["total"]
+    if sorted(by_index) != list(range(total)):
+        logging.error("Shard summaries hold %s of %s configs", len(by_index), total)
+        sys.exit(1)
+
+    conv.configs, conv.config_indexes, conv.total_configs = [], list(range(total)), total
+    for index in range(total):
+        summary = by_index[index]
+        config = Configuration(summary["file_"], summary["file_path"], interface_table=conv.interface_table, lazy=True)
+        config.hostname = summary["hostname"]
+        config.get_device_type()
+        for if_name, address, prefixlen in summary["interfaces"]:
+            config.l3_rows.append(conv.interface_table.add(config.file_path, if_name, address, prefixlen))
+        conv.configs.append(config)
+    logging.info("Merged %s configs from %s shards", total, count)
+
+
+def shard_plan(conv) -> dict:
+    """
+    Everything subnet_compare, assign_bridges and the management allocation decided, per config index
+    """
+    table = conv.interface_table
+    return {
+        "total": conv.total_configs,
+        "configs": {
+            str(index): {
+                "file_": config.file_,
+                "vlanids": [table.vlanids[row] for row in config.l3_rows],
+                "management_ip": str(config.management_ip),
+                "trunk_interfaces": {str(vlanid): trunk for vlanid, trunk in config.trunk_interfaces.items()},
+                "bridge_nics": config.bridge_nics,
+            }
+            for index, config in zip(conv.config_indexes, conv.configs)
+        },
+    }
+
+
+def apply_plan(conv, plan: dict) -> None:
+    """
+    Put the merged decisions back on this shard's configs, exits when the plan was made for other configs
+    """
+    if plan["total"] != conv.total_configs:
+        logging.error("Plan was made for %s configs, the source path has %s", plan["total"], conv.total_configs)
+        sys.exit(1)
+    table = conv.interface_table
+    for index, config in zip(conv.config_indexes, conv.configs):
+        decided: dict = plan["configs"][str(index)]
+        if decided["file_"] != config.file_ or len(decided["vlanids"]) != len(config.l3_rows):
+            logging.error("Plan entry %s (%s) doesn't match %s", index, decided["file_"], config.file_path)
+            sys.exit(1)
+        for row, vlanid in zip(config.l3_rows, decided["vlanids"]):
+            table.vlanids[row] = vlanid
+        config.management_ip = ipaddress.IPv4Address(decided["management_ip"])
+        config.trunk_interfaces = {int(vlanid): trunk for vlanid, trunk in decided["trunk_interfaces"].items()}
+        config.bridge_nics = decided["bridge_nics"]
@@ -0,0 +1,192 @@
+"""
+Author: James Duvall
+Purpose: Collect-once device state for test_handler. The show commands every selected test needs are
+gathered from all devices in one parallel pass into a snapshot directory, then the testscripts parse
+that saved output instead of talking to the lab. A failed run can be re-evaluated from the same snapshot.
+"""
+
+import os
+import re
+import json
+import logging
+from concurrent import futures
+
+from .bgp_routes import route_queries
+from .artifact_writer import write_atomic
+
+# Index of device -> commands collected, written into the snapshot directory
+SNAPSHOT_INDEX: str = "snapshot.json"
+# Recordings append one {"device", "command"} line here per saved output, testscripts record in parallel
+RECORD_INDEX: str = "recorded.jsonl"
+# Tests that change or probe the network (pings) can't be answered from saved output
+LIVE_ONLY_TESTS: tuple[str, ...] = ("ping_test",)
+
+
+def _vrf(test_params: dict) -> str:
+    return test_params.get("vrf") or "default"
+
+
+def commands_for_test(test_type: str, test: dict) -> list[str]:
+    """
+    The show commands a testscript runs for one test, kept in step with testscripts/
+    """
+    test_params: dict = test.get("test_params") or {}
+    vrf: str = _vrf(test_params)
+    if test_type == "bgp_peer_test":
+        address_family: str = test_params.get("address_family") or "ipv4_unicast"
+        if vrf == "default" and address_family == "ipv4_unicast":
+            return ["show bgp summary"]
+        if vrf != "default" and address_family == "vpnv4_unicast":
+            return [f"show bgp vpnv4 unicast vrf {vrf} summary"]
+        if vrf == "default" and address_family == "vpnv4_unicast":
+            return ["show bgp vpnv4 unicast all summary"]
+        return []
+    if test_type == "bgp_route_test":
+        return [command for command, _ in route_queries(test_params)]
+    if test_type == "eigrp_neighbor_test":
+        return ["show ip eigrp neighbors"] if vrf == "default" else [f"show ip eigrp vrf {vrf} neighbors"]
+    if test_type == "ospf_neighbor_test":
+        return ["show ip ospf neighbor"]
+    if test_type == "ospf_redistribution_test":
+        return ["show ip ospf rib redistribution"]
+    if test_type == "interface_status_test":
+        return ["show ip interface brief"]
+    return []
+
+
+def collection_plan(tests: dict[str, list[dict]]) -> dict[str, set[str]]:
+    """
+    device name -> the union of show commands the selected tests need from it
+    """
+    plan: dict[str, set[str]] = {}
+    for test_type, type_tests in tests.items():
+        for test in type_tests:
+            for device_name in test.get("devices") or []:
+                plan.setdefault(device_name, set()).update(commands_for_test(test_type, test))
+    return plan
+
+
+def snapshot_file(snapshot_dir: str, device_name: str, command: str) -> str:
+    """
+    Path of the saved output for one command on one device
+    """
+    slug: str = re.sub(r"[^A-Za-z0-9]+", "_", command).strip("_")
+    return os.path.join(snapshot_dir, device_name, f"{slug}.txt")
+
+
+def _indexed(snapshot_dir: str) -> dict[str, set[str]]:
+    """
+    device name -> commands the snapshot index and the recording index list for snapshot_dir
+    """
+    indexed: dict[str, set[str]] = {}
+    index_path: str = os.path.join(snapshot_dir, SNAPSHOT_INDEX)
+    if os.path.isfile(index_path):
+        with open(index_path, "r", encoding="UTF-8") as index_file:
+            for device_name, commands in json.loads(index_file.read()).items():
+                indexed.setdefault(device_name, set()).update(commands)
+    record_path: str = os.path.join(snapshot_dir, RECORD_INDEX)
+    if os.path.isfile(record_path):
+        with open(record_path, "r", encoding="UTF-8") as record_file:
+            for line in record_file:
+                entry: dict = json.loads(line)
+                indexed.setdefault(entry["device"], set()).add(entry["command"])
+    return indexed
+
+
+def load_output(snapshot_dir: str, device_name: str, command: str) -> str | None:
+    """
+    Saved output for the command, None when the index doesn't list it (not collected, collection failed,
+    or a file left over from an earlier run)
+    """
+    path: str = snapshot_file(snapshot_dir, device_name, command)
+    if command not in _indexed(snapshot_dir).get(device_name, set()) or not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="UTF-8") as output:
+        return output.read()
+
+
+def _collect_device(device, commands: set[str], snapshot_dir: str) -> list[str]:
+    if not device.is_connected():
+        device.connect(log_stdout=False)
+    os.makedirs(os.path.join(snapshot_dir, device.name), exist_ok=True)
+    try:
+        for command in sorted(commands):
+            # written only once execute returned, a failed command leaves no file behind
+            write_atomic(snapshot_file(snapshot_dir, device.name, command), device.execute(command))
+    finally:
+        # the testscripts run in their own processes, don't leave them a shared console session
+        device.disconnect()
+    return sorted(commands)
+
+
+def collect_snapshot(devices: dict, plan: dict[str, set[str]], snapshot_dir: str, workers: int = 8) -> dict[str, list[str]]:
+    """
+    Run every planned command on every device (name -> pyATS device) in parallel and save the output
+    Devices that fail are logged and left out, their tests fall back to running live
+    """
+    index: dict[str, list[str]] = {}
+    targets = {name: commands for name, commands in plan.items() if commands and name in devices}
+    with futures.ThreadPoolExecutor(max_workers=max(1, min(workers, len(targets)))) as pool:
+        jobs = {name: pool.submit(_collect_device, devices[name], commands, snapshot_dir) for name, commands in targets.items()}
+    for name, job in jobs.items():
+        try:
+            index[name] = job.result()
+        # pylint: disable=W0718
+        except Exception as e:
+            logging.error("Snapshot collection failed on %s, its tests will run live - %s", name, e)
+    with open(os.path.join(snapshot_dir, SNAPSHOT_INDEX), "w", encoding="UTF-8") as index_file:
+        index_file.write(json.dumps(index, indent=2))
+    logging.info("Collected %s outputs from %s devices into %s", sum(len(commands) for commands in index.values()), len(index), snapshot_dir)
+    return index
+
+
+def save_output(record_dir: str, device_name: str, command: str, output: str) -> None:
+    """
+    Save one command's raw output in the snapshot layout and list it in the recording index,
+    so a recording can be replayed like a snapshot
+    """
+    path: str = snapshot_file(record_dir, device_name, command)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_atomic(path, output)
+    # one short line per append, so parallel testscripts don't interleave entries
+    with open(os.path.join(record_dir, RECORD_INDEX), "a", encoding="UTF-8") as record_file:
+        record_file.write(json.dumps({"device": device_name, "command": command}) + "\n")
+
+
+def needs_connection(device_output: dict = None) -> bool:
+    """
+    Whether a testscript should connect to its devices up front, not when outputs come from a snapshot or replay
+    """
+    device_output = device_output or {}
+    return not (device_output.get("snapshot_dir") or device_output.get("replay"))
+
+
+def execute_command(device, command: str, snapshot_dir: str = None, record_dir: str = None, replay: bool = False) -> str:
+    """
+    Raw command output, from the snapshot when one was collected for the device, otherwise from the live device
+    Live output is saved to record_dir when set. With replay the snapshot is the only source, nothing goes to the lab
+    """
+    output = load_output(snapshot_dir, device.name, command) if snapshot_dir else None
+    if output is not None:
+        return output
+    if replay:
+        raise LookupError(f"No recorded output of '{command}' for {device.name} in {snapshot_dir}")
+    if not device.is_connected():
+        device.connect(log_stdout=False)
+    output = device.execute(command)
+    if record_dir:
+        save_output(record_dir, device.name, command, output)
+    return output
+
+
+def parse_command(device, command: str, snapshot_dir: str = None, record_dir: str = None, replay: bool = False,
+                  parser: str = None) -> dict:
+    """
+    device.parse, fed from the snapshot/recording when there is one for the device (see execute_command)
+    parser picks the genie parser when the command itself has none, e.g. a filtered form of a table command
+    """
+    if snapshot_dir or record_dir or replay or parser:
+        return device.parse(parser or command, output=execute_command(device, command, snapshot_dir, record_dir, replay))
+    if not device.is_connected():
+        device.connect(log_stdout=False)
+    return device.parse(command)
@@ -0,0 +1,81 @@
+"""
+Author: James Duvall
+Purpose: Optional NumPy implementation of the converter's subnet_compare vlan assignment.
+Loads every interface address/prefix into integer arrays, finds each interface's lan segment
+with a masked compare against a sorted key array, then walks the interfaces once to hand out vlanids.
+Produces the exact same vlanids as the pure python loop in Converter.subnet_compare
+"""
+
+import logging
+
+from .interface_table import prefix_to_mask
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def numpy_available() -> bool:
+    """
+    NumPy is not in requirements.txt, only use this path when it is installed
+    """
+    return np is not None
+
+
+def assign_vlans_vectorized(addresses: list[int], prefixlens: list[int], vlan_seed: int) -> tuple[list[int], int]:
+    """
+    Given the integer address and prefix length of every interface (in subnet_compare order)
+    return the vlanid for each interface and the next unused vlan seed
+    """
+    if np is None:
+        raise RuntimeError("numpy is required for the vectorized subnet compare, pip install numpy")
+    total: int = len(addresses)
+    if total == 0:
+        return [], vlan_seed
+
+    addrs = np.asarray(addresses, dtype=np.uint32)
+    plens = np.asarray(prefixlens, dtype=np.uint8)
+    # segment start/end of every interface, as offsets into the sorted keys of its prefix length
+    seg_start = np.empty(total, dtype=np.int64)
+    seg_end = np.empty(total, dtype=np.int64)
+    sorted_orders: dict[int, list] = {}
+
+    # One masked + sorted copy of the addresses per distinct prefix length (at most 33)
+    for prefixlen in np.unique(plens).tolist():
+        mask = np.uint32(prefix_to_mask(prefixlen))
+        keys = addrs & mask
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        owners = np.nonzero(plens == prefixlen)[0]
+        networks = addrs[owners] & mask
+        seg_start[owners] = np.searchsorted(sorted_keys, networks, side="left")
+        seg_end[owners] = np.searchsorted(sorted_keys, networks, side="right")
+        sorted_orders[prefixlen] = order
+        logging.debug("Indexed %d interfaces with prefix length /%d", len(owners), prefixlen)
+
+    # Addresses are deduplicated the same way as processed_ip_addresses in the python loop
+    _, addr_ids = np.unique(addrs, return_inverse=True)
+    processed = np.zeros(int(addr_ids.max()) + 1, dtype=bool)
+    vlanids = np.zeros(total, dtype=np.int64)
+
+    # Plain lists are much cheaper to index one at a time than numpy scalars
+    addr_id_list: list[int] = addr_ids.tolist()
+    plen_list: list[int] = plens.tolist()
+    start_list: list[int] = seg_start.tolist()
+    end_list: list[int] = seg_end.tolist()
+    for idx in range(total):
+        if processed[addr_id_list[idx]]:
+            continue
+        start, end = start_list[idx], end_list[idx]
+        if end - start == 1:
+            # lonely interface, its segment only holds itself
+            vlanids[idx] = vlan_seed
+            processed[addr_id_list[idx]] = True
+        else:
+            members = sorted_orders[plen_list[idx]][start:end]
+            vlanids[members] = vlan_seed
+            processed[addr_ids[members]] = True
+        vlan_seed += 1
+
+    return vlanids.tolist(), vlan_seed
@@ -0,0 +1,45 @@
+"""
+Author: James Duvall
+Purpose: Picks the tests worth running after a lab modification. A test is affected when one of its
+devices changed config, or shares an L3 segment with a device that did.
+"""
+
+import json
+import logging
+
+from .lab_partitioner import segments_from_interface_map, node_adjacency
+
+
+def load_changed_nodes(changed_nodes_file: str) -> set[str]:
+    """
+    Hostnames from changed_nodes.json (list of names) or health_targets.json (list of {"device_name": ...})
+    """
+    with open(changed_nodes_file, "r", encoding="UTF-8") as changed_file:
+        changed = json.loads(changed_file.read())
+    return {entry.get("device_name") if isinstance(entry, dict) else entry for entry in changed}
+
+
+def impacted_devices(changed: set[str], interface_map: dict) -> set[str]:
+    """
+    The changed devices plus every device sharing a segment with one of them
+    """
+    adjacency = node_adjacency(segments_from_interface_map(interface_map))
+    impacted: set[str] = set(changed)
+    for hostname in changed:
+        impacted.update(adjacency.get(hostname, {}))
+    return impacted
+
+
+def select_tests(tests: dict[str, list[dict]], impacted: set[str]) -> dict[str, list[dict]]:
+    """
+    Same shape as grab_tests, keeping only tests that touch an impacted device
+    Tests without a devices list can't be judged and are kept
+    """
+    selected: dict[str, list[dict]] = {}
+    for test_type, type_tests in tests.items():
+        selected[test_type] = [
+            test for test in type_tests if not test.get("devices") or impacted.intersection(test.get("devices"))
+        ]
+    kept: int = sum(len(type_tests) for type_tests in selected.values())
+    logging.info("Test impact selection kept %s of %s tests", kept, sum(len(type_tests) for type_tests in tests.values()))
+    return selected
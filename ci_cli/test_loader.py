@@ -0,0 +1,148 @@
+"""
+Author: James Duvall
+Purpose: Loads the YAML test definitions for test_handler. Files are parsed with the LibYAML loader
+(in parallel when there are many), every test is checked against the schema for its type before
+pyATS starts, and parsed tests are cached by file hash so unchanged suites load from one JSON file.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from concurrent import futures
+
+import yaml
+
+# LibYAML is much faster, fall back to the pure python loader if PyYAML was built without it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+# Below this many files to parse, a process pool costs more than it saves
+PARALLEL_THRESHOLD: int = 64
+
+# Keys every test needs, and per type the test_params keys the testscript reads
+COMMON_SCHEMA: dict[str, type] = {"type": str, "test_description": str, "devices": list, "test_params": dict}
+TEST_SCHEMAS: dict[str, dict[str, type | tuple]] = {
+    "bgp_peer_test": {"neighbors": list},
+    "ospf_neighbor_test": {"neighbors": list},
+    "eigrp_neighbor_test": {"as": (int, str), "neighbors": list},
+    "bgp_route_test": {"routes": list},
+    "interface_status_test": {"interfaces": list},
+    "ospf_redistribution_test": {"ospf_processes": list},
+    "ping_test": {"pings": list},
+}
+# Lists of mappings in test_params and the keys each item needs
+ITEM_KEYS: dict[str, dict[str, tuple[str, ...]]] = {
+    "eigrp_neighbor_test": {"neighbors": ("address", "interface")},
+    "bgp_route_test": {"routes": ("network",)},
+    "ospf_redistribution_test": {"ospf_processes": ("process_id", "networks")},
+    "ping_test": {"pings": ("addr",)},
+}
+
+
+def validate_test(test: dict) -> list[str]:
+    """
+    Problems with a single test definition, empty when the test is valid
+    """
+    if not isinstance(test, dict):
+        return ["test file does not contain a mapping"]
+    errors: list[str] = []
+    for key, expected in COMMON_SCHEMA.items():
+        if not isinstance(test.get(key), expected):
+            errors.append(f"'{key}' must be a {expected.__name__}")
+    if test.get("type") not in TEST_SCHEMAS:
+        errors.append(f"unknown test type '{test.get('type')}', valid types are {list(TEST_SCHEMAS)}")
+        return errors
+    if errors:
+        return errors
+    test_params: dict = test.get("test_params")
+    for key, expected in TEST_SCHEMAS[test.get("type")].items():
+        if not isinstance(test_params.get(key), expected):
+            errors.append(f"test_params.{key} is required")
+    for key, item_keys in ITEM_KEYS.get(test.get("type"), {}).items():
+        for idx, item in enumerate(test_params.get(key) or []):
+            missing = [item_key for item_key in item_keys if not isinstance(item, dict) or item_key not in item]
+            if missing:
+                errors.append(f"test_params.{key}[{idx}] is missing {missing}")
+    if test.get("type") == "bgp_route_test" and test_params.get("vrf") not in (None, "default") and not test_params.get("rd"):
+        errors.append("test_params.rd is required when a vrf is provided")
+    return errors
+
+
+def _parse_file(path: str) -> tuple[str, str, object, str | None]:
+    """
+    Read, hash and parse one test file. Returns path, content hash, parsed test, parse error
+    """
+    with open(path, "rb") as test_file:
+        content: bytes = test_file.read()
+    digest: str = hashlib.sha1(content).hexdigest()
+    try:
+        return path, digest, yaml.load(content, Loader=YAML_LOADER), None
+    except yaml.YAMLError as e:
+        return path, digest, None, f"invalid YAML - {e}"
+
+
+def _json_safe(value: object) -> bool:
+    """
+    value comes back from JSON unchanged. YAML can also load dates, sets and non string keys,
+    which JSON would turn into strings
+    """
+    if isinstance(value, dict):
+        return all(isinstance(key, str) and _json_safe(item) for key, item in value.items())
+    if isinstance(value, list):
+        return all(_json_safe(item) for item in value)
+    return value is None or isinstance(value, (str, int, float))
+
+
+def _hash_file(path: str) -> str:
+    with open(path, "rb") as test_file:
+        return hashlib.sha1(test_file.read()).hexdigest()
+
+
+def load_tests(test_directory: str, cache_path: str = None) -> tuple[dict[str, list[dict]], dict[str, list[str]]]:
+    """
+    Loads every .yml test below test_directory
+    Returns (test type -> tests in file order, file path -> validation errors). Tests with errors are left out
+    cache_path is a JSON file of path -> {hash, test}, only files whose hash changed are parsed again
+    """
+    paths: list[str] = sorted(
+        os.path.join(directory, file_) for directory, _, files in os.walk(test_directory) for file_ in files if file_.endswith(".yml")
+    )
+    cache: dict[str, dict] = {}
+    if cache_path and os.path.isfile(cache_path):
+        with open(cache_path, "r", encoding="UTF-8") as cache_file:
+            cache = json.loads(cache_file.read())
+
+    parsed: dict[str, tuple[str, object, str | None]] = {}
+    stale: list[str] = []
+    for path in paths:
+        entry = cache.get(path)
+        digest = _hash_file(path) if entry else None
+        if entry and entry.get("hash") == digest:
+            parsed[path] = (digest, entry.get("test"), None)
+        else:
+            stale.append(path)
+    if len(stale) >= PARALLEL_THRESHOLD:
+        with futures.ProcessPoolExecutor() as pool:
+            results = list(pool.map(_parse_file, stale, chunksize=32))
+    else:
+        results = [_parse_file(path) for path in stale]
+    for path, digest, test, error in results:
+        parsed[path] = (digest, test, error)
+    logging.info("Loaded %s test files, %s parsed and %s from cache", len(paths), len(stale), len(paths) - len(stale))
+
+    tests: dict[str, list[dict]] = {test_type: [] for test_type in TEST_SCHEMAS}
+    errors: dict[str, list[str]] = {}
+    new_cache: dict[str, dict] = {}
+    for path in paths:
+        digest, test, error = parsed[path]
+        problems = [error] if error else validate_test(test)
+        if problems:
+            errors[path] = problems
+            continue
+        # tests JSON can't hold exactly are parsed again every run rather than cached as strings
+        if _json_safe(test):
+            new_cache[path] = {"hash": digest, "test": test}
+        tests[test.get("type")].append(test)
+    if cache_path and new_cache != cache:
+        with open(cache_path, "w", encoding="UTF-8") as cache_file:
+            cache_file.write(json.dumps(new_cache))
+    return tests, errors
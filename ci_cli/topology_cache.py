@@ -0,0 +1,71 @@
+"""
+Author: James Duvall
+Purpose: Session cache of what EVE reports for a lab (nodes, startup configs, whether it exists),
+kept by EVEInterface so one CLI command asks EVE for each piece once. Start/stop/wipe only mark the node
+they touched stale, and that node is re-read on its own the next time the node list is needed.
+"""
+
+from typing import Callable
+
+
+class TopologyCache:
+    """
+    Node and config state for one lab. Node ids are always kept as strings, as EVE returns them
+    """
+
+    def __init__(self) -> None:
+        self.nodes: dict[str, dict] | None = None
+        self.stale_nodes: set[str] = set()
+        self.configs: dict[str, dict] | None = None
+        self.lab_exists: bool | None = None
+
+    def node_map(self, fetch_all: Callable[[], dict | None], fetch_one: Callable[[str], dict | None]) -> dict[str, dict] | None:
+        """
+        node id -> node details. The full list is fetched once, after that only stale nodes are fetched again
+        Returns None (and caches nothing) when EVE couldn't be reached
+        """
+        if self.nodes is None:
+            nodes = fetch_all()
+            if nodes is None:
+                return None
+            self.nodes = {str(node_id): node for node_id, node in nodes.items()}
+            self.stale_nodes.clear()
+        for node_id in sorted(self.stale_nodes):
+            node = fetch_one(node_id)
+            if node is None:
+                # couldn't be refreshed (gone or EVE hiccup), re-read the whole list rather than serve old state
+                self.nodes = None
+                self.stale_nodes.clear()
+                return self.node_map(fetch_all, fetch_one)
+            self.nodes[node_id] = node
+        self.stale_nodes.clear()
+        return self.nodes
+
+    def invalidate_node(self, node_id) -> None:
+        """
+        The node's status or console changed (start, stop, wipe)
+        """
+        if self.nodes is not None:
+            self.stale_nodes.add(str(node_id))
+
+    def add_node(self, node_id) -> None:
+        """
+        A node was created, its details are fetched with the next node list
+        """
+        if self.nodes is not None:
+            self.stale_nodes.add(str(node_id))
+
+    def set_config(self, node_id, config: str) -> None:
+        """
+        A startup config was deployed, keep the cached copy in step with it
+        """
+        if self.configs is not None and str(node_id) in self.configs:
+            self.configs[str(node_id)]["configdata"] = config
+
+    def clear(self, lab_exists: bool | None = None) -> None:
+        """
+        Forget everything, the lab was created or deleted
+        """
+        self.nodes, self.configs = None, None
+        self.stale_nodes.clear()
+        self.lab_exists = lab_exists
@@ -5,35 +5,47 @@ Purpose: easypy script to dynamically determine the tests needed to run against
 import argparse
 import sys
 import os
-import json
 import logging
-import yaml
 from ipaddress import IPv4Address, AddressValueError
 from pyats.reporter.exceptions import DuplicateIDError
 from pyats import easypy
+from ci_cli.interface_mapper import InterfaceMapper
+from ci_cli.test_loader import load_tests
+from ci_cli.test_impact import load_changed_nodes, impacted_devices, select_tests
+from ci_cli.snapshot import collection_plan, collect_snapshot, SNAPSHOT_INDEX, LIVE_ONLY_TESTS
 
 parser = argparse.ArgumentParser(description = "test_handler CLI tool")
 parser.add_argument("--test_directory", required=True)
-parser.add_argument("--interface_map_file", required=True)
+parser.add_argument("--interface_map_file", required=True, help="overall_interface_map.json, an interface_map directory, or the create_configs --archive zip")
+parser.add_argument("--test_cache", default=".test_cache.json", help="Parsed tests are cached here by file hash, unchanged files are not parsed again")
+parser.add_argument("--changed_nodes", help="changed_nodes.json or health_targets.json from create_or_mod_lab, only runs tests on those nodes and their L3 neighbors")
+parser.add_argument("--full_suite", action="store_true", help="Run every test even when --changed_nodes is provided")
+parser.add_argument("--snapshot_dir", help="Collect the show output every test needs into this directory in one parallel pass, then evaluate the tests against it")
+parser.add_argument("--reuse_snapshot", action="store_true", help="Evaluate against an existing --snapshot_dir without touching the lab")
+parser.add_argument("--record_dir", help="Save the raw output of every command run against the live lab into this directory")
+parser.add_argument("--replay_dir", help="Evaluate the tests against recordings (or a snapshot) in this directory, no lab needed. Ping tests are skipped")
 
-class IntBackwardsConverter:
+class IntBackwardsConverter(InterfaceMapper):
     """
     Helper class we will use in the testscripts
-    Takes in the interface file
+    Takes in the interface file (or interface_map directory, or --archive zip), device maps are loaded as tests ask for them
     """
-    def __init__(self, interface_map_file: str):
-        with open(interface_map_file, "r") as int_map:
-            self.json_int_map = json.loads(int_map.read())
+    @property
+    def json_int_map(self) -> dict:
+        """
+        The whole map in the overall_interface_map.json shape
+        """
+        return {"devices": self.devices()}
 
     def mapper(self, device_name: str, interface_name: str):
         """
         helper method, provies the converted interface
+        Shorthand names (Gi0/1) are normalized before the lookup
         """
         if self.is_ip(interface_name):
             logging.info("IP provided to mapper function, passing gracefully")
             return interface_name
-        target_device_d = self.json_int_map["devices"][device_name]
-        converted_interface = target_device_d.get(interface_name)
+        converted_interface = self.lab_interface(device_name, interface_name)
         if not converted_interface:
             logging.warning("Specified interface not found, using interface name found in test instead (This is expected for logical interfaces [loopbacks/tunnels])")
             return interface_name
@@ -52,40 +64,29 @@ class IntBackwardsConverter:
         except AddressValueError:
             return False
 
-def grab_tests(test_directory: str) -> dict:
+def grab_tests(test_directory: str, cache_path: str = None) -> dict:
     """
     Grab tests and return test dict
+    Every test is validated before anything runs, a broken test stops the job here instead of deep inside pyATS
     """
-    tests = {
-        "bgp_peer_test": [],
-        "ospf_neighbor_test": [],
-        "eigrp_neighbor_test": [],
-        "bgp_route_test": [],
-        "interface_status_test": [],
-        "ospf_redistribution_test": [],
-        "ping_test": []
-    }
-    for directory, _, files in os.walk(test_directory):
-        for file in files:
-            if file.endswith(".yml"):
-                with open(f"{directory}/{file}") as opened_test:
-                    new_test = yaml.safe_load(opened_test.read())
-                    if new_test.get("type") in tests.keys():
-                        tests[new_test.get("type")].append(new_test)
-                        logging.info(f"Added test {file} to tests lists")
-                    else:
-                        logging.warning(f"Test with filename {file}, does not have a valid test type value")
-
+    tests, errors = load_tests(test_directory, cache_path=cache_path)
+    for path, problems in errors.items():
+        for problem in problems:
+            logging.error("Test file %s - %s", path, problem)
+    if errors:
+        logging.error("%s test files are invalid, fix them before running the suite", len(errors))
+        sys.exit(1)
     return tests
 
-def run_tests(runtime, tests: dict, test_type:str, mapper: IntBackwardsConverter):
+def run_tests(runtime, tests: dict, test_type:str, mapper: IntBackwardsConverter, device_output: dict = None):
     """
     Iterate through all the tests of a specified type
+    device_output (snapshot_dir, record_dir, replay) tells the testscripts where command output comes from and goes to
     """
     for test in tests.get(test_type, []):
         test_devices=[device for device in runtime.testbed.devices.values() if device.name in test.get("devices")]
         try:
-            easypy.run(testscript=f"testscripts/{test_type}.py", taskid=test.get("test_description"), test_params=test, devices=test_devices, mapper=mapper)
+            easypy.run(testscript=f"testscripts/{test_type}.py", taskid=test.get("test_description"), test_params=test, devices=test_devices, mapper=mapper, device_output=device_output or {})
         except DuplicateIDError:
             logging.warning("Two tests have the same description, please correct for the second test to take effect")
 
@@ -97,8 +98,30 @@ def main(runtime):
     args, _ = parser.parse_known_args(sys.argv[1:])
     args = vars(args)
     #Create our production <-> Lab converter class
-    mapper = IntBackwardsConverter(interface_map_file=args.get("interface_map_file"))
-    tests = grab_tests(args.get("test_directory"))
+    mapper = IntBackwardsConverter(args.get("interface_map_file"))
+    tests = grab_tests(args.get("test_directory"), cache_path=args.get("test_cache"))
+    if args.get("changed_nodes") and not args.get("full_suite"):
+        changed = load_changed_nodes(args.get("changed_nodes"))
+        impacted = impacted_devices(changed, mapper.json_int_map)
+        logging.info("Changed nodes %s, running tests for %s", sorted(changed), sorted(impacted))
+        tests = select_tests(tests, impacted)
+    snapshot_dir = args.get("snapshot_dir")
+    record_dir = args.get("record_dir")
+    replay_dir = args.get("replay_dir")
+    if replay_dir:
+        logging.info("Replaying recorded device output from %s, skipping %s", replay_dir, LIVE_ONLY_TESTS)
+        tests = {test_type: type_tests for test_type, type_tests in tests.items() if test_type not in LIVE_ONLY_TESTS}
+        snapshot_dir = replay_dir
+    elif snapshot_dir:
+        if args.get("reuse_snapshot") and os.path.isfile(f"{snapshot_dir}/{SNAPSHOT_INDEX}"):
+            logging.info("Evaluating tests against the existing snapshot in %s", snapshot_dir)
+        else:
+            os.makedirs(snapshot_dir, exist_ok=True)
+            plan = collection_plan({test_type: type_tests for test_type, type_tests in tests.items() if test_type not in LIVE_ONLY_TESTS})
+            collect_snapshot(runtime.testbed.devices, plan, snapshot_dir)
     for test_name in tests.keys():
-        logging.info(f"Running test - {test_name}")
-        run_tests(runtime, tests, test_name, mapper)
+        logging.info("Running test - %s", test_name)
+        device_output = {"record_dir": record_dir, "replay": bool(replay_dir)}
+        if test_name not in LIVE_ONLY_TESTS:
+            device_output["snapshot_dir"] = snapshot_dir
+        run_tests(runtime, tests, test_name, mapper, device_output=device_output)
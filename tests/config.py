@@ -105,4 +105,87 @@ CSRV_IMAGE_TYPE = "c8000v"
 
 #The CSRv and vIOS node image that you have loaded and installed for EVE-NG
 CSRV_IMAGE = "c8000v-17.09.04a"
-IOSV_IMAGE = "vios-adventerprisek9-m.SPA.159-3.M6"
\ No newline at end of file
+IOSV_IMAGE = "vios-adventerprisek9-m.SPA.159-3.M6"
+
+#Sharded bridge mode (create_configs --bridge_mode sharded)
+#Maximum number of lab nodes attached to a single bridge network, vlan segments are packed into bridges up to this size
+BRIDGE_MAX_NODES = 16
+
+#Resources given to each lab node, cpu count and ram in MB
+#NODE_RESOURCE_DEFAULTS is used per device type unless a NODE_RESOURCE_PROFILES entry matches
+NODE_RESOURCE_DEFAULTS = {
+    "iosv": {"cpu": 1, "ram": 2048},
+    "csrv": {"cpu": 1, "ram": 4096},
+}
+
+#Overrides for specific nodes or roles, keys are regex patterns matched against the hostname, first match wins
+#Any key left out of a profile falls back to NODE_RESOURCE_DEFAULTS
+NODE_RESOURCE_PROFILES = {
+    #"^CORE-": {"cpu": 2, "ram": 3072},
+}
+
+#What an EVE host can give to a lab, checked before building so a lab never half deploys
+#cpu is the number of vCPUs you are willing to allocate (cores * overcommit), ram is in MB
+#The host's current cpu/mem usage from the EVE status api is subtracted from these
+EVE_HOST_CAPACITY = {
+    "cpu": 32,
+    "ram": 65536,
+}
+
+#Multi host labs (create_or_mod_lab --eve_url given more than once)
+#pnet network on every EVE host that is layer 2 connected to the same pnet on the other hosts, segments split across hosts ride it
+EVE_CROSS_HOST_PNET = "pnet1"
+
+#Per host overrides of EVE_HOST_CAPACITY (cpu/ram) and EVE_CROSS_HOST_PNET (pnet), keyed by EVE url
+EVE_HOST_OVERRIDES = {
+    #"https://10.0.0.2": {"cpu": 64, "ram": 262144, "pnet": "pnet2"},
+}
+
+#Warm lab pool (lease_lab / release_lab / fill_pool commands)
+#SQLite file holding the pool leases, must be on storage every pipeline runner using the pool can reach
+POOL_DB_PATH = "lab_pool.db"
+#How many pre-booted labs to keep per topology
+POOL_SIZE = 2
+#Seconds before a lease is considered abandoned (pipeline died without release_lab) and the lab goes back to the pool
+POOL_LEASE_TIMEOUT = 6 * 60 * 60
+
+#Concurrent EVE API calls per lab (node stops during teardown) and labs torn down at once by reap_labs
+EVE_API_WORKERS = 8
+
+#reap_labs tears down labs last modified more than this many hours ago
+REAP_MAX_AGE_HOURS = 24
+
+#Hot config apply (create_or_mod_lab on an existing lab)
+#Changed configs are pushed to the running node over its console instead of a wipe and reboot when this is True
+HOT_APPLY_ENABLED = True
+#Regex patterns for config lines that can't safely be changed on a running node, any match falls back to a wipe and reboot
+HOT_APPLY_UNSAFE = [
+    r"^banner ",
+    r"^boot ",
+    r"^license ",
+    r"^platform ",
+    r"^version ",
+    r"^vrf forwarding ",
+    r"^ip vrf forwarding ",
+]
+
+#CLI logging, the log file in LOG_DIR rolls over at LOG_MAX_BYTES and keeps LOG_BACKUP_COUNT gzipped files
+LOG_DIR = "logs"
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+#Seconds the health check console probe waits for a prompt from each node before the full pyATS connect
+CONSOLE_PROBE_TIMEOUT = 3
+
+#Config parser used by the converter, "fast" (built in ios_tree, indexed) or "ciscoconfparse" (slower, fallback)
+CONFIG_PARSER = "fast"
+
+#Threads writing the converter output files in the background
+ARTIFACT_WRITERS = 8
+
+#Unix socket for `ci_cli.py daemon`, relative to the pipeline's working directory. CI_CLI_SOCKET overrides it
+DAEMON_SOCKET = ".ci_cli_daemon.sock"
+#Seconds a daemon keeps an EVE login (and the lab's testbed) before logging in again on the next command
+DAEMON_SESSION_MAX_AGE = 3600
+#Parsed config files the daemon keeps between conversions, the least recently used are dropped past this
+PARSED_FILE_CACHE_SIZE = 2000
@@ -7,6 +7,7 @@ import os
 from ci_cli.converter import Converter
 from ci_cli.configuration import Configuration
 from ciscoconfparse import CiscoConfParse
+from ci_cli.ios_tree import IOSConfigTree
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -22,7 +23,7 @@ def t_converter():
         output_path="tests/test_dest",
         vlan_seed=2,
         config_file_ext=".txt",
-        gitlab_user="1234"
+        user="1"
     )
     return conv
 
@@ -33,7 +34,7 @@ def r1_config():
 @pytest.fixture(scope="module")
 def r1_initiated(r1_config):
     r1_config.get_current_parsed_config()
-    assert isinstance(r1_config.current_parsed_config, CiscoConfParse), "current_parsed_config property is  not a CiscoConfParse object"
+    assert isinstance(r1_config.current_parsed_config, (IOSConfigTree, CiscoConfParse)), "current_parsed_config property is  not a parsed config object"
     r1_config.get_hostname()
     assert r1_config.hostname == "r1", "Hostname does not reflect config"
     r1_config.get_device_type()
@@ -58,7 +59,7 @@ def r2_initiated(r2_config):
     Creates a Configuration object for r2 and initiates it
     """
     r2_config.get_current_parsed_config()
-    assert isinstance(r2_config.current_parsed_config, CiscoConfParse), "current_parsed_config property is  not a CiscoConfParse object"
+    assert isinstance(r2_config.current_parsed_config, (IOSConfigTree, CiscoConfParse)), "current_parsed_config property is  not a parsed config object"
     r2_config.get_hostname()
     assert r2_config.hostname == "r2", "Hostname does not reflect config"
     r2_config.get_device_type()
@@ -0,0 +1,48 @@
+"""
+create_configs --archive writes the same artifacts as the output directory, readable without extracting
+"""
+
+import json
+import zipfile
+from ci_cli.converter import Converter
+from ci_cli.artifact_archive import ArtifactSource, ARCHIVE_INDEX, is_archive
+from ci_cli.interface_mapper import InterfaceMapper
+
+
+def _convert(output_path: str, archive: bool) -> Converter:
+    conv = Converter(source_path="tests/test_source", output_path=output_path, user="1", archive=archive)
+    conv.load_configs()
+    conv.parse_configs()
+    conv.subnet_compare()
+    conv.manipulate_configs()
+    conv.save_interface_mapping()
+    conv.create_lab_vars()
+    conv.save_securecrt_sessions()
+    conv.flush_output()
+    return conv
+
+
+def test_archive_matches_directory(tmp_path):
+    _convert(str(tmp_path / "out"), archive=False)
+    _convert(str(tmp_path / "zipped"), archive=True)
+    archive_path = str(tmp_path / "zipped.zip")
+    assert is_archive(archive_path) and not (tmp_path / "zipped").exists()
+
+    directory, archive = ArtifactSource(str(tmp_path / "out")), ArtifactSource(archive_path)
+    with zipfile.ZipFile(archive_path) as zipped:
+        index = json.loads(zipped.read(ARCHIVE_INDEX))["files"]
+    assert "LAB-r1.txt" in index and "securecrt_sessions/r1.ini" in index and "interface_map/r1.json" in index
+    for name, entry in index.items():
+        assert archive.read(name) == directory.read(name)
+        assert entry["size"] == len(directory.read(name).encode("UTF-8"))
+    assert archive.names("interface_map") == directory.names("interface_map") == ["r1.json", "r2.json"]
+    assert not archive.exists("LAB-r3.txt")
+
+
+def test_interface_mapper_reads_archive(tmp_path):
+    _convert(str(tmp_path / "zipped"), archive=True)
+    from_archive = InterfaceMapper(str(tmp_path / "zipped.zip"))
+    _convert(str(tmp_path / "out"), archive=False)
+    from_directory = InterfaceMapper(str(tmp_path / "out" / "overall_interface_map.json"))
+    assert from_archive.devices() == from_directory.devices()
+    assert from_archive.device_dir == "interface_map"
@@ -0,0 +1,53 @@
+"""
+Queued artifact writes land atomically and unchanged files are left alone
+"""
+
+import os
+import pytest
+from ci_cli.artifact_writer import ArtifactWriter, write_atomic, WRITTEN, UNCHANGED
+
+
+def test_write_atomic_skips_unchanged(tmp_path):
+    path = str(tmp_path / "LAB-r1.txt")
+    assert write_atomic(path, "hostname r1\n") == WRITTEN
+    mtime = os.stat(path).st_mtime_ns
+    assert write_atomic(path, "hostname r1\n") == UNCHANGED
+    assert os.stat(path).st_mtime_ns == mtime
+    assert write_atomic(path, "hostname r2\n") == WRITTEN
+    assert open(path, encoding="UTF-8").read() == "hostname r2\n"
+    assert os.listdir(tmp_path) == ["LAB-r1.txt"]
+
+
+def test_writer_flush(tmp_path):
+    writer = ArtifactWriter(workers=4)
+    for idx in range(20):
+        writer.write(str(tmp_path / f"r{idx}.txt"), f"hostname r{idx}")
+    # same path twice, the last write wins
+    writer.write(str(tmp_path / "r0.txt"), "hostname last")
+    assert writer.flush() == {WRITTEN: 20, UNCHANGED: 0}
+    assert (tmp_path / "r0.txt").read_text() == "hostname last"
+    writer.write(str(tmp_path / "r1.txt"), "hostname r1")
+    assert writer.flush() == {WRITTEN: 0, UNCHANGED: 1}
+
+
+def test_writer_failure_exits(tmp_path):
+    writer = ArtifactWriter()
+    writer.write(str(tmp_path / "missing" / "r1.txt"), "hostname r1")
+    with pytest.raises(SystemExit):
+        writer.flush()
+
+
+def test_write_atomic_file_mode(tmp_path):
+    """
+    New files get the umask default like open() would, replaced files keep their mode
+    """
+    umask = os.umask(0o022)
+    os.umask(umask)
+    new = tmp_path / "labvars.json"
+    write_atomic(str(new), "{}")
+    assert new.stat().st_mode & 0o777 == 0o666 & ~umask
+    existing = tmp_path / "LAB-r1.txt"
+    existing.write_text("old")
+    existing.chmod(0o640)
+    write_atomic(str(existing), "new")
+    assert existing.stat().st_mode & 0o777 == 0o640
@@ -0,0 +1,75 @@
+"""
+tests against bgp_route_test route grouping, query planning and checks
+"""
+import time
+
+from ci_cli.bgp_routes import (
+    group_routes, route_queries, table_routes, collect_routes, network_failures, TARGETED_PREFIX_LIMIT
+)
+
+
+def test_route_queries():
+    params = {"routes": [{"network": "10.0.0.0/24"}, {"network": "10.0.0.0/24"}, {"network": "10.1.0.0/24"}]}
+    assert route_queries(params) == [
+        ("show ip bgp 10.0.0.0/24 longer-prefixes", "show ip bgp"),
+        ("show ip bgp 10.1.0.0/24 longer-prefixes", "show ip bgp"),
+    ]
+    assert route_queries({**params, "lookup": "table", "vrf": "RED"}) == [("sho bgp vpnv4 unicast vrf RED",) * 2]
+    many = {"routes": [{"network": f"10.{idx}.0.0/16"} for idx in range(TARGETED_PREFIX_LIMIT + 1)]}
+    assert route_queries(many) == [("show ip bgp", "show ip bgp")]
+    # classful networks printed without a length can't be queried with longer-prefixes
+    classful = {"routes": [{"network": "10.0.0.0/24"}, {"network": "192.168.1.0"}], "lookup": "prefix"}
+    assert route_queries(classful) == [("show ip bgp", "show ip bgp")]
+
+
+def test_table_routes():
+    parsed = {"vrf": {"RED": {"address_family": {"vpnv4 unicast RD 65000:1": {"routes": {"10.0.0.0/24": {}}}}}}}
+    assert table_routes(parsed, {"vrf": "RED", "rd": "65000:1"}) == {"10.0.0.0/24": {}}
+    assert table_routes(parsed, {}) == {}
+
+
+def test_network_failures():
+    entry = {"index": {
+        1: {"next_hop": "1.1.1.1", "metric": "0", "localpref": "100", "status_codes": "*>"},
+        2: {"next_hop": "2.2.2.2", "metric": "10", "status_codes": "* i"},
+    }}
+    expected = [
+        {"network": "10.0.0.0/24", "next_hop": "1.1.1.1", "metric": 0, "status_codes": {"best_path": True}},
+        {"network": "10.0.0.0/24", "next_hop": "2.2.2.2", "status_codes": {"learned_via_ibgp": False}},
+    ]
+    problems = network_failures("10.0.0.0/24", expected, entry)
+    assert problems == ["route should not be learned via IBGP, however it is"]
+    assert network_failures("10.0.0.0/24", expected[:1], entry)[0].startswith("Mismatch in route count")
+    assert network_failures("10.9.0.0/24", expected, None) == ["Route 10.9.0.0/24 not found in BGP table"]
+
+
+class EmptyOutput(Exception):
+    pass
+
+
+def test_collect_routes_missing_prefix():
+    """
+    A prefix query with no output doesn't stop the other prefixes being checked, the missing one is reported
+    """
+    params = {"routes": [{"network": "10.0.0.0/24", "next_hop": "1.1.1.1"}, {"network": "10.9.0.0/24", "next_hop": "1.1.1.1"}]}
+    entry = {"index": {1: {"next_hop": "1.1.1.1"}}}
+
+    def parse(command, parser):
+        assert parser == "show ip bgp"
+        if "10.9.0.0/24" in command:
+            raise EmptyOutput(command)
+        return {"vrf": {"default": {"address_family": {"": {"routes": {"10.0.0.0/24": entry}}}}}}
+
+    prefixes = collect_routes(parse, params, EmptyOutput)
+    assert prefixes == {"10.0.0.0/24": entry}
+    problems = {network: network_failures(network, expected, prefixes.get(network)) for network, expected in group_routes(params["routes"]).items()}
+    assert problems == {"10.0.0.0/24": [], "10.9.0.0/24": ["Route 10.9.0.0/24 not found in BGP table"]}
+
+
+def test_large_table_is_linear():
+    routes = [{"network": f"10.{idx // 256}.{idx % 256}.0/24", "next_hop": "1.1.1.1"} for idx in range(20000)]
+    table = {route["network"]: {"index": {1: {"next_hop": "1.1.1.1"}}} for route in routes}
+    start = time.perf_counter()
+    grouped = group_routes(routes)
+    assert not [problem for network, expected in grouped.items() for problem in network_failures(network, expected, table.get(network))]
+    assert time.perf_counter() - start < 2
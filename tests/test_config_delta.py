@@ -0,0 +1,57 @@
+"""
+tests against the hot apply config delta
+"""
+from ci_cli.config_delta import config_delta, parse_tree
+
+RUNNING = """!
+hostname R1
+!
+interface GigabitEthernet0/1.10
+ encapsulation dot1Q 10
+ ip address 10.0.0.1 255.255.255.0
+!
+route-map RM permit 10
+ match ip address prefix-list PL
+!
+router bgp 65000
+ neighbor 10.0.0.2 remote-as 65001
+ address-family ipv4
+  neighbor 10.0.0.2 activate
+  neighbor 10.0.0.2 route-map RM in
+ exit-address-family
+!
+banner motd ^C
+Lab router
+^C
+end
+"""
+
+
+def test_parse_tree_nesting_and_banner():
+    tree = parse_tree(RUNNING)
+    assert "neighbor 10.0.0.2 route-map RM in" in tree["router bgp 65000"]["address-family ipv4"]
+    assert "banner motd ^C\nLab router\n^C" in tree
+    assert "Lab router" not in tree
+
+
+def test_line_changes_become_commands():
+    target = RUNNING.replace("ip address 10.0.0.1 255.255.255.0", "ip address 10.0.0.5 255.255.255.0").replace(
+        "  neighbor 10.0.0.2 route-map RM in\n", "")
+    assert config_delta(RUNNING, target) == [
+        "interface GigabitEthernet0/1.10",
+        "no ip address 10.0.0.1 255.255.255.0",
+        "ip address 10.0.0.5 255.255.255.0",
+        "exit",
+        "router bgp 65000",
+        "address-family ipv4",
+        "no neighbor 10.0.0.2 route-map RM in",
+        "exit",
+        "exit",
+    ]
+    assert config_delta(RUNNING, RUNNING) == []
+
+
+def test_unsafe_changes_need_a_reboot():
+    assert config_delta(RUNNING, RUNNING.replace("Lab router", "Other router")) is None
+    target = RUNNING.replace(" encapsulation dot1Q 10\n", " encapsulation dot1Q 10\n vrf forwarding RED\n")
+    assert config_delta(RUNNING, target) is None
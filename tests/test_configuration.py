@@ -2,6 +2,7 @@
 tests against the Configuration class
 """
 import pytest
+from collections.abc import Mapping, Sequence
 from ipaddress import IPv4Network, IPv4Address
 
 
@@ -40,7 +41,7 @@ def test_interface_conversion(r1_initiated: object, expected_interface_names: li
     """
     Iterate over known interfaces and assert they have correct key of correct type.
     """
-    assert isinstance(r1_initiated.l3_interfaces, list), "l3 interfaces not returning a list"
+    assert isinstance(r1_initiated.l3_interfaces, Sequence), "l3 interfaces not returning a sequence"
     for interface in expected_interface_names:
         interface_names = [interface['if_name'] for interface in r1_initiated.l3_interfaces]
         assert interface in interface_names, f"Expect interface {interface} not found"
@@ -50,7 +51,7 @@ def test_interface_conversion(r1_initiated: object, expected_interface_names: li
         assert isinstance(present_interface["ip_address"], IPv4Address), "ip_address not an IPv4Address object"
 
     for interface in r1_initiated.l3_interfaces:
-        assert isinstance(interface, dict), "Interface within l3_interfaces not a dict"
+        assert isinstance(interface, Mapping), "Interface within l3_interfaces not a mapping"
 
 def test_bad_word(r1_initiated: object):
     """
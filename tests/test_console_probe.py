@@ -0,0 +1,59 @@
+"""
+tests against the async console probe, using local TCP servers as consoles
+"""
+import time
+import socket
+import threading
+import socketserver
+
+from ci_cli.console_probe import classify, probe_consoles, NO_LISTENER, NO_PROMPT, ROMMON, READY
+
+
+def console_server(reply: bytes):
+    """
+    Threaded TCP server that sends telnet negotiation and then reply once it reads a CR
+    """
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            self.request.sendall(b"\xff\xfb\x01\xff\xfb\x03")
+            self.request.recv(16)
+            if reply:
+                self.request.sendall(reply)
+            time.sleep(1)
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_classify():
+    assert classify(b"\xff\xfb\x01\r\nR1>") == READY
+    assert classify(b"\r\nR1(config-if)#") == READY
+    assert classify(b"Press RETURN to get started!") == READY
+    assert classify(b"\r\nrommon 1 > ") == ROMMON
+    assert classify(b"%SYS-5-RESTART: System restarted --\r\n") == NO_PROMPT
+    assert classify(b"") == NO_PROMPT
+
+
+def test_probe_consoles():
+    servers = {"R1": console_server(b"\r\nR1#"), "R2": console_server(b"\r\nrommon 2 >"), "R3": console_server(b"")}
+    consoles = {name: server.server_address for name, server in servers.items()}
+    consoles["R4"] = ("127.0.0.1", closed_port())
+    start = time.perf_counter()
+    try:
+        results = probe_consoles(consoles, timeout=0.5)
+        elapsed = time.perf_counter() - start
+    finally:
+        for server in servers.values():
+            server.shutdown()
+            server.server_close()
+    assert results == {"R1": READY, "R2": ROMMON, "R3": NO_PROMPT, "R4": NO_LISTENER}
+    # every console is probed at once, the silent one bounds the total
+    assert elapsed < 1.5
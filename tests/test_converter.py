@@ -1,5 +1,9 @@
+import json
 import pytest
 from ipaddress import IPv4Address, IPv4Network
+from ci_cli.converter import Converter
+from ci_cli.configuration import Configuration
+from ci_cli.interface_table import InterfaceTable
 
 
 @pytest.mark.parametrize("expected_keys", [["config", "if_name", "ip_address", "ip_subnet"]])
@@ -36,3 +40,90 @@ def test_l3_interfaces_match(loaded_converter: object, matching_ints):
             interface for config in loaded_converter.configs for interface in config.l3_interfaces if interface["new_vlanid"] == vlan_id]
         assert matching_l3_ints == int_values, f"vlan {vlan_id} does not have the correct values we expected"
 
+
+
+def _bridge_test_converter() -> Converter:
+    """
+    Four iosv nodes, a-b share vlan 10, c-d share vlan 11, a also has a lonely vlan 12
+    """
+    table = InterfaceTable()
+    conv = Converter(source_path="tests/test_source", output_path="tests/test_dest", user="1")
+    for hostname, vlans in (("a", [10, 12]), ("b", [10]), ("c", [11]), ("d", [11])):
+        config = Configuration(f"{hostname}.txt", "tests/test_source/r1.txt", interface_table=table)
+        config.hostname = hostname
+        config.get_device_type()
+        for vlan in vlans:
+            config.l3_rows.append(table.add(config.file_path, f"Gi{vlan}", vlan, 30, vlanid=vlan))
+        conv.configs.append(config)
+    return conv
+
+
+def test_assign_bridges_shards_segments():
+    """
+    Segments are split so each bridge only holds the nodes that need it
+    """
+    conv = _bridge_test_converter()
+    conv.assign_bridges(max_nodes=2)
+    assert [(bridge["name"], bridge["vlans"]) for bridge in conv.bridges] == [("Bridge 1", [10, 12]), ("Bridge 2", [11])]
+    a, _, c, _ = conv.configs
+    assert a.bridge_nics == {"Bridge 1": 1}
+    assert c.bridge_nics == {"Bridge 2": 1}
+    assert a.trunk_for(12) == "GigabitEthernet0/1"
+
+
+def test_assign_bridges_extra_trunks():
+    """
+    A node spread over several bridges gets extra trunk nics after the management nic
+    """
+    conv = _bridge_test_converter()
+    conv.assign_bridges(max_nodes=1)
+    a = conv.configs[0]
+    assert list(a.bridge_nics.values()) == [1, 3]
+    assert a.trunk_for(12) == "GigabitEthernet0/3"
+    assert conv._ethernet_count(a) == 4
+    a.new_configuration = []
+    assert a.add_trunk_intfs() == ["interface GigabitEthernet0/3", " no shutdown", "!"]
+
+
+def test_sharded_labvars_node_without_l3_interfaces(tmp_path):
+    """
+    A node on no bridge gets an empty trunks list rather than falling back to a Local Bridge that isn't created
+    """
+    conv = _bridge_test_converter()
+    conv.output_path = str(tmp_path)
+    lonely = Configuration("e.txt", "tests/test_source/r1.txt", interface_table=conv.interface_table)
+    lonely.hostname = "e"
+    lonely.get_device_type()
+    conv.configs.append(lonely)
+    conv.assign_bridges(max_nodes=2)
+    conv.create_lab_vars()
+    conv.flush_output()
+    labvars = json.loads((tmp_path / "labvars.json").read_text())
+    nodes = {node["hostname"]: node for node in labvars["nodes"]}
+    assert nodes["e"]["trunks"] == []
+    assert nodes["a"]["trunks"] == [{"bridge": "Bridge 1", "interface": 1}]
+    assert "Local Bridge" not in [bridge["name"] for bridge in labvars["bridges"]]
+
+
+def _convert(output_path: str, low_memory: bool) -> Converter:
+    conv = Converter(source_path="tests/test_source", output_path=output_path, user="1", low_memory=low_memory)
+    conv.load_configs()
+    conv.parse_configs()
+    conv.subnet_compare()
+    conv.manipulate_configs()
+    conv.save_interface_mapping()
+    conv.flush_output()
+    return conv
+
+
+def test_low_memory_matches_default(tmp_path):
+    """
+    Two pass mode releases each config after use and writes the same files as the default mode
+    """
+    default = _convert(str(tmp_path / "default"), low_memory=False)
+    low_memory = _convert(str(tmp_path / "low_memory"), low_memory=True)
+    for config in low_memory.configs:
+        assert config.unparsed_config is None and config.current_parsed_config is None and not config.new_configuration
+    assert [config.interface_mapping for config in low_memory.configs] == [config.interface_mapping for config in default.configs]
+    for file_ in ("LAB-r1.txt", "LAB-r2.txt", "overall_interface_map.json"):
+        assert (tmp_path / "default" / file_).read_text() == (tmp_path / "low_memory" / file_).read_text()
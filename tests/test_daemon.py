@@ -0,0 +1,157 @@
+"""
+The daemon runs click commands for thin clients and keeps labs and parsed configs warm between them
+"""
+
+import io
+import os
+import sys
+import time
+import logging
+import threading
+import click
+import pytest
+from ci_cli import daemon, configuration
+from ci_cli.daemon_client import forward, send
+from ci_cli.configuration import cache_parsed_files, parse_file
+
+BUILDS = []
+
+
+class FakeLab:
+    def __init__(self, source_path):
+        BUILDS.append(source_path)
+        self.source_path = source_path
+
+    def use_source(self, source_path):
+        self.source_path = source_path
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option("--name", default="world")
+def hello(name):
+    print(f"hello {name}")
+    logging.warning("logged for %s", name)
+
+
+@cli.command()
+def fail():
+    print("failing")
+    sys.exit(3)
+
+
+@cli.command()
+@click.option("--source_path")
+def lab(source_path):
+    built = daemon.warm_lab(("lab", ()), lambda: FakeLab(source_path), source_path=source_path)
+    print(f"{len(BUILDS)} {built.source_path}")
+
+
+@cli.command()
+def show_env():
+    print(f"EVE_URL={os.getenv('EVE_URL')}")
+
+
+@pytest.fixture
+def running_daemon(tmp_path):
+    path = str(tmp_path / "d.sock")
+    server = threading.Thread(target=daemon.serve, args=(cli, path), daemon=True)
+    server.start()
+    for _ in range(100):
+        if send({"argv": ["--help"]}, path, io.StringIO()) is not None:
+            break
+        time.sleep(0.05)
+    yield path
+    send({"stop": True}, path, io.StringIO())
+    server.join(timeout=5)
+    assert not server.is_alive()
+
+
+def _run(argv, path):
+    out = io.StringIO()
+    return forward(argv, path, out), out.getvalue()
+
+
+def test_output_and_exit_codes(running_daemon):
+    code, output = _run(["hello", "--name", "ci"], running_daemon)
+    assert code == 0 and "hello ci" in output and "logged for ci" in output
+    assert _run(["fail"], running_daemon) == (3, "failing\n")
+    code, output = _run(["nope"], running_daemon)
+    assert code == 2 and "No such command" in output
+
+
+def test_labs_stay_warm(running_daemon):
+    BUILDS.clear()
+    assert _run(["lab", "--source_path", "out1"], running_daemon) == (0, "1 out1\n")
+    assert _run(["lab", "--source_path", "out2"], running_daemon) == (0, "1 out2\n")
+
+
+def test_no_daemon(tmp_path):
+    assert forward(["hello"], str(tmp_path / "missing.sock")) is None
+    BUILDS.clear()
+    daemon.warm_lab(("lab", ()), lambda: FakeLab("a"))
+    daemon.warm_lab(("lab", ()), lambda: FakeLab("a"))
+    assert len(BUILDS) == 2 and not daemon.WARM_LABS
+
+
+def test_parsed_files_cache(tmp_path):
+    config = tmp_path / "r1.txt"
+    config.write_text("hostname r1\n")
+    cache_parsed_files(True)
+    try:
+        first = parse_file(str(config))
+        assert parse_file(str(config)) is first
+        config.write_text("hostname r1-changed\n")
+        assert parse_file(str(config)).find_lines("hostname") == ["hostname r1-changed"]
+    finally:
+        cache_parsed_files(False)
+    assert parse_file(str(config)) is not parse_file(str(config))
+
+
+def test_parsed_files_cache_limit(tmp_path, monkeypatch):
+    """
+    Least recently used files drop out past PARSED_FILE_CACHE_SIZE, low memory parses skip the cache
+    """
+    monkeypatch.setattr(configuration, "PARSED_FILE_CACHE_SIZE", 2)
+    paths = []
+    for name in ("r1", "r2", "r3"):
+        (tmp_path / f"{name}.txt").write_text(f"hostname {name}\n")
+        paths.append(str(tmp_path / f"{name}.txt"))
+    cache_parsed_files(True)
+    try:
+        first = parse_file(paths[0])
+        parse_file(paths[1])
+        assert parse_file(paths[0]) is first
+        parse_file(paths[2])
+        assert parse_file(paths[0]) is first
+        assert list(configuration._parsed_files) == [paths[2], paths[0]]
+        assert parse_file(paths[0], cache=False) is not first
+    finally:
+        cache_parsed_files(False)
+
+
+def test_lab_key_follows_environment(monkeypatch):
+    monkeypatch.setenv("EVE_URL", "https://a")
+    monkeypatch.setenv("EVE_USERNAME", "ci")
+    key = daemon.lab_key("lab", ())
+    assert key == ("lab", ("https://a",), "ci")
+    monkeypatch.setenv("EVE_URL", "https://b")
+    assert daemon.lab_key("lab", ()) != key
+    assert daemon.lab_key("lab", ("https://a",)) == key
+    monkeypatch.setenv("EVE_USERNAME", "other")
+    assert daemon.lab_key("lab", ("https://a",)) != key
+
+
+def test_client_environment_replaces_daemon_environment(running_daemon, monkeypatch):
+    """
+    A variable the client didn't set isn't taken from the daemon, and the daemon gets its own back afterwards
+    """
+    monkeypatch.setenv("EVE_URL", "https://daemon")
+    out = io.StringIO()
+    assert send({"argv": ["show-env"], "env": {"PATH": os.environ["PATH"]}}, running_daemon, out) == 0
+    assert out.getvalue() == "EVE_URL=None\n"
+    assert os.environ["EVE_URL"] == "https://daemon"
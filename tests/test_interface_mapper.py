@@ -0,0 +1,55 @@
+"""
+tests against the indexed interface mapper
+"""
+import os
+import json
+import pytest
+from ci_cli.interface_mapper import InterfaceMapper, normalize_interface, save_device_maps
+
+DEVICES = {
+    "R1": {"GigabitEthernet0/0": "GigabitEthernet0/1.2", "TenGigabitEthernet1/0/1": "GigabitEthernet0/1.3"},
+    "R2": {"Port-channel10": "GigabitEthernet0/1.4"},
+}
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Gi0/0", "GigabitEthernet0/0"),
+    ("gi 0/0", "GigabitEthernet0/0"),
+    ("te1/0/1", "TenGigabitEthernet1/0/1"),
+    ("Po10", "Port-channel10"),
+    ("PortChannel10", "Port-channel10"),
+    ("Tu5", "Tunnel5"),
+    ("Tw1/0/1", "TwoGigabitEthernet1/0/1"),
+    ("Twe1/0/1", "TwentyFiveGigE1/0/1"),
+    ("GigabitEthernet0/1.12", "GigabitEthernet0/1.12"),
+    ("10.0.0.1", "10.0.0.1"),
+])
+def test_normalize_interface(name, expected):
+    assert normalize_interface(name) == expected
+
+
+def test_forward_and_reverse_from_overall_file(tmp_path):
+    map_file = tmp_path / "overall_interface_map.json"
+    map_file.write_text(json.dumps({"devices": DEVICES}))
+    mapper = InterfaceMapper(str(map_file))
+    assert mapper.device_dir is None
+    assert mapper.lab_interface("R1", "Gi0/0") == "GigabitEthernet0/1.2"
+    assert mapper.production_interface("R1", "Gi0/1.3") == "TenGigabitEthernet1/0/1"
+    assert mapper.lab_interface("R1", "Loopback0") is None
+
+
+def test_lazy_per_device_maps(tmp_path):
+    (tmp_path / "overall_interface_map.json").write_text("not read when interface_map exists")
+    save_device_maps(str(tmp_path), DEVICES)
+    mapper = InterfaceMapper(str(tmp_path / "overall_interface_map.json"))
+    assert mapper.lab_interface("R2", "po10") == "GigabitEthernet0/1.4"
+    assert list(mapper._forward) == ["R2"]
+    assert mapper.devices() == DEVICES
+
+
+def test_save_device_maps_removes_old_devices(tmp_path):
+    save_device_maps(str(tmp_path), DEVICES)
+    save_device_maps(str(tmp_path), {"R1": DEVICES["R1"]})
+    (tmp_path / "overall_interface_map.json").write_text(json.dumps({"devices": {"R1": DEVICES["R1"]}}))
+    assert sorted(os.listdir(tmp_path / "interface_map")) == ["R1.json"]
+    assert list(InterfaceMapper(str(tmp_path / "overall_interface_map.json")).devices()) == ["R1"]
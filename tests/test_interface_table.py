@@ -0,0 +1,44 @@
+"""
+tests against the InterfaceTable storage
+"""
+from ipaddress import IPv4Address, IPv4Network
+from ci_cli.interface_table import InterfaceTable, prefix_to_mask
+
+
+def test_prefix_to_mask():
+    """
+    Integer netmasks line up with the dotted quad equivalent
+    """
+    assert prefix_to_mask(30) == int(IPv4Address("255.255.255.252"))
+    assert prefix_to_mask(0) == 0
+    assert prefix_to_mask(32) == 0xFFFFFFFF
+
+
+def test_record_view():
+    """
+    Records expose the same keys and object types as the old l3_interfaces dicts
+    """
+    table = InterfaceTable()
+    row = table.add("r1.txt", "GigabitEthernet1", int(IPv4Address("10.1.1.1")), 30)
+    record = table.record(row)
+    assert "new_vlanid" not in record
+    assert record.get("new_vlanid") is None
+    assert record["ip_address"] == IPv4Address("10.1.1.1")
+    assert record["ip_subnet"] == IPv4Network("10.1.1.0/30")
+    record["new_vlanid"] = 12
+    assert record == {"config": "r1.txt", "if_name": "GigabitEthernet1", "ip_subnet": IPv4Network("10.1.1.0/30"),
+                      "ip_address": IPv4Address("10.1.1.1"), "new_vlanid": 12}
+    assert table.contains(row, int(IPv4Address("10.1.1.2")))
+    assert not table.contains(row, int(IPv4Address("10.1.1.5")))
+
+
+def test_table_round_trip():
+    """
+    to_dict/from_dict keeps every column intact
+    """
+    table = InterfaceTable()
+    table.add("r1.txt", "Vlan20", int(IPv4Address("10.2.8.1")), 30, vlanid=31)
+    table.add("r2.txt", "Vlan21", int(IPv4Address("10.2.8.2")), 30)
+    rebuilt = InterfaceTable.from_dict(table.to_dict())
+    assert [dict(rebuilt.record(row)) for row in range(len(rebuilt))] == \
+        [dict(table.record(row)) for row in range(len(table))]
@@ -0,0 +1,89 @@
+"""
+IOSConfigTree answers the converter's queries the same way CiscoConfParse does
+"""
+
+import pytest
+from ciscoconfparse import CiscoConfParse
+from ci_cli.ios_tree import IOSConfigTree
+
+CONFIG = """hostname r1
+!
+banner motd ^C
+aaa welcome
+interface fake
+^C
+banner exec X one line X
+!
+interface GigabitEthernet0/1
+ description uplink
+ ip address 10.0.0.1 255.255.255.252
+ ip address 10.0.1.1 255.255.255.0 secondary
+!
+interface GigabitEthernet0/2
+ no ip address
+ shutdown
+!
+interface GigabitEthernet0/1.5
+ encapsulation dot1q 5
+ ip address 10.5.0.1 255.255.255.0
+!
+interface Loopback0
+ ip address 1.1.1.1 255.255.255.255
+!
+router bgp 65000
+ bgp log-neighbor-changes
+ address-family ipv4
+  network 1.1.1.1 mask 255.255.255.255
+  neighbor 10.0.0.2 activate
+ exit-address-family
+!
+aaa new-model
+aaa authentication login default local
+line vty 0 4
+ transport input ssh
+ login local
+!
+
+end
+""".splitlines()
+
+
+@pytest.fixture
+def parsers():
+    return IOSConfigTree(CONFIG), CiscoConfParse(CONFIG, factory=True)
+
+
+@pytest.mark.parametrize("spec", ["hostname", r"^int(erface) (Gi|Fa|Lo)", "ip address", "^aaa", "^interface fake"])
+def test_find_lines(parsers, spec):
+    tree, ccp = parsers
+    assert tree.find_lines(spec) == ccp.find_lines(spec)
+
+
+@pytest.mark.parametrize("parent", ["^interface GigabitEthernet0/1$", "^interface GigabitEthernet0/1.5$", "^router bgp", " address-family"])
+def test_find_children_w_parents(parsers, parent):
+    tree, ccp = parsers
+    for child in (r"ip address \S+ \S+$", ".", "neighbor"):
+        assert tree.find_children_w_parents(parent, child) == ccp.find_children_w_parents(parent, child)
+
+
+@pytest.mark.parametrize("section", ["aaa", "line vty", "banner", "router bgp", "^interface Loopback"])
+def test_find_all_children(parsers, section):
+    tree, ccp = parsers
+    assert tree.find_all_children(section) == ccp.find_all_children(section)
+
+
+def test_delete_interfaces(parsers):
+    tree, ccp = parsers
+    for parser in parsers:
+        for name in ("Gi0/2", "Lo0", "GigabitEthernet0/1.5"):
+            for obj in parser.find_interface_objects(name):
+                obj.delete()
+    assert tree.ioscfg == ccp.ioscfg
+    assert "interface Loopback0" not in tree.ioscfg
+
+
+def test_embedded_newline_lines():
+    config = ["interface GigabitEthernet0/3\n encapsulation dot1q 3", " ip address 10.3.0.1 255.255.255.0", "!"]
+    tree, ccp = IOSConfigTree(config), CiscoConfParse(config, factory=True)
+    assert tree.find_interface_objects("GigabitEthernet0/3") == []
+    assert tree.find_all_children("^interface") == ccp.find_all_children("^interface")
@@ -0,0 +1,72 @@
+"""
+tests against the multi EVE host partitioner
+"""
+from ci_cli.lab_partitioner import (
+    CROSS_HOST_NETWORK, segments_from_interface_map, partition_nodes, partition_labvars, cut_size
+)
+
+
+def _node(hostname: str) -> dict:
+    return {"hostname": hostname, "nodedefinition": "iosv", "left": 0, "top": 0,
+            "config_file": f"LAB-{hostname}.txt", "label": f"{hostname}.txt"}
+
+
+def _interface_map() -> dict:
+    """
+    Two triangles (a,b,c) and (d,e,f) joined by a single c-d link
+    """
+    links = {2: "ab", 3: "bc", 4: "ac", 5: "de", 6: "ef", 7: "df", 8: "cd"}
+    devices: dict = {}
+    for vlan, pair in links.items():
+        for hostname in pair:
+            devices.setdefault(hostname, {})[f"Gi{vlan}"] = f"GigabitEthernet0/1.{vlan}"
+    return {"devices": devices}
+
+
+def test_segments_from_interface_map():
+    segments = segments_from_interface_map(_interface_map())
+    assert segments[8] == {"c", "d"}
+    assert len(segments) == 7
+
+
+def test_partition_minimizes_cut():
+    """
+    Each triangle should stay together, only the c-d segment crosses hosts
+    """
+    nodes = [_node(name) for name in "adbecf"]
+    segments = segments_from_interface_map(_interface_map())
+    hosts = {"eve1": {"cpu": 3, "ram": 6144}, "eve2": {"cpu": 3, "ram": 6144}}
+    placement = partition_nodes(nodes, segments, hosts)
+    assert cut_size(placement, segments) == 1
+    assert partition_nodes(nodes, segments, {"eve1": {"cpu": 2, "ram": 4096}}) is None
+
+
+def test_partition_labvars_moves_crossing_trunks():
+    """
+    Only nodes whose segments reach the other host are moved onto the pnet network
+    """
+    nodes = [_node(name) for name in "abcdef"]
+    segments = segments_from_interface_map(_interface_map())
+    placement = {"eve1": nodes[:3], "eve2": nodes[3:]}
+    host_vars = partition_labvars({"nodes": nodes}, placement, segments, {"eve1": "pnet1", "eve2": "pnet2"})
+    eve1 = {node["hostname"]: node for node in host_vars["eve1"]["nodes"]}
+    # a and b share segments with c on this host, so the whole triangle rides the pnet
+    assert all(node["trunks"] == [{"bridge": CROSS_HOST_NETWORK, "interface": 1}] for node in eve1.values())
+    assert {"name": CROSS_HOST_NETWORK, "network_type": "pnet2"} in host_vars["eve2"]["bridges"]
+
+    host_vars = partition_labvars({"nodes": nodes}, {"eve1": nodes, "eve2": []}, segments, {"eve1": "pnet1", "eve2": "pnet1"})
+    assert host_vars["eve1"]["bridges"] == [{"name": "Local Bridge"}]
+    assert "trunks" not in host_vars["eve1"]["nodes"][0]
+
+
+def test_partition_labvars_node_without_trunks():
+    """
+    A sharded node with an empty trunks list stays off every bridge, no Local Bridge is added for it
+    """
+    nodes = [dict(_node(name), trunks=[{"bridge": "Bridge 1", "interface": 1}]) for name in "abcdef"]
+    nodes.append(dict(_node("g"), trunks=[]))
+    labvars = {"nodes": nodes, "bridges": [{"name": "Bridge 1", "vlans": [2, 3, 4, 5, 6, 7, 8]}]}
+    segments = segments_from_interface_map(_interface_map())
+    host_vars = partition_labvars(labvars, {"eve1": nodes, "eve2": []}, segments, {"eve1": "pnet1", "eve2": "pnet1"})
+    assert host_vars["eve1"]["bridges"] == [{"name": "Bridge 1", "vlans": [2, 3, 4, 5, 6, 7, 8]}]
+    assert host_vars["eve1"]["nodes"][-1]["trunks"] == []
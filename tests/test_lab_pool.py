@@ -0,0 +1,89 @@
+"""
+tests against the warm lab pool lease bookkeeping
+"""
+import copy
+from ci_cli.lab_pool import LabPool, topology_key, IDLE, LEASED, FAILED
+
+
+LABVARS = {"nodes": [
+    {"hostname": "R1", "nodedefinition": "iosv", "left": 0, "top": 0, "config_file": "LAB-R1.txt", "label": "R1.txt"},
+    {"hostname": "R2", "nodedefinition": "csrv", "left": 100, "top": 0, "config_file": "LAB-R2.txt", "label": "R2.txt"},
+]}
+
+
+def test_topology_key_ignores_layout_and_configs():
+    moved = copy.deepcopy(LABVARS)
+    moved["nodes"].reverse()
+    moved["nodes"][0]["left"] = 500
+    moved["nodes"][0]["config_file"] = "other.txt"
+    assert topology_key(moved) == topology_key(LABVARS)
+    moved["nodes"][0]["nodedefinition"] = "iosv"
+    assert topology_key(moved) != topology_key(LABVARS)
+
+
+def test_lease_reserve_release(tmp_path):
+    pool = LabPool(db_path=str(tmp_path / "pool.db"))
+    topology = topology_key(LABVARS)
+    assert pool.acquire(topology, "pipeline-1") is None
+    first = pool.reserve(topology, "pipeline-1", size=2)
+    second = pool.reserve(topology, "pipeline-2", size=2)
+    assert first != second
+    assert pool.reserve(topology, "pipeline-3", size=2) is None
+
+    pool.set_state(first, LEASED, holder="pipeline-1")
+    pool.set_state(second, IDLE)
+    # a second connection behaves like a different pipeline on the same runner
+    other = LabPool(db_path=str(tmp_path / "pool.db"))
+    assert other.acquire(topology, "pipeline-3") == second
+    assert other.acquire(topology, "pipeline-4") is None
+    assert pool.release(first)
+    assert other.acquire(topology, "pipeline-4") == first
+    assert not pool.release("not-a-pool-lab")
+
+
+def test_expired_leases(tmp_path):
+    pool = LabPool(db_path=str(tmp_path / "pool.db"), lease_timeout=-1)
+    topology = topology_key(LABVARS)
+    leased = pool.reserve(topology, "pipeline-1", size=2)
+    pool.set_state(leased, LEASED, holder="pipeline-1")
+    building = pool.reserve(topology, "pipeline-2", size=2)
+    # the abandoned lease comes back, the half built lab is left failed for reap_labs
+    assert pool.acquire(topology, "pipeline-3") == leased
+    assert {lab["lab_name"]: lab["state"] for lab in pool.labs(topology)} == {leased: LEASED, building: FAILED}
+
+
+def test_reserve_on_two_eve_hosts(tmp_path):
+    pool = LabPool(db_path=str(tmp_path / "pool.db"))
+    topology = topology_key(LABVARS)
+    first = pool.reserve(topology, "pipeline-1", size=1, eve_url="https://a")
+    second = pool.reserve(topology, "pipeline-2", size=1, eve_url="https://b")
+    assert first != second
+    assert pool.reserve(topology, "pipeline-3", size=1, eve_url="https://b") is None
+
+
+def _fail_build(pool, lab_name, teardown):
+    try:
+        with pool.building(lab_name, teardown=teardown):
+            raise SystemExit(1)
+    except SystemExit:
+        pass
+
+
+def test_failed_build_torn_down_frees_the_slot(tmp_path):
+    pool = LabPool(db_path=str(tmp_path / "pool.db"))
+    topology = topology_key(LABVARS)
+    lab_name = pool.reserve(topology, "pipeline-1", size=1)
+    _fail_build(pool, lab_name, teardown=lambda: True)
+    assert pool.labs(topology) == []
+    assert pool.reserve(topology, "pipeline-2", size=1) == lab_name
+
+
+def test_failed_build_left_in_eve_keeps_its_name(tmp_path):
+    pool = LabPool(db_path=str(tmp_path / "pool.db"))
+    topology = topology_key(LABVARS)
+    lab_name = pool.reserve(topology, "pipeline-1", size=1)
+    _fail_build(pool, lab_name, teardown=lambda: False)
+    assert [lab["state"] for lab in pool.labs(topology)] == [FAILED]
+    # the slot is free again, under a new name
+    other = pool.reserve(topology, "pipeline-2", size=1)
+    assert other not in (None, lab_name)
@@ -0,0 +1,38 @@
+"""
+tests against the stale lab reaper
+"""
+from ci_cli.lab_reaper import find_stale_labs, reap_labs, lab_modified
+
+NOW = 1_700_000_000.0
+LABS = [
+    {"file": "feature-123.unl", "path": "/feature-123.unl", "umtime": NOW - 48 * 3600},
+    {"file": "feature-456.unl", "path": "/feature-456.unl", "umtime": NOW - 3600},
+    {"file": "pool-abc-0.unl", "path": "/pool-abc-0.unl", "umtime": NOW - 96 * 3600},
+    {"file": "golden.unl", "path": "/golden.unl"},
+]
+
+
+class FakeLab:
+    def __init__(self, lab_name: str):
+        self.lab_name = lab_name
+        self.torn_down = False
+
+    def lab_resources(self) -> dict:
+        return {"nodes": 2, "cpu": 2, "ram": 4096}
+
+    def teardown_lab_from_cicd(self) -> None:
+        self.torn_down = True
+
+
+def test_find_stale_labs():
+    assert find_stale_labs(LABS, 24, keep={"pool-abc-0"}, now=NOW) == ["feature-123"]
+    assert find_stale_labs(LABS, 0, name_pattern="^feature-", now=NOW) == ["feature-123", "feature-456"]
+    # no modification time, never reaped by age alone
+    assert "golden" not in find_stale_labs(LABS, 1, now=NOW)
+    assert lab_modified({"mtime": "2024-01-02 03:04:05"}) is not None
+
+
+def test_reap_labs_totals():
+    labs = [FakeLab("a"), FakeLab("b")]
+    assert reap_labs(labs, workers=2) == {"labs": 2, "nodes": 4, "cpu": 4, "ram": 8192}
+    assert all(lab.torn_down for lab in labs)
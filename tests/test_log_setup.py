@@ -0,0 +1,44 @@
+"""
+tests against the queued, rotating CLI logging
+"""
+import os
+import gzip
+import atexit
+import logging
+
+from ci_cli.log_setup import rotating_file_handler, setup_logging
+
+
+def test_rotated_logs_are_gzipped(tmp_path):
+    log_path = tmp_path / "log.log"
+    handler = rotating_file_handler(str(log_path), max_bytes=200, backup_count=2)
+    logger = logging.getLogger("rotation_test")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        for idx in range(50):
+            logger.warning("line %s of the rotation test", idx)
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    assert sorted(os.listdir(tmp_path)) == ["log.log", "log.log.1.gz", "log.log.2.gz"]
+    with gzip.open(tmp_path / "log.log.1.gz", "rt") as rotated:
+        assert "of the rotation test" in rotated.read()
+
+
+def test_setup_logging_writes_through_the_queue(tmp_path):
+    root = logging.getLogger('')
+    handlers, level = list(root.handlers), root.level
+    listener = setup_logging("INFO", log_dir=str(tmp_path))
+    try:
+        logging.info("queued %s", "message")
+        logging.debug("not formatted %s", "at info")
+    finally:
+        atexit.unregister(listener.stop)
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        root.handlers, root.level = handlers, level
+    (log_file,) = os.listdir(tmp_path)
+    content = (tmp_path / log_file).read_text()
+    assert "queued message" in content and "not formatted" not in content
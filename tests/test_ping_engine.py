@@ -0,0 +1,64 @@
+"""
+tests against the ping engine command building, output parsing and concurrency
+"""
+import time
+
+from ci_cli.ping_engine import ping_command, parse_ping, run_pings, ping_failures
+
+
+PARTIAL = """Type escape sequence to abort.
+Sending 5, 100-byte ICMP Echos to 10.0.0.2, timeout is 2 seconds:
+!.!!!
+Success rate is 80 percent (4/5), round-trip min/avg/max = 1/3/7 ms"""
+
+
+class FakeDevice:
+    def __init__(self, name, output, delay=0.0):
+        self.name = name
+        self.output = output
+        self.delay = delay
+        self.commands = []
+
+    def is_connected(self):
+        return True
+
+    def execute(self, command, timeout=None):
+        time.sleep(self.delay)
+        self.commands.append(command)
+        if isinstance(self.output, Exception):
+            raise self.output
+        return self.output
+
+
+def test_ping_command():
+    assert ping_command({"addr": "10.0.0.2"}) == "ping 10.0.0.2"
+    command = ping_command({"addr": "10.0.0.2", "vrf": "RED", "source": "Gi0/1", "repeat": 10, "df_bit": True})
+    assert command == "ping vrf RED 10.0.0.2 source Gi0/1 repeat 10 df-bit"
+
+
+def test_parse_ping():
+    result = parse_ping(PARTIAL)
+    assert result["sent"] == 5 and result["received"] == 4 and result["loss_percent"] == 20
+    assert (result["rtt_min"], result["rtt_avg"], result["rtt_max"]) == (1, 3, 7)
+    failed = parse_ping("Success rate is 0 percent (0/5)")
+    assert failed["loss_percent"] == 100 and failed["rtt_avg"] is None
+    assert parse_ping("% Unrecognized host or address")["error"] == "% Unrecognized host or address"
+
+
+def test_ping_failures():
+    result = parse_ping(PARTIAL)
+    assert ping_failures(result) == []
+    assert ping_failures(result, max_loss=0)
+    assert ping_failures(result, max_loss=20, max_rtt=3) == []
+    assert ping_failures(result, max_rtt=2)
+    assert ping_failures(parse_ping("Success rate is 0 percent (0/5)"))
+
+
+def test_run_pings_concurrent():
+    devices = [FakeDevice(f"R{idx}", PARTIAL, delay=0.2) for idx in range(5)]
+    devices.append(FakeDevice("R9", RuntimeError("console timeout")))
+    start = time.perf_counter()
+    results = run_pings({device: [{"addr": "10.0.0.2"}] for device in devices})
+    assert time.perf_counter() - start < 0.8
+    assert results["R0"][0]["received"] == 4 and results["R0"][0]["device"] == "R0"
+    assert results["R9"][0]["error"] == "console timeout"
@@ -0,0 +1,47 @@
+"""
+tests against the lab resource planner
+"""
+from ci_cli import resource_planner
+from ci_cli.resource_planner import ResourcePlanner, node_resources, host_free_capacity
+
+
+def _nodes() -> list[dict]:
+    return [
+        {"hostname": "r1", "nodedefinition": "iosv"},
+        {"hostname": "r2", "nodedefinition": "iosv"},
+        {"hostname": "CSRvRouterHostname", "nodedefinition": "csrv"},
+    ]
+
+
+def test_node_resources_profiles(monkeypatch):
+    """
+    Device type defaults apply unless a hostname pattern matches
+    """
+    monkeypatch.setattr(resource_planner, "NODE_RESOURCE_PROFILES", {"^CORE-": {"ram": 3072}})
+    assert node_resources("r1", "iosv") == {"cpu": 1, "ram": 2048}
+    assert node_resources("CORE-1", "iosv") == {"cpu": 1, "ram": 3072}
+    assert node_resources("CSR1", "csrv") == {"cpu": 1, "ram": 4096}
+
+
+def test_fits_and_free_capacity():
+    """
+    Memory percent used from the EVE status api and vCPUs allocated to running nodes are taken off the configured capacity
+    """
+    planner = ResourcePlanner(_nodes())
+    assert planner.total() == {"cpu": 3, "ram": 8192}
+    assert host_free_capacity({"cpu": 10, "ram": 16384}, {"cpu": 50, "mem": 75}, allocated_cpu=5) == {"cpu": 5, "ram": 4096}
+    # idle cpu doesn't make allocated vCPUs free
+    assert host_free_capacity({"cpu": 10, "ram": 16384}, {"cpu": 1, "mem": 0}, allocated_cpu=12)["cpu"] == 0
+    assert not planner.fits({"cpu": 5, "ram": 4096})
+    assert planner.fits({"cpu": 5, "ram": 8192})
+
+
+def test_place_across_hosts():
+    """
+    Nodes are spread when one host is not enough, and None when nothing fits
+    """
+    planner = ResourcePlanner(_nodes())
+    placement = planner.place({"eve1": {"cpu": 2, "ram": 4096}, "eve2": {"cpu": 2, "ram": 4096}})
+    assert sorted(len(nodes) for nodes in placement.values()) == [1, 2]
+    assert [node["hostname"] for node in placement["eve2"]] == ["r1", "r2"]
+    assert planner.place({"eve1": {"cpu": 8, "ram": 4000}}) is None
@@ -0,0 +1,116 @@
+"""
+A create_configs run split into shards and merged writes the same files as a single run
+"""
+
+import os
+import pytest
+from ci_cli.converter import Converter
+from ci_cli.sharding import parse_shard
+
+DEVICES = 7
+
+
+def _estate(source_path) -> None:
+    """
+    A ring, every device shares a /30 with the next one, plus a loopback-ish lonely /24 and a shutdown port
+    """
+    os.makedirs(source_path)
+    for idx in range(DEVICES):
+        hostname = "CSRvRouterHostname" if idx == 3 else f"r{idx}"
+        right, left = idx, (idx - 1) % DEVICES
+        lines = [
+            f"hostname {hostname}", "!",
+            "interface GigabitEthernet0/0", f" ip address 10.0.{right}.1 255.255.255.252", "!",
+            "interface GigabitEthernet0/1", f" ip address 10.0.{left}.2 255.255.255.252", "!",
+            "interface GigabitEthernet0/2", f" ip address 172.16.{idx}.1 255.255.255.0", "!",
+            "interface GigabitEthernet0/3", " no ip address", " shutdown", "!",
+            "end",
+        ]
+        with open(os.path.join(source_path, f"{hostname}.txt"), "w", encoding="UTF-8") as config_file:
+            config_file.write("\n".join(lines) + "\n")
+
+
+def _single(source_path, output_path, max_nodes) -> None:
+    conv = Converter(source_path=source_path, output_path=output_path, user="1")
+    conv.load_configs()
+    conv.parse_configs()
+    conv.subnet_compare()
+    if max_nodes:
+        conv.assign_bridges(max_nodes=max_nodes)
+    conv.manipulate_configs()
+    conv.save_interface_mapping()
+    conv.create_lab_vars()
+    conv.save_securecrt_sessions()
+    conv.flush_output()
+
+
+def _sharded(source_path, output_path, count, max_nodes) -> None:
+    for index in range(count):
+        conv = Converter(source_path=source_path, output_path=output_path, user="1")
+        conv.load_configs(shard=(index, count))
+        conv.parse_configs()
+        conv.save_shard_summary((index, count))
+        conv.flush_output()
+
+    merged = Converter(source_path="", output_path=output_path, user="1")
+    merged.merge_shards()
+    merged.subnet_compare()
+    if max_nodes:
+        merged.assign_bridges(max_nodes=max_nodes)
+    merged.assign_management_ips()
+    for config in merged.configs:
+        config.create_interface_mapping()
+    merged.save_interface_mapping()
+    merged.create_lab_vars()
+    merged.save_shard_plan()
+    merged.flush_output()
+
+    for index in range(count):
+        conv = Converter(source_path=source_path, output_path=output_path, user="1")
+        conv.load_configs(shard=(index, count))
+        conv.parse_configs()
+        conv.apply_shard_plan()
+        conv.manipulate_configs()
+        conv.save_securecrt_sessions()
+        conv.flush_output()
+
+
+def _files(root) -> dict:
+    found = {}
+    for dirpath, _, filenames in os.walk(root):
+        for file_ in filenames:
+            path = os.path.join(dirpath, file_)
+            with open(path, encoding="UTF-8") as opened:
+                found[os.path.relpath(path, root)] = opened.read()
+    return found
+
+
+@pytest.mark.parametrize("max_nodes", [None, 3])
+def test_sharded_matches_single(tmp_path, max_nodes):
+    source = str(tmp_path / "source")
+    _estate(source)
+    _single(source, str(tmp_path / "single"), max_nodes)
+    _sharded(source, str(tmp_path / "sharded"), 3, max_nodes)
+    single, sharded = _files(tmp_path / "single"), _files(tmp_path / "sharded")
+    shard_files = {name for name in sharded if name.startswith("shards")}
+    assert shard_files == {"shards/summary_0_of_3.json", "shards/summary_1_of_3.json", "shards/summary_2_of_3.json", "shards/plan.json"}
+    assert {name: text for name, text in sharded.items() if name not in shard_files} == single
+    assert len([name for name in single if name.startswith("LAB-")]) == DEVICES
+
+
+@pytest.mark.parametrize("spec", ["3/3", "1", "a/2", "-1/2"])
+def test_parse_shard_rejects(spec):
+    with pytest.raises(ValueError):
+        parse_shard(spec)
+
+
+def test_merge_missing_shard_exits(tmp_path):
+    source = str(tmp_path / "source")
+    _estate(source)
+    conv = Converter(source_path=source, output_path=str(tmp_path / "out"), user="1")
+    conv.load_configs(shard=(0, 2))
+    conv.parse_configs()
+    conv.save_shard_summary((0, 2))
+    conv.flush_output()
+    with pytest.raises(SystemExit):
+        Converter(source_path="", output_path=str(tmp_path / "out"), user="1").merge_shards()
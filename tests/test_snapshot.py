@@ -0,0 +1,95 @@
+"""
+tests against collect-once snapshots
+"""
+import pytest
+from ci_cli.snapshot import collection_plan, collect_snapshot, parse_command, execute_command, load_output, needs_connection
+
+
+class FakeDevice:
+    def __init__(self, name: str):
+        self.name = name
+        self.connected = False
+        self.executed: list[str] = []
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    def connect(self, log_stdout=False) -> None:
+        self.connected = True
+
+    def disconnect(self) -> None:
+        self.connected = False
+
+    def execute(self, command: str) -> str:
+        self.executed.append(command)
+        return f"{self.name} output of {command}"
+
+    def parse(self, command: str, output: str = None) -> dict:
+        return {"command": command, "output": output if output is not None else self.execute(command)}
+
+
+TESTS = {
+    "bgp_peer_test": [{"devices": ["R1", "R2"], "test_params": {"vrf": "RED", "address_family": "vpnv4_unicast"}}],
+    "interface_status_test": [{"devices": ["R1"], "test_params": {}}, {"devices": ["R1"], "test_params": {}}],
+}
+
+
+def test_collection_plan_unions_commands():
+    plan = collection_plan(TESTS)
+    assert plan == {
+        "R1": {"show bgp vpnv4 unicast vrf RED summary", "show ip interface brief"},
+        "R2": {"show bgp vpnv4 unicast vrf RED summary"},
+    }
+
+
+def test_collect_then_evaluate_offline(tmp_path):
+    devices = {"R1": FakeDevice("R1"), "R2": FakeDevice("R2")}
+    index = collect_snapshot(devices, collection_plan(TESTS), str(tmp_path))
+    assert index["R1"] == ["show bgp vpnv4 unicast vrf RED summary", "show ip interface brief"]
+    assert not devices["R1"].is_connected()
+    assert load_output(str(tmp_path), "R2", "show bgp vpnv4 unicast vrf RED summary") == "R2 output of show bgp vpnv4 unicast vrf RED summary"
+
+    # evaluation reads the snapshot, the device is not touched again
+    devices["R1"].executed.clear()
+    parsed = parse_command(devices["R1"], "show ip interface brief", str(tmp_path))
+    assert parsed["output"] == "R1 output of show ip interface brief"
+    assert devices["R1"].executed == []
+    # commands missing from the snapshot go to the live device
+    assert execute_command(devices["R1"], "show version", str(tmp_path)) == "R1 output of show version"
+    assert devices["R1"].executed == ["show version"]
+
+
+def test_record_then_replay(tmp_path):
+    live = FakeDevice("R1")
+    parse_command(live, "show ip bgp", record_dir=str(tmp_path))
+    assert load_output(str(tmp_path), "R1", "show ip bgp") == "R1 output of show ip bgp"
+
+    offline = FakeDevice("R1")
+    replay = {"snapshot_dir": str(tmp_path), "replay": True}
+    assert not needs_connection(replay)
+    assert parse_command(offline, "show ip bgp", **replay)["output"] == "R1 output of show ip bgp"
+    with pytest.raises(LookupError):
+        execute_command(offline, "show ip route", **replay)
+    assert offline.executed == [] and not offline.is_connected()
+
+
+class FailingDevice(FakeDevice):
+    def execute(self, command: str) -> str:
+        if command == "show ip interface brief":
+            raise ConnectionError("console dropped")
+        return super().execute(command)
+
+
+def test_failed_collection_runs_live(tmp_path):
+    """
+    A device whose collection failed, or a file left from an earlier run, is not served from the snapshot
+    """
+    (tmp_path / "R2").mkdir()
+    (tmp_path / "R2" / "show_ip_interface_brief.txt").write_text("stale")
+    devices = {"R1": FailingDevice("R1"), "R2": FakeDevice("R2")}
+    index = collect_snapshot(devices, collection_plan(TESTS), str(tmp_path))
+    assert "R1" not in index
+    assert not (tmp_path / "R1" / "show_ip_interface_brief.txt").exists()
+    assert load_output(str(tmp_path), "R1", "show bgp vpnv4 unicast vrf RED summary") is None
+    assert load_output(str(tmp_path), "R2", "show ip interface brief") is None
+    assert execute_command(devices["R2"], "show ip interface brief", str(tmp_path)) == "R2 output of show ip interface brief"
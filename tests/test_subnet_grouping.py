@@ -0,0 +1,58 @@
+"""
+tests that the numpy subnet compare matches the python subnet compare
+"""
+import random
+import pytest
+from ci_cli.converter import Converter
+from ci_cli.configuration import Configuration
+from ci_cli.interface_table import InterfaceTable
+from ci_cli.subnet_grouping import assign_vlans_vectorized
+
+pytest.importorskip("numpy")
+
+
+def _loaded_configs() -> list[Configuration]:
+    """
+    Fresh r1/r2 Configurations sharing one interface table
+    """
+    table = InterfaceTable()
+    configs = [Configuration(file_, f"tests/test_source/{file_}", interface_table=table) for file_ in ("r1.txt", "r2.txt")]
+    for config in configs:
+        config.get_current_parsed_config()
+        config.get_hostname()
+        config.get_device_type()
+        config.get_l3_interfaces()
+    return configs
+
+
+def test_engines_match_on_test_source():
+    """
+    Both engines hand out identical vlanids and end on the same vlan seed
+    """
+    results = {}
+    for engine in ("python", "numpy"):
+        conv = Converter(source_path="tests/test_source", output_path="tests/test_dest", user="1", configs=_loaded_configs())
+        conv.subnet_compare(engine=engine)
+        results[engine] = ([dict(intf) for config in conv.configs for intf in config.l3_interfaces], conv.vlan_seed)
+    assert results["python"] == results["numpy"]
+
+
+def test_engines_match_on_mixed_masks():
+    """
+    Overlapping subnets with different masks and duplicate addresses still match the python loop
+    """
+    rng = random.Random(7)
+    table = InterfaceTable()
+    rows = [table.add("tests/test_source/r1.txt", f"Gi{idx}", 0x0A000000 + rng.randrange(64), rng.choice([24, 26, 28, 30, 32]))
+            for idx in range(300)]
+    conv = Converter(source_path="tests/test_source", output_path="tests/test_dest", user="1")
+    config = Configuration("r1.txt", "tests/test_source/r1.txt", interface_table=table)
+    config.l3_rows.extend(rows)
+    conv.configs.append(config)
+    conv.subnet_compare(engine="python")
+    expected = [intf["new_vlanid"] for intf in config.l3_interfaces]
+
+    vlanids, next_seed = assign_vlans_vectorized(
+        [table.addresses[row] for row in rows], [table.prefixlens[row] for row in rows], vlan_seed=2)
+    assert vlanids == expected
+    assert next_seed == conv.vlan_seed
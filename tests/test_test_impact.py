@@ -0,0 +1,31 @@
+"""
+tests against test impact selection
+"""
+import json
+from ci_cli.test_impact import load_changed_nodes, impacted_devices, select_tests
+
+INTERFACE_MAP = {"devices": {
+    "R1": {"Gi0/0": "GigabitEthernet0/1.2"},
+    "R2": {"Gi0/0": "GigabitEthernet0/1.2", "Gi0/1": "GigabitEthernet0/1.3"},
+    "R3": {"Gi0/1": "GigabitEthernet0/1.3", "Gi0/2": "GigabitEthernet0/1.4"},
+    "R4": {"Gi0/2": "GigabitEthernet0/1.4"},
+}}
+
+
+def test_load_changed_nodes(tmp_path):
+    changed_file = tmp_path / "health_targets.json"
+    changed_file.write_text(json.dumps([{"device_name": "R1", "node_id": "1"}]))
+    assert load_changed_nodes(str(changed_file)) == {"R1"}
+    changed_file.write_text(json.dumps(["R1", "R3"]))
+    assert load_changed_nodes(str(changed_file)) == {"R1", "R3"}
+
+
+def test_select_neighbors_only():
+    impacted = impacted_devices({"R1"}, INTERFACE_MAP)
+    assert impacted == {"R1", "R2"}
+    tests = {
+        "ping_test": [{"devices": ["R2"]}, {"devices": ["R4"]}],
+        "bgp_peer_test": [{"devices": ["R3", "R4"]}, {"test_description": "no devices"}],
+    }
+    selected = select_tests(tests, impacted)
+    assert selected == {"ping_test": [{"devices": ["R2"]}], "bgp_peer_test": [{"test_description": "no devices"}]}
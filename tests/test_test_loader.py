@@ -0,0 +1,63 @@
+"""
+tests against the validated, cached test suite loader
+"""
+import json
+import datetime
+from ci_cli.test_loader import load_tests, validate_test
+
+VALID = """type: interface_status_test
+test_description: Tunnels up
+devices:
+  - R1
+test_params:
+  interfaces:
+    - Tunnel0
+"""
+
+
+def test_validate_test():
+    assert validate_test({"type": "ping_test", "test_description": "x", "devices": ["R1"], "test_params": {"pings": []}}) == []
+    assert validate_test({"type": "nope"})[-1].startswith("unknown test type 'nope'")
+    errors = validate_test({"type": "bgp_route_test", "test_description": "x", "devices": ["R1"],
+                            "test_params": {"vrf": "RED", "routes": [{"next_hop": "1.1.1.1"}]}})
+    assert errors == ["test_params.routes[0] is missing ['network']", "test_params.rd is required when a vrf is provided"]
+
+
+def test_load_tests_cache_and_errors(tmp_path):
+    suite = tmp_path / "suite"
+    suite.mkdir()
+    (suite / "good.yml").write_text(VALID)
+    (suite / "broken.yml").write_text("type: [unclosed")
+    cache_path = tmp_path / "cache.json"
+
+    tests, errors = load_tests(str(suite), cache_path=str(cache_path))
+    assert [test["test_description"] for test in tests["interface_status_test"]] == ["Tunnels up"]
+    assert list(errors) == [str(suite / "broken.yml")]
+    cache = json.loads(cache_path.read_text())
+    assert list(cache) == [str(suite / "good.yml")]
+
+    # a cached entry is served as long as the file hash matches
+    cache[str(suite / "good.yml")]["test"]["test_description"] = "from cache"
+    cache_path.write_text(json.dumps(cache))
+    tests, _ = load_tests(str(suite), cache_path=str(cache_path))
+    assert tests["interface_status_test"][0]["test_description"] == "from cache"
+    (suite / "good.yml").write_text(VALID.replace("Tunnels up", "edited"))
+    tests, _ = load_tests(str(suite), cache_path=str(cache_path))
+    assert tests["interface_status_test"][0]["test_description"] == "edited"
+
+
+def test_non_json_values_are_not_cached(tmp_path):
+    """
+    A date would come back from the cache as a string, so that file is parsed again instead
+    """
+    suite = tmp_path / "suite"
+    suite.mkdir()
+    (suite / "good.yml").write_text(VALID)
+    (suite / "dated.yml").write_text(VALID.replace("Tunnels up", "dated") + "  since: 2024-01-01\n")
+    cache_path = tmp_path / "cache.json"
+
+    load_tests(str(suite), cache_path=str(cache_path))
+    assert list(json.loads(cache_path.read_text())) == [str(suite / "good.yml")]
+    tests, _ = load_tests(str(suite), cache_path=str(cache_path))
+    dated = [test for test in tests["interface_status_test"] if test["test_description"] == "dated"][0]
+    assert isinstance(dated["test_params"]["since"], datetime.date)
@@ -0,0 +1,52 @@
+"""
+tests against the EVE topology cache invalidation
+"""
+from ci_cli.topology_cache import TopologyCache
+
+
+class FakeEVE:
+    def __init__(self):
+        self.nodes = {"1": {"name": "R1", "status": 0}, "2": {"name": "R2", "status": 0}}
+        self.calls = []
+
+    def fetch_all(self):
+        self.calls.append("all")
+        return {node_id: dict(node) for node_id, node in self.nodes.items()}
+
+    def fetch_one(self, node_id):
+        self.calls.append(node_id)
+        node = self.nodes.get(node_id)
+        return dict(node) if node else None
+
+
+def test_nodes_fetched_once():
+    eve, cache = FakeEVE(), TopologyCache()
+    for _ in range(3):
+        assert cache.node_map(eve.fetch_all, eve.fetch_one)["2"]["name"] == "R2"
+    assert eve.calls == ["all"]
+
+
+def test_invalidate_refetches_only_that_node():
+    eve, cache = FakeEVE(), TopologyCache()
+    cache.node_map(eve.fetch_all, eve.fetch_one)
+    eve.nodes["1"]["status"] = 2
+    cache.invalidate_node(1)
+    nodes = cache.node_map(eve.fetch_all, eve.fetch_one)
+    assert nodes["1"]["status"] == 2
+    assert eve.calls == ["all", "1"]
+    # a node that can't be refreshed forces a full reload
+    del eve.nodes["2"]
+    cache.invalidate_node("2")
+    assert list(cache.node_map(eve.fetch_all, eve.fetch_one)) == ["1"]
+    assert eve.calls == ["all", "1", "2", "all"]
+
+
+def test_configs_and_clear():
+    cache = TopologyCache()
+    cache.set_config("1", "hostname R1")
+    assert cache.configs is None
+    cache.configs = {"1": {"name": "R1", "configdata": "old"}}
+    cache.set_config(1, "hostname R1")
+    assert cache.configs["1"]["configdata"] == "hostname R1"
+    cache.clear(lab_exists=False)
+    assert cache.configs is None and cache.lab_exists is False
@@ -1,5 +1,6 @@
 import logging
 from pyats import aetest
+from ci_cli.snapshot import parse_command, needs_connection
 
 
 class BGPPeerTest(aetest.Testcase):
@@ -7,8 +8,8 @@ class BGPPeerTest(aetest.Testcase):
     @aetest.setup
     def setup_test(self):
         for device in self.parameters.get('devices'):
-            if not device.is_connected():
-                logging.info(f"Connecting to device {device.name}")
+            if not device.is_connected() and needs_connection(self.parameters.get("device_output")):
+                logging.info("Connecting to device %s", device.name)
                 device.connect(log_stdout=False)
 
     @aetest.test
@@ -21,20 +22,20 @@ class BGPPeerTest(aetest.Testcase):
                     "test_params", {}).get("test_params", {}).get("neighbors")
                 address_family = self.parameters.get("test_params", {}).get(
                     "test_params", {}).get("address_family")
-                logging.info(f"Testing with specified VRF - {specified_vrf}")
+                logging.info("Testing with specified VRF - %s", specified_vrf)
                 logging.info(
-                    f"Testing with address family  - {address_family}")
+                    "Testing with address family  - %s", address_family)
                 if not specified_vrf:
                     specified_vrf = "default"
                 if not address_family:
                     address_family = "ipv4_unicast"
                 if specified_vrf == "default" and address_family == "ipv4_unicast":
-                    out = device.parse("show bgp summary")
+                    out = parse_command(device, "show bgp summary", **self.parameters.get("device_output", {}))
                 elif specified_vrf != "default" and address_family == "vpnv4_unicast":
-                    out = device.parse(
-                        f"show bgp vpnv4 unicast vrf {specified_vrf} summary")
+                    out = parse_command(
+                        device, f"show bgp vpnv4 unicast vrf {specified_vrf} summary", **self.parameters.get("device_output", {}))
                 elif specified_vrf == "default" and address_family == "vpnv4_unicast":
-                    out = device.parse(f"show bgp vpnv4 unicast all summary")
+                    out = parse_command(device, f"show bgp vpnv4 unicast all summary", **self.parameters.get("device_output", {}))
                 for neighbor_ip, neighbor_values in out.get("vrf", {}).get(specified_vrf).get("neighbor").items():
                     if neighbor_ip in expected_neighbors:
                         with steps.start(f"Verifying {neighbor_ip} is up", continue_=True):
@@ -45,5 +46,5 @@ class BGPPeerTest(aetest.Testcase):
                 with substep.start(f"Validate all neighbors were found", continue_=True):
                     if expected_neighbors:
                         logging.error(
-                            f"These neighbors were not found to be configured - {expected_neighbors}")
+                            "These neighbors were not found to be configured - %s", expected_neighbors)
                     assert not expected_neighbors
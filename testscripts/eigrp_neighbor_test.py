@@ -1,5 +1,6 @@
 import logging
 from pyats import aetest
+from ci_cli.snapshot import parse_command, needs_connection
 
 
 class EigrpNeighborTest(aetest.Testcase):
@@ -10,8 +11,8 @@ class EigrpNeighborTest(aetest.Testcase):
         Connect if not already connected
         """
         for device in self.parameters.get('devices'):
-            if not device.is_connected():
-                logging.info(f"Connecting to device {device.name}")
+            if not device.is_connected() and needs_connection(self.parameters.get("device_output")):
+                logging.info("Connecting to device %s", device.name)
                 device.connect(log_stdout=False)
 
     @aetest.test
@@ -29,17 +30,17 @@ class EigrpNeighborTest(aetest.Testcase):
                 if not vrf:
                     vrf = "default"
                 if vrf != "default":
-                    logging.info(f"Not using default VRF, using vrf {vrf} instead")
-                    out = device.parse(f"show ip eigrp vrf {vrf} neighbors")
+                    logging.info("Not using default VRF, using vrf %s instead", vrf)
+                    out = parse_command(device, f"show ip eigrp vrf {vrf} neighbors", **self.parameters.get("device_output", {}))
                 else:
-                    logging.info(f"Using default vrf")
-                    out = device.parse(f"show ip eigrp neighbors")
+                    logging.info("Using default vrf")
+                    out = parse_command(device, f"show ip eigrp neighbors", **self.parameters.get("device_output", {}))
                 eigrp_interfaces = out.get("eigrp_instance", {}).get(str(as_number)).get("vrf").get(vrf).get("address_family").get("ipv4").get("eigrp_interface")
                 for neighbor in test_params.get("neighbors"):
                     with substep.start(f"Testing neighbor {neighbor.get('address', 'Missing IP')} exists and up", continue_=True):
                         #Does the neighbor's interface exist?
                         neighbor_int = self.parameters["mapper"].mapper(device.name, neighbor.get("interface"))
-                        logging.info(f"Interface converted to - {neighbor_int}")
+                        logging.info("Interface converted to - %s", neighbor_int)
                         assert neighbor_int in eigrp_interfaces.keys()
                         #Does the address of the neighbor match the interface?
                         assert neighbor.get("address") in eigrp_interfaces.get(neighbor_int).get("eigrp_nbr").keys()
@@ -1,5 +1,6 @@
 import logging
 from pyats import aetest
+from ci_cli.snapshot import parse_command, needs_connection
 
 
 class InterfaceStatusTest(aetest.Testcase):
@@ -10,8 +11,8 @@ class InterfaceStatusTest(aetest.Testcase):
         Connect if not already connected
         """
         for device in self.parameters.get('devices'):
-            if not device.is_connected():
-                logging.info(f"Connecting to device {device.name}")
+            if not device.is_connected() and needs_connection(self.parameters.get("device_output")):
+                logging.info("Connecting to device %s", device.name)
                 device.connect(log_stdout=False)
 
     @aetest.test
@@ -22,12 +23,12 @@ class InterfaceStatusTest(aetest.Testcase):
         """
         for device in self.parameters.get('devices'):
             with steps.start(f"Testing interfaces on device {device.name}", continue_=True) as substep:
-                out = device.parse("show ip interface brief")
+                out = parse_command(device, "show ip interface brief", **self.parameters.get("device_output", {}))
                 test_params = self.parameters.get("test_params").get("test_params")
                 for interface in test_params.get("interfaces"):
                     conv_int = self.parameters.get("mapper").mapper(device_name=device.name, interface_name=interface)
                     with substep.start(f"Testing if interface {interface} (converted interface - {conv_int}) is up/up", continue_=True):
-                        logging.info(f"testing interface {interface}")
+                        logging.info("testing interface %s", interface)
                         current_int_state = out.get("interface", {}).get(conv_int, {})
                         assert current_int_state, f"Interface {conv_int} not found"
                         assert current_int_state.get("status") == "up", f"Interface {conv_int} line status is not up"
@@ -1,6 +1,7 @@
 import logging
 from ntc_templates.parse import parse_output
 from pyats import aetest
+from ci_cli.snapshot import execute_command, needs_connection
 
 
 class OSPFNeighborTest(aetest.Testcase):
@@ -8,8 +9,8 @@ class OSPFNeighborTest(aetest.Testcase):
     @aetest.setup
     def setup_test(self):
         for device in self.parameters.get('devices'):
-            if not device.is_connected():
-                logging.info(f"Connecting to device {device.name}")
+            if not device.is_connected() and needs_connection(self.parameters.get("device_output")):
+                logging.info("Connecting to device %s", device.name)
                 device.connect(log_stdout=False)
 
     @aetest.test
@@ -17,7 +18,7 @@ class OSPFNeighborTest(aetest.Testcase):
         for device in self.parameters['devices']:
             with steps.start(f"Testing required OSPF neighbors exist on - {device.name}", continue_=True) as substep:
                 test_params = self.parameters.get("test_params").get("test_params")
-                out = device.execute("show ip ospf neighbor")
+                out = execute_command(device, "show ip ospf neighbor", **self.parameters.get("device_output", {}))
                 out = parse_output(platform="cisco_ios",
                                    command="show ip ospf neighbor", data=out)
 
@@ -1,5 +1,6 @@
 import logging
 from pyats import aetest
+from ci_cli.snapshot import parse_command, needs_connection
 
 
 class OSPFRIBTest(aetest.Testcase):
@@ -11,9 +12,9 @@ class OSPFRIBTest(aetest.Testcase):
         """
         for device in self.parameters.get('devices'):
             device.os = "iosxe"
-            if not device.is_connected():
+            if not device.is_connected() and needs_connection(self.parameters.get("device_output")):
                 
-                logging.info(f"Connecting to device {device.name}")
+                logging.info("Connecting to device %s", device.name)
                 device.connect(log_stdout=False)
 
     @aetest.test
@@ -24,19 +25,19 @@ class OSPFRIBTest(aetest.Testcase):
         for device in self.parameters.get("devices"):
             test_params = self.parameters.get("test_params").get("test_params")
             with steps.start(f"Testing OSPF DB of device {device}", continue_=True) as steps:
-                out = device.parse("show ip ospf rib redistribution")
+                out = parse_command(device, "show ip ospf rib redistribution", **self.parameters.get("device_output", {}))
                 logging.info(out)
                 tested_instances = [int(network['process_id']) for network in test_params.get("ospf_processes")]
-                logging.info(f"testing instances.. {tested_instances}")
+                logging.info("testing instances.. %s", tested_instances)
                 for instance in tested_instances:
                     with steps.start(f"Testing instance - {instance} for redistributed routes", continue_=True) as substep:
                         current_instance_networks = out.get("instance", {}).get(instance, {}).get("network", {})
                         assert current_instance_networks, f"Instance {instance} is not redistributing any routes"
                         tested_networks = [test_instance.get("networks") for test_instance in test_params.get("ospf_processes") if int(test_instance.get("process_id")) == instance][0]
                         assert tested_networks, "No networks found to test"
-                        logging.info(f"testable routes.. {tested_networks}")
+                        logging.info("testable routes.. %s", tested_networks)
                         for tested_network in tested_networks:
-                            logging.info(f"tested_network - {tested_network}")
+                            logging.info("tested_network - %s", tested_network)
                             with substep.start(f"Testing network - {tested_network.get('network')} against current network state", continue_=True) as subsubstep:
                                 assert tested_network.get("network") in current_instance_networks.keys()
                                 if tested_network.get("origin_protocol"):
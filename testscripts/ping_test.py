@@ -1,6 +1,6 @@
 import logging
 from pyats import aetest
-from unicon.core.errors import SubCommandFailure
+from ci_cli.ping_engine import run_pings, ping_failures
 
 
 class PingTest(aetest.Testcase):
@@ -13,23 +13,32 @@ class PingTest(aetest.Testcase):
         for device in self.parameters.get('devices'):
             device.os = "iosxe"
             if not device.is_connected():
-                
-                logging.info(f"Connecting to device {device.name}")
+
+                logging.info("Connecting to device %s", device.name)
                 device.connect(log_stdout=False)
 
     @aetest.test
     def ping_test(self, steps):
         """
-        Directly pass in the test params to the ping api, simply pass/fail
+        Run the pings from every device at once, then check loss and rtt of each one
+        max_loss (percent) and max_rtt (average ms) are optional per ping, by default any reply passes
         """
+        test_params = self.parameters.get("test_params").get("test_params")
+        mapper = self.parameters.get("mapper")
+        jobs = {}
+        for device in self.parameters.get("devices"):
+            jobs[device] = []
+            for p_test in test_params.get("pings"):
+                p_test = dict(p_test)
+                if p_test.get("source"):
+                    p_test["source"] = mapper.mapper(device.name, p_test["source"])
+                jobs[device].append(p_test)
+        results = run_pings(jobs)
         for device in self.parameters.get("devices"):
-            test_params = self.parameters.get("test_params").get("test_params")
-            mapper = self.parameters.get("mapper")
-            with steps.start(f"Conducting ping tests from device {device}", continue_=True) as steps:
-                for p_test in test_params.get("pings"):
-                    if p_test.get("source"):
-                        p_test["source"] = mapper.mapper(device.name, p_test["source"])
-                    try:
-                        device.ping(**p_test)
-                    except SubCommandFailure:
-                        self.failed(f"Unable to ping destination with params - {p_test}")
\ No newline at end of file
+            with steps.start(f"Conducting ping tests from device {device}", continue_=True) as device_step:
+                for p_test, result in zip(test_params.get("pings"), results.get(device.name, [])):
+                    with device_step.start(f"Ping {result.get('command')}", continue_=True):
+                        logging.info("%s -> %s: %s/%s received, rtt min/avg/max %s/%s/%s ms", device.name, result.get('addr'),
+                                     result.get('received'), result.get('sent'), result.get('rtt_min'), result.get('rtt_avg'), result.get('rtt_max'))
+                        problems = ping_failures(result, p_test.get("max_loss"), p_test.get("max_rtt"))
+                        assert not problems, "; ".join(problems)